@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timings cover every other middleware; removes itself unless SQL_PROFILING is on
+    'expenses.middleware.SQLProfilingMiddleware',
+    'expenses.middleware.MetricsMiddleware',
+    # Outside SessionMiddleware so a session saved on the way out also pins the client
+    'expenses.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,11 +83,97 @@ WSGI_APPLICATION = 'expense_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# DB_ENGINE picks the backend: "sqlite" (default) or "postgresql".
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked before
+# reuse. DB_POOL=True puts PostgreSQL connections in an in-process pool
+# instead (expenses.backends.postgresql_pool), which hands connections back
+# to the pool at the end of each request rather than closing them. Size
+# DB_POOL_MAX_SIZE for the threads per process that query at once (e.g.
+# gunicorn --threads); others wait up to DB_POOL_TIMEOUT seconds for one.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'expenses.backends.postgresql_pool' if DB_POOL
+                else 'django.db.backends.postgresql'
+            ),
+            'NAME': os.environ.get('DB_NAME', 'expense_splitter'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # The pool owns connection lifetime; Django must not keep its own
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+            'POOL': {
+                'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+                # Seconds a thread waits for a free connection when all are in use
+                'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                # Seconds a writer waits for the database lock before "database is locked"
+                'timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+            },
+        }
+    }
 
-DATABASES = {
+# Read replicas: DB_REPLICA_HOSTS lists replica hosts (PostgreSQL) or database
+# files (SQLite), comma separated. Each becomes a "replicaN" alias with the
+# primary's other settings; reads are spread over them by
+# expenses.routers.PrimaryReplicaRouter and writes go to "default". A client
+# that writes reads from the primary for DB_PRIMARY_PIN_SECONDS afterwards.
+for number, location in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    replica['NAME' if DB_ENGINE == 'sqlite' else 'HOST'] = location.strip()
+    DATABASES[f'replica{number}'] = replica
+
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DB_PRIMARY_PIN_SECONDS = int(os.environ.get('DB_PRIMARY_PIN_SECONDS', 10))
+DATABASE_ROUTERS = ['expenses.routers.PrimaryReplicaRouter']
+
+# Single-node SQLite tuning: WAL journal so readers don't block the writer,
+# synchronous=NORMAL (safe under WAL), and a bigger page cache. Applied to
+# every new connection by expenses.signals.
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', 'True') == 'True'
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+
+
+# Cache
+# Group balances, simplified settlements and statistics are cached per group
+# version. LocMemCache is per process; point CACHE_BACKEND at a shared backend
+# (e.g. django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.db.DatabaseCache) to share it between workers.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'expense-splitter'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 3600)),
+        'OPTIONS': {
+            # Evict a third of the entries once the cache is full
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000)),
+            'CULL_FREQUENCY': 3,
+        },
     }
 }
 
@@ -137,6 +229,10 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Keyset pagination for the expense, settlement and user list APIs
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
 # expense_project/settings.py - ADD at the end
 
 # Login settings
@@ -145,4 +241,67 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Account-wide archive exports are written here by the task worker
+EXPORT_ROOT = os.environ.get('EXPORT_ROOT', os.path.join(MEDIA_ROOT, 'exports'))
+# Finished archive exports (and their files) are deleted after this many days
+EXPORT_RETENTION_DAYS = int(os.environ.get('EXPORT_RETENTION_DAYS', 7))
+
+# Background task queue (expenses.tasks, run by manage.py run_worker): seconds
+# an idle worker waits between polls, before the first retry of a failed task
+# (doubling each attempt), and before a running task is presumed orphaned
+TASK_POLL_INTERVAL = float(os.environ.get('TASK_POLL_INTERVAL', 1.0))
+TASK_RETRY_DELAY = float(os.environ.get('TASK_RETRY_DELAY', 30))
+TASK_STALE_SECONDS = float(os.environ.get('TASK_STALE_SECONDS', 900))
+
+# Balance journal: take a per-group checkpoint every N journal entries
+BALANCE_CHECKPOINT_INTERVAL = int(os.environ.get('BALANCE_CHECKPOINT_INTERVAL', 500))
+
+# Live group pages: how often each process checks watched groups for changes,
+# and how long an idle event stream waits before sending a keep-alive
+LIVE_POLL_INTERVAL = float(os.environ.get('LIVE_POLL_INTERVAL', 1.0))
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 15))
+# Event streams need an ASGI server; pages served over WSGI check the group
+# version this often instead and reload when it has moved
+LIVE_PAGE_POLL_SECONDS = int(os.environ.get('LIVE_PAGE_POLL_SECONDS', 10))
+
+# Debt simplifier: groups with up to this many non-zero members are solved exactly
+DEBT_SOLVER_EXACT_LIMIT = int(os.environ.get('DEBT_SOLVER_EXACT_LIMIT', 14))
+
+# Built-in metrics served at /metrics. Each worker process writes its values
+# to METRICS_DIR and the endpoint adds them up; clear the directory on deploy.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'expense-splitter-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# Scrapers send this as "Authorization: Bearer <token>"; without it only staff
+# logins can read /metrics. (Client IPs are no guard behind a reverse proxy,
+# where every request arrives from loopback.)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Per-request SQL profiling: Server-Timing headers plus a slow request log
+SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False') == 'True'
+SQL_PROFILING_SLOW_MS = float(os.environ.get('SQL_PROFILING_SLOW_MS', 500))
+SQL_PROFILING_SLOW_QUERIES = int(os.environ.get('SQL_PROFILING_SLOW_QUERIES', 100))
+SQL_PROFILING_TOP_STATEMENTS = 5
+
+# Slow requests go to stderr, or to SQL_SLOW_LOG_FILE as one JSON object per line
+SQL_SLOW_LOG_FILE = os.environ.get('SQL_SLOW_LOG_FILE')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_sql': (
+            {'class': 'logging.FileHandler', 'filename': SQL_SLOW_LOG_FILE}
+            if SQL_SLOW_LOG_FILE else {'class': 'logging.StreamHandler'}
+        ),
+    },
+    'loggers': {
+        'expenses.sql': {
+            'handlers': ['slow_sql'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
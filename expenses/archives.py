@@ -0,0 +1,114 @@
+# expenses/archives.py
+
+import os
+import re
+import zipfile
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Group, ExportJob
+from .exporters import iter_expense_csv, iter_split_csv, iter_settlement_csv
+from .routers import use_primary
+from .tasks import enqueue
+
+EXPORT_ROOT = getattr(settings, 'EXPORT_ROOT', os.path.join(settings.MEDIA_ROOT, 'exports'))
+# Finished exports, and their files, are deleted after this many days
+RETENTION_DAYS = getattr(settings, 'EXPORT_RETENTION_DAYS', 7)
+
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '-', name).strip('-') or 'group'
+
+
+def _write_member(archive, name, chunks):
+    with archive.open(name, 'w') as member:
+        for chunk in chunks:
+            member.write(chunk.encode('utf-8'))
+
+
+def build_archive(job):
+    """
+    Write a zip with expenses, splits and settlements for each of the user's groups.
+    Files are streamed into the archive chunk by chunk.
+    """
+    os.makedirs(EXPORT_ROOT, exist_ok=True)
+    path = os.path.join(EXPORT_ROOT, f'export-{job.user_id}-{job.id}.zip')
+    partial = path + '.part'
+
+    with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for group in Group.objects.filter(members=job.user_id).order_by('id'):
+            folder = f'{group.id}-{_slug(group.name)}'
+            _write_member(archive, f'{folder}/expenses.csv', iter_expense_csv(group, include_ids=True))
+            _write_member(archive, f'{folder}/splits.csv', iter_split_csv(group))
+            _write_member(archive, f'{folder}/settlements.csv', iter_settlement_csv(group))
+
+    os.replace(partial, path)
+    return path
+
+
+def run_export_job(job_id):
+    """
+    Build the archive for one job and record the outcome on it. Failures are
+    re-raised so the task queue retries them; the job goes back to pending
+    until the queue gives up and fail_export_job marks it failed.
+    """
+    # The job was created moments ago and may not have reached a replica yet
+    with use_primary():
+        job = ExportJob.objects.get(pk=job_id)
+    job.status = 'running'
+    job.error = ''
+    job.save(update_fields=['status', 'error'])
+
+    try:
+        job.file_path = build_archive(job)
+    except Exception as e:
+        job.status = 'pending'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error'])
+        raise
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file_path', 'finished_at'])
+    return job
+
+
+def fail_export_job(job_id):
+    """
+    Mark a job failed once its task is out of attempts.
+    """
+    ExportJob.objects.filter(pk=job_id).exclude(status='done').update(
+        status='failed', finished_at=timezone.now()
+    )
+
+
+def purge_expired_exports():
+    """
+    Delete jobs that finished more than RETENTION_DAYS ago, with their
+    archive files. Returns how many jobs were deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    expired = ExportJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff)
+
+    deleted = 0
+    for job in expired:
+        if job.file_path:
+            try:
+                os.remove(job.file_path)
+            except FileNotFoundError:
+                pass
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+def start_export(user):
+    """
+    Queue an archive export for the user and return its job. Archives are
+    built by the task worker (manage.py run_worker), off the request cycle.
+    """
+    job = ExportJob.objects.create(user=user)
+    enqueue('export_archive', {'job_id': job.id}, user=user)
+    # Piggyback the retention sweep on new exports; one waiting sweep is enough
+    enqueue('purge_exports', unique=True)
+    return job
@@ -0,0 +1,171 @@
+# expenses/async_views.py
+
+import asyncio
+import functools
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .models import Group
+from .ledger import get_group_balances_as_of, HistoryUnavailable
+from .money import to_cents, cents_to_float
+from .summary import auser_summary
+from .utils import acalculate_group_statistics, dashboard_groups
+from .cache import aget_cached_balances, aget_cached_simplified_balances, aget_cached_statistics
+from .live import Subscription, stream, astream
+
+# Native async versions of the read-heavy API endpoints, for ASGI servers
+# (uvicorn expense_project.asgi:application). They return the same JSON as
+# their sync counterparts but wait on the database without holding a worker
+# thread, and issue independent queries together with asyncio.gather.
+
+
+def error(detail, status):
+    # Same shape as DRF's error responses
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def async_api_view(view):
+    """
+    GET-only, session-authenticated async JSON view. The view is called
+    with the logged-in user after the request.
+    """
+    @require_GET
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return error('Authentication credentials were not provided.', 403)
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+async def member_group(user, group_id):
+    return await Group.objects.filter(pk=group_id, members=user).afirst()
+
+
+def query_date(request, name):
+    return date.fromisoformat(request.GET[name]) if request.GET.get(name) else None
+
+
+@async_api_view
+async def group_balances(request, user, group_id):
+    """
+    Async GroupViewSet.balances, including ?as_of=YYYY-MM-DD.
+    """
+    group = await member_group(user, group_id)
+    if group is None:
+        return error('Not found.', 404)
+
+    try:
+        as_of = query_date(request, 'as_of')
+    except ValueError:
+        return JsonResponse({'error': 'as_of must be a date in YYYY-MM-DD format'}, status=400)
+    if as_of:
+        try:
+            return JsonResponse(await sync_to_async(get_group_balances_as_of)(group, as_of))
+        except HistoryUnavailable as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(await aget_cached_balances(group))
+
+
+@async_api_view
+async def group_settlements(request, user, group_id):
+    """
+    The fewest payments that settle the group, as on the group page.
+    """
+    group = await member_group(user, group_id)
+    if group is None:
+        return error('Not found.', 404)
+
+    return JsonResponse(await aget_cached_simplified_balances(group), safe=False)
+
+
+@async_api_view
+async def group_statistics(request, user, group_id):
+    """
+    Async GroupViewSet.statistics, with the same ?start, ?end and ?by_payer options.
+    """
+    group = await member_group(user, group_id)
+    if group is None:
+        return error('Not found.', 404)
+
+    try:
+        start_date = query_date(request, 'start')
+        end_date = query_date(request, 'end')
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be dates in YYYY-MM-DD format'}, status=400)
+    by_payer = request.GET.get('by_payer') in ('1', 'true', 'True')
+
+    if not (start_date or end_date or by_payer):
+        return JsonResponse(await aget_cached_statistics(group))
+    return JsonResponse(await acalculate_group_statistics(
+        group, start_date=start_date, end_date=end_date, by_payer=by_payer
+    ))
+
+
+@async_api_view
+async def dashboard(request, user):
+    """
+    The dashboard cards as JSON: each group's counts, last activity and the
+    user's net balance in it (positive when owed), plus the overall net.
+    """
+    groups = [group async for group in dashboard_groups(user)]
+    net = {group.id: to_cents(group.net_balance) for group in groups}
+    return JsonResponse({
+        'groups': [
+            {
+                'id': group.id,
+                'name': group.name,
+                'description': group.description,
+                'member_count': group.member_count,
+                'expense_count': group.expense_count,
+                'last_activity': group.last_activity.isoformat(),
+                'net_balance': cents_to_float(net[group.id]),
+            }
+            for group in groups
+        ],
+        'total_net': cents_to_float(sum(net.values())),
+    })
+
+
+@async_api_view
+async def user_summary(request, user):
+    """
+    Async /api/users/me/summary/.
+    """
+    return JsonResponse(await auser_summary(user))
+
+
+@async_api_view
+async def group_events(request, user, group_id):
+    """
+    Server-Sent Events stream of a group's changes, for the group page.
+
+    ?version= (or Last-Event-ID when the browser reconnects) is the group
+    version the page was rendered at. Each write then arrives as one
+    "change" event with the balance, settlement, statistics and expense
+    deltas; a client that has fallen further behind gets "resync". Under
+    ASGI open streams cost no threads; under WSGI each holds a worker thread.
+    """
+    group = await member_group(user, group_id)
+    if group is None:
+        return error('Not found.', 404)
+
+    try:
+        version = int(request.headers.get('Last-Event-ID') or request.GET.get('version') or group.version)
+    except ValueError:
+        version = group.version
+
+    if isinstance(request, ASGIRequest):
+        events = astream(Subscription(group.id, version, loop=asyncio.get_running_loop()))
+    else:
+        events = stream(Subscription(group.id, version))
+
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
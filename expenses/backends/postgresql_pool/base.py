@@ -0,0 +1,133 @@
+# expenses/backends/postgresql_pool/base.py
+
+import os
+import threading
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+
+try:
+    from psycopg2 import pool as psycopg2_pool
+except ImportError:
+    psycopg2_pool = None
+
+# One pool per (process, database alias); gunicorn forks after import, so
+# the pid keeps children from sharing the parent's sockets
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingPool:
+    """
+    A psycopg2 ThreadedConnectionPool whose borrowers wait up to TIMEOUT
+    seconds for a free connection when all MAX_SIZE are out, instead of
+    failing at once with PoolError.
+    """
+
+    def __init__(self, min_size, max_size, timeout, **conn_params):
+        self.pool = psycopg2_pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        self.slots = threading.Semaphore(max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+
+    @property
+    def closed(self):
+        return self.pool.closed
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                f'No pooled connection became free within {self.timeout}s (POOL MAX_SIZE is {self.max_size})'
+            )
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        try:
+            self.pool.putconn(connection, close=close)
+        finally:
+            self.slots.release()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """
+    The process-wide connection pool for a database alias, created on first use.
+    """
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        if key not in _pools:
+            sizes = settings_dict.get('POOL', {})
+            _pools[key] = BlockingPool(
+                sizes.get('MIN_SIZE', 2), sizes.get('MAX_SIZE', 20), sizes.get('TIMEOUT', 10), **conn_params
+            )
+        return _pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that borrows connections from an in-process
+    psycopg2 ThreadedConnectionPool instead of opening one per request.
+
+    Configure it with a POOL dict ({'MIN_SIZE': 2, 'MAX_SIZE': 20, 'TIMEOUT': 10})
+    in the database settings and leave CONN_MAX_AGE at 0: Django then "closes"
+    the connection at the end of every request, which here puts it back in the
+    pool. A thread that finds all MAX_SIZE connections in use waits up to
+    TIMEOUT seconds for one, so size the pool for the threads that query at
+    once. Borrowed connections are reset, and with CONN_HEALTH_CHECKS pinged,
+    before use; one that fails (e.g. after a server restart) is discarded and
+    replaced.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if psycopg2_pool is None or base.is_psycopg3:
+            raise ImproperlyConfigured('expenses.backends.postgresql_pool requires psycopg2')
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict, conn_params)
+        # Every idle connection can be dead at once after a server restart;
+        # once those are discarded the pool opens a fresh one
+        for attempt in range(pool.max_size + 1):
+            connection = pool.getconn()
+            try:
+                self.check_pooled_connection(connection)
+                break
+            except base.Database.Error:
+                pool.putconn(connection, close=True)
+                if attempt == pool.max_size:
+                    raise
+        if 'isolation_level' in self.settings_dict['OPTIONS']:
+            self.isolation_level = base.IsolationLevel(self.settings_dict['OPTIONS']['isolation_level'])
+            connection.isolation_level = self.isolation_level
+        else:
+            self.isolation_level = base.IsolationLevel.READ_COMMITTED
+        base.psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def check_pooled_connection(self, connection):
+        """
+        Roll back anything the previous borrower left open and drop its
+        session settings (Django re-applies timezone and role next), then
+        make sure the server still answers.
+        """
+        if connection.closed:
+            raise base.Database.InterfaceError('Pooled connection is closed')
+        connection.reset()
+        if self.settings_dict['CONN_HEALTH_CHECKS']:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get((os.getpid(), self.alias))
+        with self.wrap_database_errors:
+            if pool is None or pool.closed:
+                return self.connection.close()
+            # Broken connections are dropped rather than handed to the next request
+            broken = self.connection.closed or self.errors_occurred
+            if not broken and not self.get_autocommit():
+                self.connection.rollback()
+            pool.putconn(self.connection, close=broken)
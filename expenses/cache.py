@@ -0,0 +1,125 @@
+# expenses/cache.py
+
+from django.core.cache import cache
+from django.db.models import F
+
+HITS_KEY = 'group-results:hits'
+MISSES_KEY = 'group-results:misses'
+
+_MISSING = object()
+
+
+def bump_group_version(group_id):
+    """
+    Invalidate every cached result for a group by moving it to a new version.
+    """
+    from .models import Group
+
+    Group.objects.filter(pk=group_id).update(version=F('version') + 1)
+
+
+def group_cache_key(group, name):
+    return f'group:{group.pk}:v{group.version}:{name}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def cached_group_result(group, name, compute):
+    """
+    Return compute() for this group, cached under the group's current version.
+    Old versions are never read again and simply age out of the cache.
+    """
+    key = group_cache_key(group, name)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(HITS_KEY)
+        return value
+
+    _count(MISSES_KEY)
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+async def _acount(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+async def acached_group_result(group, name, compute):
+    """
+    Async cached_group_result; compute() is a coroutine function. Shares
+    keys with the sync path, so either fills the cache for the other.
+    """
+    key = group_cache_key(group, name)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        await _acount(HITS_KEY)
+        return value
+
+    await _acount(MISSES_KEY)
+    value = await compute()
+    await cache.aset(key, value)
+    return value
+
+
+def get_cached_balances(group):
+    from .ledger import get_group_balances
+
+    return cached_group_result(group, 'balances', lambda: get_group_balances(group))
+
+
+def get_cached_simplified_balances(group):
+    from .utils import simplify_debts
+
+    return cached_group_result(group, 'simplified', lambda: simplify_debts(get_cached_balances(group)))
+
+
+def get_cached_statistics(group):
+    from .utils import calculate_group_statistics
+
+    return cached_group_result(group, 'statistics', lambda: calculate_group_statistics(group))
+
+
+async def aget_cached_balances(group):
+    from .ledger import aget_group_balances
+
+    return await acached_group_result(group, 'balances', lambda: aget_group_balances(group))
+
+
+async def aget_cached_simplified_balances(group):
+    from asgiref.sync import sync_to_async
+    from .utils import simplify_debts
+
+    async def compute():
+        # The solver is CPU bound; keep it off the event loop
+        return await sync_to_async(simplify_debts, thread_sensitive=False)(await aget_cached_balances(group))
+
+    return await acached_group_result(group, 'simplified', compute)
+
+
+async def aget_cached_statistics(group):
+    from .utils import acalculate_group_statistics
+
+    return await acached_group_result(group, 'statistics', lambda: acalculate_group_statistics(group))
+
+
+def cache_stats():
+    """
+    Hit/miss counters for the group result cache.
+    """
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,144 @@
+# expenses/exporters.py
+
+import csv
+import io
+import zlib
+from itertools import islice
+from django.db.models import Q
+from .models import Expense, ExpenseSplit, Settlement
+from . import metrics
+
+# Expenses fetched (and their splits preloaded) per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+EXPENSE_HEADER = ['Date', 'Description', 'Amount', 'Paid By', 'Split Among']
+SPLIT_HEADER = ['Expense ID', 'Date', 'User', 'Amount Owed', 'Amount Remaining', 'Settled']
+SETTLEMENT_HEADER = ['ID', 'Settled At', 'Paid By', 'Paid To', 'Amount']
+
+
+def iter_expense_chunks(group, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of expense dicts, newest first, each with its split usernames.
+
+    Walks the group's expenses with keyset pagination on (date, id) and
+    loads the splits for a whole chunk in one query, so an export costs two
+    queries per chunk and never holds more than one chunk in memory.
+    """
+    expenses = Expense.objects.filter(group=group)
+    if start_date:
+        expenses = expenses.filter(date__gte=start_date)
+    if end_date:
+        expenses = expenses.filter(date__lte=end_date)
+    expenses = expenses.order_by('-date', '-id').values(
+        'id', 'date', 'description', 'amount', 'paid_by__username'
+    )
+
+    last = None
+    while True:
+        page = expenses
+        if last is not None:
+            page = page.filter(Q(date__lt=last['date']) | Q(date=last['date'], id__lt=last['id']))
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+
+        split_users = {}
+        for expense_id, username in ExpenseSplit.objects.filter(
+            expense_id__in=[expense['id'] for expense in chunk]
+        ).order_by('id').values_list('expense_id', 'user__username'):
+            split_users.setdefault(expense_id, []).append(username)
+
+        for expense in chunk:
+            expense['split_usernames'] = split_users.get(expense['id'], [])
+        yield chunk
+
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]
+
+
+def iter_csv(rows_by_chunk, header):
+    """
+    Turn chunks of rows into CSV text, one string per chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    for rows in rows_by_chunk:
+        writer.writerows(rows)
+        metrics.inc('expense_export_rows_total', len(rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_expense_csv(group, start_date=None, end_date=None, include_ids=False):
+    """
+    Stream a group's expenses as CSV text.
+    include_ids adds a leading ID column so split rows can refer to expenses.
+    """
+    header = ['ID'] + EXPENSE_HEADER if include_ids else EXPENSE_HEADER
+    rows_by_chunk = (
+        [
+            ([expense['id']] if include_ids else []) + [
+                expense['date'],
+                expense['description'],
+                expense['amount'],
+                expense['paid_by__username'],
+                ', '.join(expense['split_usernames'])
+            ]
+            for expense in chunk
+        ]
+        for chunk in iter_expense_chunks(group, start_date, end_date)
+    )
+    return iter_csv(rows_by_chunk, header)
+
+
+def _chunked(rows, size=EXPORT_CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_split_csv(group):
+    """
+    Stream every split in a group as CSV text.
+    """
+    rows = ExpenseSplit.objects.filter(
+        expense__group=group
+    ).order_by('expense_id', 'id').values_list(
+        'expense_id', 'expense__date', 'user__username', 'amount_owed', 'amount_remaining', 'is_settled'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return iter_csv(_chunked(rows), SPLIT_HEADER)
+
+
+def iter_settlement_csv(group):
+    """
+    Stream every settlement in a group as CSV text.
+    """
+    rows = Settlement.objects.filter(
+        group=group
+    ).order_by('settled_at', 'id').values_list(
+        'id', 'settled_at', 'paid_by__username', 'paid_to__username', 'amount'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return iter_csv(_chunked(rows), SETTLEMENT_HEADER)
+
+
+def iter_gzip(chunks):
+    """
+    Gzip-compress a stream of text chunks on the fly.
+    """
+    # wbits=31 writes a gzip header/trailer instead of a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
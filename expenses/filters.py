@@ -0,0 +1,112 @@
+# expenses/filters.py
+
+from datetime import date, datetime, time, timedelta
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import ExpenseSplit
+
+TRUE_VALUES = ('1', 'true', 'True', 'yes')
+FALSE_VALUES = ('0', 'false', 'False', 'no')
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Expected a date in YYYY-MM-DD format.'})
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Expected an integer id.'})
+
+
+def _bool_param(params, name):
+    value = params.get(name)
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    if value:
+        raise ValidationError({name: 'Expected true or false.'})
+    return None
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_expenses(queryset, params):
+    """
+    Apply ?group=, ?start=, ?end=, ?paid_by= and ?settled= filters to expenses.
+    An expense is settled once the other members have paid their splits; the
+    payer's own split is never settled, so it doesn't count.
+    """
+    group_id = _int_param(params, 'group')
+    if group_id is not None:
+        queryset = queryset.filter(group_id=group_id)
+
+    start_date = _date_param(params, 'start')
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    end_date = _date_param(params, 'end')
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+
+    paid_by = _int_param(params, 'paid_by')
+    if paid_by is not None:
+        queryset = queryset.filter(paid_by_id=paid_by)
+
+    settled = _bool_param(params, 'settled')
+    if settled is not None:
+        outstanding = Exists(ExpenseSplit.objects.filter(
+            expense=OuterRef('pk'), is_settled=False
+        ).exclude(user=OuterRef('paid_by')))
+        queryset = queryset.filter(~outstanding if settled else outstanding)
+
+    return queryset
+
+
+def filter_settlements(queryset, params):
+    """
+    Apply ?group=, ?start=, ?end=, ?paid_by= and ?paid_to= filters to settlements.
+    """
+    group_id = _int_param(params, 'group')
+    if group_id is not None:
+        queryset = queryset.filter(group_id=group_id)
+
+    # Compare against datetimes (not settled_at__date) so the index can be used
+    start_date = _date_param(params, 'start')
+    if start_date:
+        queryset = queryset.filter(settled_at__gte=_start_of(start_date))
+    end_date = _date_param(params, 'end')
+    if end_date:
+        queryset = queryset.filter(settled_at__lt=_start_of(end_date + timedelta(days=1)))
+
+    paid_by = _int_param(params, 'paid_by')
+    if paid_by is not None:
+        queryset = queryset.filter(paid_by_id=paid_by)
+    paid_to = _int_param(params, 'paid_to')
+    if paid_to is not None:
+        queryset = queryset.filter(paid_to_id=paid_to)
+
+    return queryset
+
+
+def filter_users(queryset, params):
+    """
+    Apply ?group= to only list members of one group.
+    """
+    group_id = _int_param(params, 'group')
+    if group_id is not None:
+        queryset = queryset.filter(expense_groups=group_id)
+    return queryset
@@ -0,0 +1,224 @@
+# expenses/importers.py
+
+import codecs
+import csv
+from datetime import date
+from django.contrib.auth.models import User
+from .writers import create_expenses
+from .money import parse_amount
+
+# Rows validated, resolved and inserted together
+IMPORT_BATCH_SIZE = 500
+
+# Per-row errors kept for the report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Same columns as export_expenses_csv; Paid By and Split Among are optional
+COLUMNS = {
+    'date': 'Date',
+    'description': 'Description',
+    'amount': 'Amount',
+    'paid_by': 'Paid By',
+    'split_among': 'Split Among',
+}
+REQUIRED_COLUMNS = ('date', 'description', 'amount')
+
+
+class ImportReport:
+    """
+    Running totals and per-row errors for one CSV import.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def _parse_row(row, columns):
+    """
+    Validate one CSV row. Returns (fields, error message).
+    """
+    def cell(name):
+        index = columns.get(name)
+        if index is None or index >= len(row):
+            return ''
+        return row[index].strip()
+
+    description = cell('description')
+    if not description:
+        return None, 'Description is required'
+    if len(description) > 200:
+        return None, 'Description is longer than 200 characters'
+
+    try:
+        expense_date = date.fromisoformat(cell('date'))
+    except ValueError:
+        return None, f'Invalid date "{cell("date")}", expected YYYY-MM-DD'
+
+    try:
+        amount = parse_amount(cell('amount'))
+    except ValueError as e:
+        return None, str(e)
+
+    split_among = [name.strip() for name in cell('split_among').split(',') if name.strip()]
+
+    return {
+        'date': expense_date,
+        'description': description,
+        'amount': amount,
+        'paid_by': cell('paid_by'),
+        'split_among': split_among,
+    }, None
+
+
+def _write_batch(group, user, batch, all_member_ids, report):
+    """
+    Resolve usernames for a batch with one query and insert the valid rows.
+    """
+    usernames = {user.username}
+    for _, fields in batch:
+        usernames.add(fields['paid_by'])
+        usernames.update(fields['split_among'])
+    usernames.discard('')
+
+    member_ids = dict(
+        User.objects.filter(username__in=usernames, expense_groups=group).values_list('username', 'id')
+    )
+
+    items = []
+    lines = []
+    for line, fields in batch:
+        payer = fields['paid_by'] or user.username
+        if payer not in member_ids:
+            report.add_error(line, f'Payer "{payer}" is not a member of this group')
+            continue
+
+        unknown = [name for name in fields['split_among'] if name not in member_ids]
+        if unknown:
+            report.add_error(line, f'Not members of this group: {", ".join(unknown)}')
+            continue
+
+        if fields['split_among']:
+            split_members = list(dict.fromkeys(member_ids[name] for name in fields['split_among']))
+        else:
+            # No split list means everyone in the group shares it
+            split_members = all_member_ids
+
+        items.append({
+            'group': group,
+            'description': fields['description'],
+            'amount': fields['amount'],
+            'paid_by_id': member_ids[payer],
+            'date': fields['date'],
+            'split_members': split_members,
+        })
+        lines.append(line)
+
+    try:
+        create_expenses(items)
+    except Exception as e:
+        for line in lines:
+            report.add_error(line, f'Could not save row: {e}')
+    else:
+        report.imported += len(items)
+
+
+def _decode_lines(upload, bad_lines):
+    """
+    Yield the upload's lines as text, one at a time. A line that is not valid
+    UTF-8 is decoded with replacement characters and its number added to
+    bad_lines, so the rest of the file is still read.
+    """
+    for number, raw in enumerate(upload, start=1):
+        if number == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            bad_lines.add(number)
+            yield raw.decode('utf-8', errors='replace')
+
+
+def import_expenses_csv(group, upload, user, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Stream a CSV upload into a group's expenses.
+
+    Rows are parsed one at a time and written in fixed-size batches, so memory
+    stays flat however long the file is. Bad rows are reported by line number
+    and skipped; they never abort the rest of the file.
+    """
+    report = ImportReport()
+    bad_lines = set()
+    reader = csv.reader(_decode_lines(upload, bad_lines))
+
+    try:
+        header = next(reader)
+    except StopIteration:
+        report.add_error(1, 'File is empty')
+        return report.as_dict()
+    if bad_lines:
+        report.add_error(1, 'File is not UTF-8 encoded CSV')
+        return report.as_dict()
+
+    headings = {heading.strip().lower(): index for index, heading in enumerate(header)}
+    columns = {
+        name: headings[label.lower()]
+        for name, label in COLUMNS.items()
+        if label.lower() in headings
+    }
+    missing = [COLUMNS[name] for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        report.add_error(1, f'Missing column(s): {", ".join(missing)}')
+        return report.as_dict()
+
+    all_member_ids = list(group.members.values_list('id', flat=True))
+
+    batch = []
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            bad_lines.clear()
+            report.add_error(reader.line_num, f'Unreadable row: {e}')
+            continue
+
+        line = reader.line_num
+        # The reader pulls lines only as it needs them, so anything in
+        # bad_lines belongs to this row (which may span several lines)
+        if bad_lines:
+            bad_lines.clear()
+            report.add_error(line, 'Row is not valid UTF-8')
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+
+        fields, error = _parse_row(row, columns)
+        if error:
+            report.add_error(line, error)
+            continue
+
+        batch.append((line, fields))
+        if len(batch) >= batch_size:
+            _write_batch(group, user, batch, all_member_ids, report)
+            batch = []
+
+    if batch:
+        _write_batch(group, user, batch, all_member_ids, report)
+
+    return report.as_dict()
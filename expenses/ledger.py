@@ -0,0 +1,362 @@
+# expenses/ledger.py
+
+from decimal import Decimal
+from datetime import datetime, time, timedelta
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Max, Min
+from django.utils import timezone
+from .cache import bump_group_version
+from .metrics import timed
+
+# Take a checkpoint once a group has this many journal entries after its last one
+CHECKPOINT_INTERVAL = getattr(settings, 'BALANCE_CHECKPOINT_INTERVAL', 500)
+
+
+def apply_deltas(group_id, deltas, kind, expense=None, settlement=None):
+    """
+    Add {(debtor_id, creditor_id): Decimal} deltas to a group's ledger,
+    append them to the balance journal and bump the group's version.
+    Must run inside the same transaction as the write that caused them.
+    """
+    apply_journal_entries(group_id, [
+        (debtor_id, creditor_id, amount, kind, expense, settlement)
+        for (debtor_id, creditor_id), amount in deltas.items()
+    ])
+
+
+def apply_journal_entries(group_id, entries):
+    """
+    Journal (debtor_id, creditor_id, amount, kind, expense, settlement)
+    entries for one group and fold their totals into the ledger.
+    """
+    from .models import PairwiseBalance, BalanceJournalEntry
+
+    entries = [entry for entry in entries if entry[0] != entry[1] and entry[2]]
+
+    with transaction.atomic():
+        # Every write moves the group to a new cache version, even one that
+        # leaves the ledger untouched. The UPDATE also locks the group row,
+        # so concurrent writers to the same group queue up.
+        bump_group_version(group_id)
+        if not entries:
+            return
+
+        deltas = defaultdict(Decimal)
+        for debtor_id, creditor_id, amount, *_ in entries:
+            deltas[(debtor_id, creditor_id)] += amount
+
+        existing = {
+            (row.debtor_id, row.creditor_id): row
+            for row in PairwiseBalance.objects.filter(
+                group_id=group_id,
+                debtor_id__in={debtor for debtor, _ in deltas},
+                creditor_id__in={creditor for _, creditor in deltas},
+            )
+        }
+
+        to_update = []
+        to_create = []
+        for (debtor_id, creditor_id), amount in deltas.items():
+            row = existing.get((debtor_id, creditor_id))
+            if row is None:
+                to_create.append(PairwiseBalance(
+                    group_id=group_id,
+                    debtor_id=debtor_id,
+                    creditor_id=creditor_id,
+                    amount=amount
+                ))
+            else:
+                row.amount += amount
+                to_update.append(row)
+
+        if to_update:
+            PairwiseBalance.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            PairwiseBalance.objects.bulk_create(to_create)
+
+        now = timezone.now()
+        BalanceJournalEntry.objects.bulk_create([
+            BalanceJournalEntry(
+                group_id=group_id,
+                debtor_id=debtor_id,
+                creditor_id=creditor_id,
+                amount=amount,
+                kind=kind,
+                expense=expense,
+                settlement=settlement,
+                created_at=now
+            )
+            for debtor_id, creditor_id, amount, kind, expense, settlement in entries
+        ])
+
+        maybe_checkpoint(group_id)
+
+
+def record_expense(expense, splits):
+    """
+    Add a newly created expense's splits to the ledger.
+    """
+    record_expenses([expense], splits)
+
+
+def record_expenses(expenses, splits):
+    """
+    Add a batch of newly created expenses and their splits to the ledger,
+    with one ledger write per group touched.
+    """
+    expenses_by_id = {expense.pk: expense for expense in expenses}
+
+    entries_by_group = {expense.group_id: [] for expense in expenses}
+    for split in splits:
+        expense = expenses_by_id[split.expense_id]
+        entries_by_group[expense.group_id].append(
+            (split.user_id, expense.paid_by_id, split.amount_owed, 'expense', expense, None)
+        )
+
+    for group_id, entries in entries_by_group.items():
+        apply_journal_entries(group_id, entries)
+
+
+def reverse_expense(expense):
+    """
+    Remove what is still unpaid on an expense's splits from the ledger.
+    Call before the expense is deleted.
+    """
+    from .models import ExpenseSplit
+
+    rows = ExpenseSplit.objects.filter(
+        expense=expense,
+        is_settled=False
+    ).values_list('user_id', 'amount_remaining')
+
+    deltas = defaultdict(Decimal)
+    for user_id, amount_remaining in rows:
+        deltas[(user_id, expense.paid_by_id)] -= amount_remaining
+    apply_deltas(expense.group_id, deltas, 'expense_deleted', expense=expense)
+
+
+def record_settlement(settlement, amount):
+    """
+    Reduce what the payer owes the payee by the amount allocated to their splits.
+    """
+    apply_deltas(
+        settlement.group_id,
+        {(settlement.paid_by_id, settlement.paid_to_id): -Decimal(str(amount))},
+        'settlement',
+        settlement=settlement
+    )
+
+
+def maybe_checkpoint(group_id):
+    """
+    Take a checkpoint if enough journal entries have piled up since the last one.
+    """
+    from .models import BalanceCheckpoint, BalanceJournalEntry
+
+    last_entry_id = BalanceCheckpoint.objects.filter(
+        group_id=group_id
+    ).aggregate(last=Max('last_entry_id'))['last'] or 0
+
+    pending = BalanceJournalEntry.objects.filter(group_id=group_id, id__gt=last_entry_id).count()
+    if pending >= CHECKPOINT_INTERVAL:
+        create_checkpoint(group_id)
+
+
+def create_checkpoint(group_id):
+    """
+    Snapshot the group's ledger together with the journal position it reflects.
+    """
+    from .models import Group, PairwiseBalance, BalanceCheckpoint, BalanceJournalEntry
+
+    with transaction.atomic():
+        list(Group.objects.select_for_update().filter(pk=group_id).values_list('pk', flat=True))
+
+        last_entry_id = BalanceJournalEntry.objects.filter(
+            group_id=group_id
+        ).aggregate(last=Max('id'))['last'] or 0
+
+        balances = {
+            f'{debtor_id}:{creditor_id}': str(amount)
+            for debtor_id, creditor_id, amount in PairwiseBalance.objects.filter(
+                group_id=group_id
+            ).exclude(amount=0).values_list('debtor_id', 'creditor_id', 'amount')
+        }
+
+        return BalanceCheckpoint.objects.create(
+            group_id=group_id,
+            last_entry_id=last_entry_id,
+            balances=balances
+        )
+
+
+class HistoryUnavailable(ValueError):
+    """
+    The journal has no record of a group's balances on the requested date.
+    """
+
+
+def history_start(group):
+    """
+    The first date a group's balances can be reconstructed for, or None when
+    its journal goes back to its creation.
+
+    Groups that already existed when the journal was introduced start from
+    "opening" entries holding their balances at that moment; what they owed
+    before it was never journaled.
+    """
+    from .models import BalanceJournalEntry
+
+    opened = BalanceJournalEntry.objects.filter(kind='opening').aggregate(first=Min('created_at'))['first']
+    if opened is None or group.created_at >= opened:
+        return None
+    return timezone.localdate(opened)
+
+
+def get_group_balances_as_of(group, as_of):
+    """
+    Who owed whom at the end of the given date.
+    Loads the nearest checkpoint before that moment and replays the journal tail.
+    Raises HistoryUnavailable for dates before the group's journal begins.
+    """
+    from .models import BalanceCheckpoint, BalanceJournalEntry
+    from django.contrib.auth.models import User
+
+    start = history_start(group)
+    if start is not None and as_of < start:
+        raise HistoryUnavailable(f'Balance history for this group starts on {start.isoformat()}')
+
+    cutoff = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+
+    checkpoint = BalanceCheckpoint.objects.filter(
+        group=group,
+        created_at__lt=cutoff
+    ).order_by('-created_at', '-id').first()
+
+    pairs = defaultdict(Decimal)
+    last_entry_id = 0
+    if checkpoint is not None:
+        last_entry_id = checkpoint.last_entry_id
+        for key, amount in checkpoint.balances.items():
+            debtor_id, creditor_id = key.split(':')
+            pairs[(int(debtor_id), int(creditor_id))] = Decimal(amount)
+
+    tail = BalanceJournalEntry.objects.filter(
+        group=group,
+        id__gt=last_entry_id,
+        created_at__lt=cutoff
+    ).values('debtor_id', 'creditor_id').annotate(total=Sum('amount'))
+
+    for row in tail:
+        pairs[(row['debtor_id'], row['creditor_id'])] += row['total']
+
+    pairs = {pair: amount for pair, amount in pairs.items() if amount}
+    usernames = dict(User.objects.filter(
+        id__in={user_id for pair in pairs for user_id in pair}
+    ).values_list('id', 'username'))
+
+    balances = {}
+    for (debtor_id, creditor_id), amount in pairs.items():
+        balances.setdefault(usernames[debtor_id], {})[usernames[creditor_id]] = float(amount)
+    return balances
+
+
+def group_balance_rows(group):
+    """
+    (debtor username, creditor username, amount) for every open ledger pair.
+    """
+    from .models import PairwiseBalance
+
+    return PairwiseBalance.objects.filter(
+        group=group
+    ).exclude(amount=0).values_list('debtor__username', 'creditor__username', 'amount')
+
+
+def balances_from_rows(rows):
+    balances = {}
+    for debtor, creditor, amount in rows:
+        balances.setdefault(debtor, {})[creditor] = float(amount)
+    return balances
+
+
+@timed('group_balances')
+def get_group_balances(group):
+    """
+    Who owes whom in a group, read from the ledger.
+    Returns {debtor_username: {creditor_username: amount}}.
+    """
+    return balances_from_rows(group_balance_rows(group))
+
+
+@timed('group_balances')
+async def aget_group_balances(group):
+    """
+    Async get_group_balances.
+    """
+    return balances_from_rows([row async for row in group_balance_rows(group)])
+
+
+def compute_pairs_from_splits(group):
+    """
+    Recompute {(debtor_id, creditor_id): Decimal} from what is unpaid on raw splits.
+    """
+    from .models import ExpenseSplit
+
+    rows = ExpenseSplit.objects.filter(
+        expense__group=group,
+        is_settled=False
+    ).values('user_id', 'expense__paid_by_id').annotate(total=Sum('amount_remaining'))
+
+    pairs = {}
+    for row in rows:
+        if row['user_id'] != row['expense__paid_by_id'] and row['total']:
+            pairs[(row['user_id'], row['expense__paid_by_id'])] = row['total']
+    return pairs
+
+
+def verify_group_ledger(group):
+    """
+    Compare the ledger with raw splits.
+    Returns a list of (debtor_id, creditor_id, ledger_amount, expected_amount) mismatches.
+    """
+    from .models import PairwiseBalance
+
+    expected = compute_pairs_from_splits(group)
+    actual = {
+        (debtor_id, creditor_id): amount
+        for debtor_id, creditor_id, amount in PairwiseBalance.objects.filter(
+            group=group
+        ).exclude(amount=0).values_list('debtor_id', 'creditor_id', 'amount')
+    }
+
+    mismatches = []
+    for pair in sorted(set(expected) | set(actual)):
+        ledger_amount = actual.get(pair, Decimal('0'))
+        expected_amount = expected.get(pair, Decimal('0'))
+        if ledger_amount != expected_amount:
+            mismatches.append((pair[0], pair[1], ledger_amount, expected_amount))
+    return mismatches
+
+
+def rebuild_group_ledger(group):
+    """
+    Bring a group's ledger back in line with totals recomputed from raw splits.
+    Differences are journaled as corrections so history stays replayable.
+    """
+    from .models import Group, PairwiseBalance
+
+    with transaction.atomic():
+        list(Group.objects.select_for_update().filter(pk=group.pk).values_list('pk', flat=True))
+        pairs = compute_pairs_from_splits(group)
+
+        corrections = defaultdict(Decimal)
+        for debtor_id, creditor_id, amount in PairwiseBalance.objects.filter(
+            group=group
+        ).values_list('debtor_id', 'creditor_id', 'amount'):
+            corrections[(debtor_id, creditor_id)] -= amount
+        for pair, amount in pairs.items():
+            corrections[pair] += amount
+
+        apply_deltas(group.pk, corrections, 'rebuild')
+    return len(pairs)
@@ -0,0 +1,233 @@
+# expenses/live.py
+
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, close_old_connections
+from django.db.models import Count
+from .models import Group, Expense
+from .cache import get_cached_balances, get_cached_simplified_balances, get_cached_statistics
+
+POLL_INTERVAL = getattr(settings, 'LIVE_POLL_INTERVAL', 1.0)
+# Comment lines sent on idle streams so proxies keep them open and dead clients are noticed
+HEARTBEAT_SECONDS = getattr(settings, 'LIVE_HEARTBEAT_SECONDS', 15)
+
+
+def expense_rows(group):
+    """
+    The group page's expense list, newest first, with payer and split count
+    loaded in the same query.
+    """
+    return Expense.objects.filter(group=group).select_related('paid_by').annotate(
+        split_count=Count('splits')
+    ).order_by('-date', '-id')
+
+
+def expense_payload(expense):
+    return {
+        'id': expense.id,
+        'description': expense.description,
+        'amount': str(expense.amount),
+        'paid_by': expense.paid_by.username,
+        'date': expense.date.isoformat(),
+        'split_count': expense.split_count,
+    }
+
+
+def sse(event, data, event_id=None):
+    """
+    One Server-Sent Events message.
+    """
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """
+    One open event stream. Events are queued from the poller thread, onto an
+    asyncio queue for ASGI streams (pass the running loop) or a thread-safe
+    queue for WSGI ones.
+    """
+
+    def __init__(self, group_id, version, loop=None):
+        self.group_id = group_id
+        self.version = version
+        self.loop = loop
+        self.events = asyncio.Queue() if loop else queue.SimpleQueue()
+
+    def put(self, message):
+        if self.loop is None:
+            self.events.put(message)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, message)
+        except RuntimeError:
+            # The stream's event loop is gone; it unsubscribes on its way out
+            pass
+
+
+class GroupState:
+    """
+    What subscribers of a group last saw: its version, ledger pairs and expense ids.
+    """
+
+    def __init__(self, group):
+        self.version = group.version
+        self.balances = self.pairs(get_cached_balances(group))
+        self.expense_ids = set(Expense.objects.filter(group=group).values_list('id', flat=True))
+
+    @staticmethod
+    def pairs(balances):
+        return {
+            (debtor, creditor): amount
+            for debtor, creditors in balances.items()
+            for creditor, amount in creditors.items()
+        }
+
+    def advance(self, group):
+        """
+        Move to the group's current version and return the change event:
+        ledger pairs whose amount changed (0 when paid off), added and removed
+        expenses, and the group's simplified settlements and statistics.
+        """
+        balances = self.pairs(get_cached_balances(group))
+        changed = [
+            [debtor, creditor, balances.get((debtor, creditor), 0)]
+            for debtor, creditor in sorted(set(balances) | set(self.balances))
+            if balances.get((debtor, creditor), 0) != self.balances.get((debtor, creditor), 0)
+        ]
+
+        expense_ids = set(Expense.objects.filter(group=group).values_list('id', flat=True))
+        added = expense_ids - self.expense_ids
+        removed = self.expense_ids - expense_ids
+
+        event = {
+            'version': group.version,
+            'previous': self.version,
+            'balances': changed,
+            'simplified': get_cached_simplified_balances(group),
+            'statistics': get_cached_statistics(group),
+            'expenses': {
+                'added': [expense_payload(expense) for expense in expense_rows(group).filter(id__in=added)],
+                'removed': sorted(removed),
+            },
+        }
+        self.version, self.balances, self.expense_ids = group.version, balances, expense_ids
+        return event
+
+
+class LiveHub:
+    """
+    Per-process fan-out of group changes to open event streams.
+
+    One poller thread watches every group that has subscribers with a single
+    query per tick on Group.version, which every expense, split, settlement
+    and membership write bumps. A change is turned into one event, from the
+    per-version result cache, and handed to every subscriber of the group,
+    so N open pages cost one query per tick and one event per write instead
+    of N full page reloads. The thread stops when the last stream closes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+        self.states = {}
+        self.thread = None
+
+    def subscribe(self, subscription):
+        with self.lock:
+            self.subscribers[subscription.group_id].add(subscription)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='live-hub', daemon=True)
+                self.thread.start()
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            watchers = self.subscribers.get(subscription.group_id)
+            if watchers is not None:
+                watchers.discard(subscription)
+                if not watchers:
+                    del self.subscribers[subscription.group_id]
+
+    def run(self):
+        try:
+            while True:
+                time.sleep(POLL_INTERVAL)
+                with self.lock:
+                    if not self.subscribers:
+                        self.thread = None
+                        return
+                    group_ids = list(self.subscribers)
+                    # Forget groups whose last stream closed since the previous tick
+                    self.states = {group_id: self.states[group_id] for group_id in group_ids if group_id in self.states}
+                close_old_connections()
+                try:
+                    self.poll(group_ids)
+                except Exception:
+                    # A failed tick (e.g. a dropped connection) is retried on the next one
+                    connection.close()
+        finally:
+            connection.close()
+
+    def poll(self, group_ids):
+        for group in Group.objects.filter(pk__in=group_ids).only('id', 'version'):
+            state = self.states.get(group.id)
+            event = None
+            if state is None:
+                state = self.states[group.id] = GroupState(group)
+            elif state.version != group.version:
+                event = state.advance(group)
+
+            change = sse('change', event, event_id=event['version']) if event else None
+            resync = sse('resync', {'version': state.version}, event_id=state.version)
+            with self.lock:
+                watchers = list(self.subscribers.get(group.id, ()))
+            for subscription in watchers:
+                if subscription.version == state.version:
+                    continue
+                if change and subscription.version == event['previous']:
+                    subscription.put(change)
+                else:
+                    # Too far behind for one delta (e.g. it connected mid-write); reload
+                    subscription.put(resync)
+                subscription.version = state.version
+
+
+hub = LiveHub()
+
+
+def stream(subscription):
+    """
+    The event stream for a WSGI response; holds its worker thread while open.
+    """
+    hub.subscribe(subscription)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                yield subscription.events.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def astream(subscription):
+    """
+    The event stream for an ASGI response; waits without holding a thread.
+    """
+    hub.subscribe(subscription)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.events.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
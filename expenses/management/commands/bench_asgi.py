@@ -0,0 +1,226 @@
+# expenses/management/commands/bench_asgi.py
+
+import asyncio
+import os
+import shlex
+import socket
+import subprocess
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from expenses.models import Group
+from .bench_endpoints import percentile
+
+SERVERS = {
+    # Threaded sync workers, the usual WSGI deployment
+    'sync': 'gunicorn expense_project.wsgi:application --worker-class gthread '
+            '--workers {workers} --threads {threads} --bind 127.0.0.1:{port} --log-level warning',
+    'async': 'uvicorn expense_project.asgi:application '
+             '--workers {workers} --host 127.0.0.1 --port {port} --log-level warning',
+}
+
+# Server environment: no result cache, so every request does its queries,
+# and no DEBUG query log growing for the length of the run
+SERVER_ENV = {
+    'CACHE_BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    'DEBUG': 'False',
+    'METRICS_ENABLED': 'False',
+}
+
+
+def endpoint_paths(group):
+    """
+    (name, sync path, async path) for the endpoints with native async versions.
+    The dashboard's sync counterpart is the HTML page built from the same query.
+    """
+    return [
+        ('balances', f'/api/groups/{group.id}/balances/', f'/api/async/groups/{group.id}/balances/'),
+        ('statistics', f'/api/groups/{group.id}/statistics/', f'/api/async/groups/{group.id}/statistics/'),
+        ('summary', '/api/users/me/summary/', '/api/async/users/me/summary/'),
+        ('dashboard', '/dashboard/', '/api/async/dashboard/'),
+    ]
+
+
+async def fetch(reader, writer, path, cookie):
+    """
+    One keep-alive HTTP/1.1 GET; returns the status code and whether the
+    server keeps the connection open.
+    """
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {key.lower(): value for key, value in headers.items()}
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def load(port, paths, cookie, concurrency, duration):
+    """
+    Keep `concurrency` connections busy with back-to-back requests for
+    `duration` seconds. Returns (latencies in ms, error count).
+    """
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+
+    async def client(offset):
+        nonlocal errors
+        i = offset
+        connection = None
+        while time.perf_counter() < deadline:
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection('127.0.0.1', port)
+                started = time.perf_counter()
+                status, keep_alive = await fetch(*connection, paths[i % len(paths)], cookie)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += status != 200
+                if not keep_alive:
+                    connection[1].close()
+                    connection = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+            i += 1
+        if connection is not None:
+            connection[1].close()
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the balance, statistics, summary and dashboard endpoints at high '
+        'concurrency, served by sync gunicorn workers and by uvicorn with the native '
+        'async views, against the current database (seed it with seed_data first).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='sync,async',
+                            help='Comma separated servers to run: sync, async.')
+        parser.add_argument('--concurrency', default='16,64,256',
+                            help='Comma separated numbers of concurrent connections.')
+        parser.add_argument('--duration', type=float, default=15,
+                            help='Seconds per concurrency level.')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads per gunicorn worker.')
+        parser.add_argument('--user', default='load0',
+                            help='Username to run the requests as.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--only', default='',
+                            help='Comma separated endpoint names, e.g. "balances,summary".')
+        parser.add_argument('--sync-command', default=SERVERS['sync'],
+                            help='Server command for the sync mode; {port}, {workers} and {threads} are filled in.')
+        parser.add_argument('--async-command', default=SERVERS['async'],
+                            help='Server command for the async mode.')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        if set(modes) - set(SERVERS):
+            raise CommandError(f'--modes must be drawn from {", ".join(SERVERS)}')
+        levels = [int(level) for level in options['concurrency'].split(',') if level]
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user "{options["user"]}"; run seed_data first or pass --user')
+        group = max(
+            Group.objects.filter(members=user), key=lambda group: group.expenses.count(), default=None
+        )
+        if group is None:
+            raise CommandError('The user is not a member of any group')
+
+        only = [name for name in options['only'].split(',') if name]
+        endpoints = [spec for spec in endpoint_paths(group) if not only or spec[0] in only]
+
+        # A real session row, sent by every connection as its cookie
+        browser = Client()
+        browser.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={browser.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        results = []
+        for mode in modes:
+            paths = [sync_path if mode == 'sync' else async_path for _, sync_path, async_path in endpoints]
+            command = options[f'{mode}_command'].format(
+                port=options['port'], workers=options['workers'], threads=options['threads']
+            )
+            self.stderr.write(f'{mode}: {command}')
+            try:
+                process = subprocess.Popen(
+                    shlex.split(command), env={**os.environ, **SERVER_ENV},
+                    cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL,
+                )
+            except FileNotFoundError:
+                raise CommandError(f'Cannot run "{command}"; install the server or pass --{mode}-command')
+            try:
+                if not wait_for_port(options['port'], process):
+                    raise CommandError(f'{mode} server did not start')
+                # Warm up imports, connections and worker pools
+                asyncio.run(load(options['port'], paths, cookie, 4, 1))
+                for level in levels:
+                    latencies, errors = asyncio.run(
+                        load(options['port'], paths, cookie, level, options['duration'])
+                    )
+                    results.append(self.summarize(mode, level, latencies, errors, options['duration']))
+                    self.stderr.write(f'  {level} connections: {results[-1]["rps"]:.1f} req/s')
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+        self.stdout.write(
+            f"{'mode':<8} {'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<8} {result['concurrency']:>6} {result['rps']:>9.1f} "
+                f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                f"{result['errors']:>7}"
+            )
+
+    def summarize(self, mode, level, latencies, errors, duration):
+        return {
+            'mode': mode,
+            'concurrency': level,
+            'rps': len(latencies) / duration,
+            'p50_ms': percentile(latencies, 50) if latencies else 0,
+            'p95_ms': percentile(latencies, 95) if latencies else 0,
+            'p99_ms': percentile(latencies, 99) if latencies else 0,
+            'errors': errors,
+        }
@@ -0,0 +1,64 @@
+# expenses/management/commands/bench_batch_simplify.py
+
+import random
+import time
+from django.core.management.base import BaseCommand
+from expenses.utils import greedy_simplify_debts, simplify_debts_batch
+
+
+def random_groups(rng, group_count, members):
+    """
+    Flat (group id, user id, cents) deltas plus the same data as per-group balance dicts.
+    """
+    group_ids, user_ids, cents = [], [], []
+    per_group = []
+    for group_id in range(group_count):
+        balances = {}
+        for _ in range(members):
+            debtor, creditor = rng.sample(range(members), 2)
+            amount = rng.randint(1, 50000)
+            group_ids += [group_id, group_id]
+            user_ids += [debtor, creditor]
+            cents += [-amount, amount]
+            balances.setdefault(debtor, {})
+            balances[debtor][creditor] = round(balances[debtor].get(creditor, 0) + amount / 100, 2)
+        per_group.append(balances)
+    return group_ids, user_ids, cents, per_group
+
+
+class Command(BaseCommand):
+    help = 'Benchmark simplify_debts_batch against calling the greedy simplifier once per group.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', default='1000,10000,100000',
+                            help='Comma separated group counts to benchmark.')
+        parser.add_argument('--members', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'groups':>8} {'loop s':>10} {'batch s':>10} {'speedup':>8} {'transfers':>10}")
+
+        for group_count in [int(count) for count in options['groups'].split(',')]:
+            group_ids, user_ids, cents, per_group = random_groups(rng, group_count, options['members'])
+
+            started = time.perf_counter()
+            loop_transfers = sum(len(greedy_simplify_debts(balances)) for balances in per_group)
+            loop_elapsed = time.perf_counter() - started
+
+            arrays = np.array(group_ids), np.array(user_ids), np.array(cents)
+            started = time.perf_counter()
+            transfers = simplify_debts_batch(*arrays)
+            batch_elapsed = time.perf_counter() - started
+
+            if len(transfers) != loop_transfers:
+                self.stdout.write(self.style.WARNING(
+                    f'  transfer count differs: loop {loop_transfers}, batch {len(transfers)}'
+                ))
+
+            self.stdout.write(
+                f'{group_count:>8} {loop_elapsed:>10.3f} {batch_elapsed:>10.3f} '
+                f'{loop_elapsed / batch_elapsed:>7.1f}x {len(transfers):>10}'
+            )
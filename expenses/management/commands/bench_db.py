@@ -0,0 +1,199 @@
+# expenses/management/commands/bench_db.py
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, close_old_connections
+from django.test import Client
+from expenses.models import Group
+from .bench_endpoints import percentile
+
+# Environment overrides for each database setup worth comparing. The cache is
+# switched off so every request really reaches the database.
+MODES = {
+    'sqlite': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNED': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNED': 'True', 'DB_CONN_MAX_AGE': '60'},
+    'postgresql': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'postgresql-persistent': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'},
+    'postgresql-pool': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'True'},
+}
+NO_CACHE = {'CACHE_BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+def read_paths(group):
+    return [
+        f'/api/groups/{group.id}/balances/',
+        f'/api/expenses/?group={group.id}',
+        f'/api/settlements/?group={group.id}',
+        f'/api/users/?group={group.id}',
+        '/api/groups/',
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests per second for the balance and list API endpoints under concurrent clients. '
+        'With --modes, reruns itself once per database setup and prints a comparison; each '
+        'database must already be migrated and seeded (DB_ENGINE=postgresql manage.py migrate '
+        'and seed_data for the PostgreSQL modes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes',
+                            help=f'Comma separated setups to compare: {", ".join(MODES)}.')
+        parser.add_argument('--user', default='load0',
+                            help='Username to run the requests as.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Concurrent reader threads, each with its own connection.')
+        parser.add_argument('--writers', type=int, default=0,
+                            help='Extra threads posting expenses (adds rows to the database).')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds to run each setup for.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the result for the current setup as one JSON line.')
+
+    def handle(self, *args, **options):
+        if options['modes']:
+            return self.compare(options)
+
+        result = self.run(options)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.print_results({self.current_mode(): result})
+
+    def current_mode(self):
+        if connection.vendor == 'sqlite':
+            return 'sqlite-tuned' if settings.SQLITE_TUNED else 'sqlite'
+        return connection.vendor
+
+    def compare(self, options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = [mode for mode in modes if mode not in MODES]
+        if unknown:
+            raise CommandError(f'Unknown mode(s) {", ".join(unknown)}; choose from {", ".join(MODES)}')
+
+        results = {}
+        for mode in modes:
+            self.stderr.write(f'{mode} ...')
+            command = [
+                sys.executable, sys.argv[0], 'bench_db', '--json',
+                '--user', options['user'],
+                '--threads', str(options['threads']),
+                '--writers', str(options['writers']),
+                '--duration', str(options['duration']),
+            ]
+            env = {**os.environ, **MODES[mode], **NO_CACHE}
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode != 0:
+                self.stderr.write(f'{mode} failed: {completed.stderr.strip().splitlines()[-1:]}')
+                continue
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+        self.print_results(results)
+
+    def run(self, options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user "{options["user"]}"; run seed_data first or pass --user')
+        group = Group.objects.filter(members=user).order_by('pk').first()
+        if group is None:
+            raise CommandError('The user is not a member of any group')
+        other_member = group.members.exclude(pk=user.pk).first()
+
+        # journal_mode is stored in the database file, so undo an earlier tuned run
+        if connection.vendor == 'sqlite' and not settings.SQLITE_TUNED:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+        close_old_connections()
+        connection.close()
+
+        paths = read_paths(group)
+        deadline = time.perf_counter() + options['duration']
+        latencies = []
+        writes = []
+        errors = []
+        lock = threading.Lock()
+
+        def client():
+            # Clients log in with a session row, like a browser would
+            browser = Client(HTTP_HOST='localhost')
+            browser.force_login(user)
+            return browser
+
+        def reader(offset):
+            browser = client()
+            timings, failed, i = [], 0, offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = browser.get(paths[i % len(paths)])
+                response.content
+                # The test client skips request_finished's connection cleanup;
+                # run it so CONN_MAX_AGE and the pool behave as under a server
+                close_old_connections()
+                timings.append((time.perf_counter() - started) * 1000)
+                failed += response.status_code != 200
+                i += 1
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+                errors.append(failed)
+
+        def writer():
+            browser = client()
+            count, failed = 0, 0
+            body = json.dumps({
+                'group': group.id,
+                'description': 'Benchmark expense',
+                'amount': '12.00',
+                'date': date.today().isoformat(),
+                'split_members': [user.id] + ([other_member.id] if other_member else []),
+            })
+            while time.perf_counter() < deadline:
+                response = browser.post('/api/expenses/', body, content_type='application/json')
+                close_old_connections()
+                failed += response.status_code != 201
+                count += 1
+            connection.close()
+            with lock:
+                writes.append(count)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['threads'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'database': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'threads': options['threads'],
+            'writers': options['writers'],
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1),
+            'writes_per_second': round(sum(writes) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+            'errors': sum(errors),
+        }
+
+    def print_results(self, results):
+        self.stdout.write(
+            f"{'mode':<24} {'req/s':>9} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<24} {result['rps']:>9.1f} {result['writes_per_second']:>9.1f} "
+                f"{result['p50_ms'] or 0:>8.2f} {result['p95_ms'] or 0:>8.2f} {result['errors']:>7}"
+            )
@@ -0,0 +1,255 @@
+# expenses/management/commands/bench_endpoints.py
+
+import io
+import json
+import math
+import platform
+import time
+import tracemalloc
+import django
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from expenses.models import Group, Expense, ExpenseSplit, Settlement
+
+
+def percentile(samples, percent):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def endpoint_specs(user, group, expense, other_member):
+    """
+    (name, method, path, data) for every web and API endpoint worth timing.
+    POST bodies are callables so uploads get a fresh file each time.
+    """
+    today = date.today().isoformat()
+    expense_data = {
+        'group': group.id,
+        'description': 'Benchmark expense',
+        'amount': '42.00',
+        'date': today,
+        'split_members': [user.id, other_member.id],
+    }
+
+    def csv_upload():
+        upload = io.BytesIO(
+            b'Date,Description,Amount,Paid By,Split Among\n'
+            + b''.join(f'{today},Row {i},12.50,,\n'.encode() for i in range(100))
+        )
+        upload.name = 'bench.csv'
+        return {'file': upload}
+
+    return [
+        # Web pages
+        ('web:home', 'get', '/', None),
+        ('web:dashboard', 'get', '/dashboard/', None),
+        ('web:profile', 'get', '/profile/', None),
+        ('web:group_detail', 'get', f'/group/{group.id}/', None),
+        ('web:add_expense_form', 'get', f'/group/{group.id}/add-expense/', None),
+        ('web:add_expense', 'post', f'/group/{group.id}/add-expense/', lambda: {
+            'description': 'Benchmark expense', 'amount': '42.00', 'date': today,
+            'split_members': [user.id, other_member.id],
+        }),
+        ('web:settle_debt', 'post', f'/group/{group.id}/settle-debt/', lambda: {
+            'paid_to': other_member.id, 'amount': '10.00',
+        }),
+        ('web:delete_expense', 'post', f'/delete-expense/{expense.id}/', lambda: {}),
+        ('web:export_csv', 'get', f'/group/{group.id}/export/', None),
+        ('web:export_csv_gzip', 'get', f'/group/{group.id}/export/?compress=gzip', None),
+        ('web:import_csv', 'post', f'/group/{group.id}/import/', csv_upload),
+        ('web:add_members_form', 'get', f'/group/{group.id}/add-members/', None),
+        # API
+        ('api:groups', 'get', '/api/groups/', None),
+        ('api:group_detail', 'get', f'/api/groups/{group.id}/', None),
+        ('api:group_balances', 'get', f'/api/groups/{group.id}/balances/', None),
+        ('api:group_balances_as_of', 'get', f'/api/groups/{group.id}/balances/?as_of=2024-06-30', None),
+        ('api:group_statistics', 'get', f'/api/groups/{group.id}/statistics/', None),
+        ('api:group_import', 'post', f'/api/groups/{group.id}/import/', csv_upload),
+        ('api:expenses', 'get', f'/api/expenses/?group={group.id}', None),
+        ('api:expense_detail', 'get', f'/api/expenses/{expense.id}/', None),
+        ('api:expense_create', 'post', '/api/expenses/', lambda: json.dumps(expense_data)),
+        ('api:expense_bulk', 'post', '/api/expenses/bulk/', lambda: json.dumps([expense_data] * 50)),
+        ('api:settlements', 'get', f'/api/settlements/?group={group.id}', None),
+        ('api:users', 'get', f'/api/users/?group={group.id}', None),
+        ('api:exports', 'get', '/api/exports/', None),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every web and API endpoint through the test client against the current '
+        'database (seed it with seed_data first) and report latency, queries and memory as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='load0',
+                            help='Username to run the requests as.')
+        parser.add_argument('--group', type=int,
+                            help='Group id to exercise; defaults to the user\'s largest group.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', default='',
+                            help='Comma separated endpoint name prefixes, e.g. "api:,web:dashboard".')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', help='Print p50/p95/query changes against an earlier report.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user "{options["user"]}"; run seed_data first or pass --user')
+
+        groups = Group.objects.filter(members=user)
+        if options['group']:
+            groups = groups.filter(pk=options['group'])
+        group = max(groups, key=lambda group: group.expenses.count(), default=None)
+        if group is None:
+            raise CommandError('The user is not a member of any matching group')
+
+        expense = group.expenses.order_by('-date', '-id').first()
+        other_member = group.members.exclude(pk=user.pk).first()
+        if expense is None or other_member is None:
+            raise CommandError('The group needs at least one expense and two members')
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+
+        prefixes = [prefix for prefix in options['only'].split(',') if prefix]
+        specs = [
+            spec for spec in endpoint_specs(user, group, expense, other_member)
+            if not prefixes or spec[0].startswith(tuple(prefixes))
+        ]
+
+        endpoints = {}
+        for name, method, path, data in specs:
+            self.stderr.write(f'{name} ...')
+            endpoints[name] = self.measure(client, method, path, data, options)
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'group_id': group.id,
+                'group_members': group.members.count(),
+                'group_expenses': group.expenses.count(),
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'expenses': Expense.objects.count(),
+                'splits': ExpenseSplit.objects.count(),
+                'settlements': Settlement.objects.count(),
+            },
+            'settings': {
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'cold_cache': options['cold'],
+            },
+            'endpoints': endpoints,
+        }
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f)['endpoints'], endpoints)
+
+    def request(self, client, method, path, data, cold):
+        """
+        Issue one request and read the whole body, streamed or not.
+        """
+        if cold:
+            cache.clear()
+
+        if method == 'get':
+            response = client.get(path)
+        else:
+            body = data()
+            if isinstance(body, str):
+                response = client.post(path, body, content_type='application/json')
+            else:
+                response = client.post(path, body)
+
+        if response.streaming:
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        return response
+
+    def measure(self, client, method, path, data, options):
+        """
+        Time one endpoint. Writes run in a transaction that is rolled back, so
+        every iteration sees the same data and reruns stay comparable.
+        """
+        def run():
+            if method == 'get':
+                return self.request(client, method, path, data, options['cold'])
+            with transaction.atomic():
+                response = self.request(client, method, path, data, options['cold'])
+                transaction.set_rollback(True)
+            # Results cached inside the rolled back transaction are stale now
+            cache.clear()
+            return response
+
+        for _ in range(options['warmup']):
+            run()
+
+        timings = []
+        for _ in range(options['iterations']):
+            started = time.perf_counter()
+            response = run()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Query counting and allocation tracing add overhead, so they get their own pass
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def print_comparison(self, before, after):
+        self.stderr.write(f"{'endpoint':<28} {'p50 ms':>16} {'p95 ms':>16} {'queries':>10}")
+        for name, result in after.items():
+            old = before.get(name)
+            if old is None:
+                continue
+            self.stderr.write(
+                f"{name:<28} "
+                f"{old['p50_ms']:>7.2f} -> {result['p50_ms']:<6.2f} "
+                f"{old['p95_ms']:>7.2f} -> {result['p95_ms']:<6.2f} "
+                f"{old['queries']:>4} -> {result['queries']:<4}"
+            )
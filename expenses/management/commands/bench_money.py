@@ -0,0 +1,112 @@
+# expenses/management/commands/bench_money.py
+
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from expenses.money import CENT, to_cents, split_cents
+
+
+def split_float(amount, parts):
+    # The DecimalField rounds the stored share to cents
+    share = round(float(amount) / parts, 2)
+    return [share] * parts
+
+
+def split_decimal(amount, parts):
+    share = (Decimal(str(amount)) / parts).quantize(CENT)
+    return [share] * parts
+
+
+def split_integer(cents, parts):
+    return split_cents(cents, parts)
+
+
+def accumulate_float(rows):
+    balances = defaultdict(float)
+    for debtor, creditor, amount in rows:
+        balances[debtor] -= float(amount)
+        balances[creditor] += float(amount)
+    return balances
+
+
+def accumulate_decimal(rows):
+    balances = defaultdict(Decimal)
+    for debtor, creditor, amount in rows:
+        balances[debtor] -= Decimal(str(amount))
+        balances[creditor] += Decimal(str(amount))
+    return balances
+
+
+def accumulate_integer(rows):
+    balances = defaultdict(int)
+    for debtor, creditor, cents in rows:
+        balances[debtor] -= cents
+        balances[creditor] += cents
+    return balances
+
+
+class Command(BaseCommand):
+    help = 'Compare float, Decimal and integer-cent money arithmetic for splitting and balance accumulation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=100000,
+                            help='Expense amounts to split.')
+        parser.add_argument('--rows', type=int, default=200000,
+                            help='Split rows to accumulate into balances.')
+        parser.add_argument('--members', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def time(self, func, inputs):
+        started = time.perf_counter()
+        results = [func(*args) for args in inputs]
+        return (time.perf_counter() - started) * 1000, results
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        members = options['members']
+
+        # Splitting: are the shares fast, and do they add back up to the expense?
+        cents = [(rng.randint(1, 100000), rng.randint(2, members)) for _ in range(options['expenses'])]
+        decimals = [(Decimal(total).scaleb(-2), parts) for total, parts in cents]
+
+        self.stdout.write(f"{'split':>10} {'ms':>10} {'ns/split':>10} {'off by':>12}")
+        for name, func, inputs, exact in (
+            ('float', split_float, decimals, lambda shares, total: round(sum(shares) * 100) == total),
+            ('decimal', split_decimal, decimals, lambda shares, total: to_cents(sum(shares)) == total),
+            ('cents', split_integer, cents, lambda shares, total: sum(shares) == total),
+        ):
+            elapsed, results = self.time(func, inputs)
+            wrong = sum(1 for shares, (total, _) in zip(results, cents) if not exact(shares, total))
+            self.stdout.write(
+                f'{name:>10} {elapsed:>10.1f} {elapsed * 1e6 / len(inputs):>10.0f} '
+                f'{wrong:>7} splits'
+            )
+
+        # Accumulation: the hot loop behind per-member balances
+        people = [f'user{i}' for i in range(members)]
+        rows = []
+        for _ in range(options['rows']):
+            debtor, creditor = rng.sample(people, 2)
+            rows.append((debtor, creditor, rng.randint(1, 50000)))
+        decimal_rows = [(debtor, creditor, Decimal(amount).scaleb(-2)) for debtor, creditor, amount in rows]
+
+        self.stdout.write('')
+        self.stdout.write(f"{'accumulate':>10} {'ms':>10} {'ns/row':>10} {'max drift':>12}")
+        exact = accumulate_integer(rows)
+        for name, func, inputs in (
+            ('float', accumulate_float, decimal_rows),
+            ('decimal', accumulate_decimal, decimal_rows),
+            ('cents', accumulate_integer, rows),
+        ):
+            started = time.perf_counter()
+            balances = func(inputs)
+            elapsed = (time.perf_counter() - started) * 1000
+            if name == 'cents':
+                drift = 0.0
+            else:
+                drift = max(abs(float(balances[person]) * 100 - exact[person]) for person in exact)
+            self.stdout.write(
+                f'{name:>10} {elapsed:>10.1f} {elapsed * 1e6 / len(inputs):>10.0f} {drift:>9.2e} ct'
+            )
@@ -0,0 +1,54 @@
+# expenses/management/commands/bench_simplify.py
+
+import random
+import time
+from django.core.management.base import BaseCommand
+from expenses.solver import net_positions, solve
+from expenses.utils import greedy_simplify_debts
+
+
+def random_balances(rng, members, debts):
+    """
+    Random {debtor: {creditor: amount}} graph with two-decimal amounts.
+    """
+    people = [f'user{i}' for i in range(members)]
+    balances = {}
+    for _ in range(debts):
+        debtor, creditor = rng.sample(people, 2)
+        amount = rng.randint(1, 50000) / 100
+        balances.setdefault(debtor, {})
+        balances[debtor][creditor] = round(balances[debtor].get(creditor, 0) + amount, 2)
+    return balances
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark the debt simplifier strategies against the original greedy pass.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='4,8,12,16,24,50',
+                            help='Comma separated member counts to benchmark.')
+        parser.add_argument('--graphs', type=int, default=50,
+                            help='Random balance graphs per size.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        self.stdout.write(f"{'members':>8} {'strategy':>10} {'ms/graph':>10} {'transfers':>10}")
+        for members in sizes:
+            graphs = [random_balances(rng, members, members * 3) for _ in range(options['graphs'])]
+
+            runs = [('greedy', lambda balances: greedy_simplify_debts(balances))]
+            for strategy in ('heuristic', 'auto', 'exact'):
+                if strategy == 'exact' and members > 18:
+                    continue
+                runs.append((strategy, lambda balances, strategy=strategy: solve(net_positions(balances), strategy)))
+
+            for name, run in runs:
+                transfers = 0
+                started = time.perf_counter()
+                for balances in graphs:
+                    transfers += len(run(balances))
+                elapsed = (time.perf_counter() - started) * 1000 / len(graphs)
+                self.stdout.write(f'{members:>8} {name:>10} {elapsed:>10.3f} {transfers / len(graphs):>10.2f}')
@@ -0,0 +1,25 @@
+# expenses/management/commands/checkpoint_balances.py
+
+from django.core.management.base import BaseCommand
+from expenses.models import Group
+from expenses.ledger import create_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every group ledger so "balances as of" queries replay a short journal tail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='group_ids',
+                            help='Only checkpoint this group id (can be repeated).')
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        count = 0
+        for group_id in groups.values_list('id', flat=True).iterator():
+            create_checkpoint(group_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Created {count} checkpoint(s)'))
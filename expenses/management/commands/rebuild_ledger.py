@@ -0,0 +1,47 @@
+# expenses/management/commands/rebuild_ledger.py
+
+from django.core.management.base import BaseCommand, CommandError
+from expenses.models import Group
+from expenses.ledger import rebuild_group_ledger, verify_group_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pairwise balance ledger from raw expense splits and verify it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='group_ids',
+                            help='Only process this group id (can be repeated).')
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Report mismatches without rewriting the ledger.')
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        mismatched_groups = 0
+        for group in groups.iterator():
+            mismatches = verify_group_ledger(group)
+
+            if mismatches:
+                mismatched_groups += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Group {group.id} ({group.name}): {len(mismatches)} mismatched pair(s)'
+                ))
+                for debtor_id, creditor_id, ledger_amount, expected_amount in mismatches:
+                    self.stdout.write(
+                        f'  {debtor_id} -> {creditor_id}: ledger {ledger_amount}, splits {expected_amount}'
+                    )
+
+            if options['verify_only']:
+                continue
+
+            pairs = rebuild_group_ledger(group)
+            if verify_group_ledger(group):
+                raise CommandError(f'Ledger for group {group.id} still mismatched after rebuild')
+            self.stdout.write(f'Group {group.id}: rebuilt {pairs} pair(s)')
+
+        if options['verify_only'] and mismatched_groups:
+            raise CommandError(f'{mismatched_groups} group(s) have a ledger that does not match their splits')
+
+        self.stdout.write(self.style.SUCCESS('Ledger OK'))
@@ -0,0 +1,64 @@
+# expenses/management/commands/run_worker.py
+
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from expenses.tasks import claim, run, requeue_stale, worker_id
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background tasks from the database queue (archive exports, statistics '
+        'refreshes, ledger rebuilds). Start as many workers as needed; each task is '
+        'claimed by exactly one of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no task is ready instead of waiting for more.')
+        parser.add_argument('--sleep', type=float, default=getattr(settings, 'TASK_POLL_INTERVAL', 1.0),
+                            help='Seconds to wait between polls of an empty queue.')
+        parser.add_argument('--max-tasks', type=int, default=0,
+                            help='Exit after running this many tasks (0 for no limit).')
+        parser.add_argument('--min-priority', type=int, default=None,
+                            help='Only run tasks with at least this priority, e.g. 10 for a worker '
+                                 'kept free for statistics refreshes.')
+
+    def handle(self, *args, **options):
+        worker = worker_id()
+        self.stopping = False
+        # Finish the task in hand on SIGTERM/SIGINT, then exit
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stderr.write(f'Worker {worker} started')
+        done = 0
+        while not self.stopping:
+            close_old_connections()
+            task = claim(worker, min_priority=options['min_priority'])
+            if task is None:
+                requeued = requeue_stale()
+                if requeued:
+                    self.stderr.write(f'Put back {requeued} task(s) left running by a stopped worker')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.perf_counter()
+            task = run(task)
+            self.stdout.write(
+                f'Task {task.id} {task.name}: {task.status} in {time.perf_counter() - started:.2f}s'
+                + (f' ({task.error})' if task.error else '')
+            )
+            done += 1
+            if options['max_tasks'] and done >= options['max_tasks']:
+                break
+
+        self.stderr.write(f'Worker {worker} stopped after {done} task(s)')
+
+    def stop(self, signum, frame):
+        self.stopping = True
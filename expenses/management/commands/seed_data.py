@@ -0,0 +1,187 @@
+# expenses/management/commands/seed_data.py
+
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from expenses.ledger import apply_journal_entries
+from expenses.models import Group, ExpenseSplit, Settlement
+from expenses.writers import create_expenses
+
+# Every seeded expense falls in the year before this date
+SEED_END_DATE = date(2024, 12, 31)
+
+# Markers that tell seeded rows apart from real accounts and groups
+SEED_EMAIL_DOMAIN = 'seed.invalid'
+SEED_DESCRIPTION = 'Seeded load data'
+
+
+def seeded_users(prefix):
+    """
+    Users created by seed_dataset with this prefix: <prefix><n>@seed.invalid,
+    never a real account that merely starts with the prefix.
+    """
+    return User.objects.filter(
+        username__regex=rf'^{re.escape(prefix)}[0-9]+$',
+        email__endswith=f'@{SEED_EMAIL_DOMAIN}',
+    )
+
+
+def seed_dataset(users=200, groups=20, members=8, expenses=500, fanout=4,
+                 settlement_ratio=0.2, seed=1, prefix='load', password='password'):
+    """
+    Insert a synthetic dataset with bulk writes and return row counts.
+
+    The same arguments always produce the same users, groups, expenses,
+    splits and settlements, so benchmark runs against it can be compared.
+    Users are named <prefix><n> and all share one password.
+    """
+    rng = random.Random(seed)
+    members = min(members, users)
+    fanout = max(1, min(fanout, members))
+
+    with transaction.atomic():
+        # Hashing is deliberately slow, so hash once and reuse it
+        password_hash = make_password(password, salt=f'{prefix}{seed}')
+        people = User.objects.bulk_create([
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@{SEED_EMAIL_DOMAIN}', password=password_hash)
+            for i in range(users)
+        ])
+        user_ids = [person.pk for person in people]
+        if None in user_ids:
+            # Backends that don't return ids from bulk inserts
+            ids = dict(User.objects.filter(
+                username__in=[person.username for person in people]
+            ).values_list('username', 'id'))
+            user_ids = [ids[person.username] for person in people]
+
+        member_ids_by_group = []
+        for index in range(groups):
+            # The first user belongs to every group so a single login sees it all
+            chosen = [user_ids[0]] + rng.sample(user_ids[1:], members - 1)
+            member_ids_by_group.append(chosen)
+
+        created_groups = Group.objects.bulk_create([
+            Group(name=f'{prefix} group {index}', description=SEED_DESCRIPTION, created_by_id=chosen[0])
+            for index, chosen in enumerate(member_ids_by_group)
+        ])
+        Group.members.through.objects.bulk_create([
+            Group.members.through(group_id=group.pk, user_id=user_id)
+            for group, chosen in zip(created_groups, member_ids_by_group)
+            for user_id in chosen
+        ])
+
+        items = []
+        for group, chosen in zip(created_groups, member_ids_by_group):
+            for index in range(expenses):
+                payer = rng.choice(chosen)
+                items.append({
+                    'group': group,
+                    'description': f'Expense {index}',
+                    'amount': Decimal(rng.randint(100, 50000)) / 100,
+                    'paid_by_id': payer,
+                    'date': SEED_END_DATE - timedelta(days=rng.randrange(365)),
+                    'split_members': rng.sample(chosen, fanout),
+                })
+        created_expenses = create_expenses(items)
+
+        # Settle a share of the splits owed to someone else, one settlement each
+        payer_by_expense = {expense.pk: (expense.group_id, expense.paid_by_id) for expense in created_expenses}
+        settled_splits = []
+        settlements = []
+        for split in ExpenseSplit.objects.filter(
+            expense_id__in=payer_by_expense
+        ).order_by('id').only('id', 'expense_id', 'user_id', 'amount_owed', 'amount_remaining'):
+            group_id, payer_id = payer_by_expense[split.expense_id]
+            if split.user_id == payer_id or rng.random() >= settlement_ratio:
+                continue
+            split.is_settled = True
+            split.amount_remaining = 0
+            settled_splits.append(split)
+            settlements.append(Settlement(
+                group_id=group_id,
+                paid_by_id=split.user_id,
+                paid_to_id=payer_id,
+                amount=split.amount_owed
+            ))
+
+        ExpenseSplit.objects.bulk_update(settled_splits, ['is_settled', 'amount_remaining'], batch_size=500)
+        Settlement.objects.bulk_create(settlements, batch_size=500)
+
+        entries_by_group = {}
+        for settlement in settlements:
+            entries_by_group.setdefault(settlement.group_id, []).append((
+                settlement.paid_by_id, settlement.paid_to_id, -settlement.amount,
+                'settlement', None, settlement
+            ))
+        for group_id, entries in entries_by_group.items():
+            apply_journal_entries(group_id, entries)
+
+    return {
+        'users': users,
+        'groups': groups,
+        'members_per_group': members,
+        'expenses': len(created_expenses),
+        'splits': len(created_expenses) * fanout,
+        'settlements': len(settlements),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Seed a deterministic synthetic dataset for load testing and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--members', type=int, default=8,
+                            help='Members per group.')
+        parser.add_argument('--expenses', type=int, default=500,
+                            help='Expenses per group.')
+        parser.add_argument('--fanout', type=int, default=4,
+                            help='Members each expense is split among.')
+        parser.add_argument('--settlement-ratio', type=float, default=0.2,
+                            help='Share of owed splits that get settled.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='load',
+                            help='Username prefix for seeded users.')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete previously seeded users and seeded groups first.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2')
+        if options['members'] < 2:
+            raise CommandError('--members must be at least 2')
+
+        existing = seeded_users(options['prefix'])
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(
+                    f'Seeded users with prefix "{options["prefix"]}" already exist; pass --flush to replace them'
+                )
+            Group.objects.filter(created_by__in=existing, description=SEED_DESCRIPTION).delete()
+            existing.delete()
+
+        usernames = [f'{options["prefix"]}{i}' for i in range(options['users'])]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError(f'Real accounts already use "{options["prefix"]}<n>" names; pick another --prefix')
+
+        counts = seed_dataset(
+            users=options['users'],
+            groups=options['groups'],
+            members=options['members'],
+            expenses=options['expenses'],
+            fanout=options['fanout'],
+            settlement_ratio=options['settlement_ratio'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+        ))
@@ -0,0 +1,214 @@
+# expenses/metrics.py
+
+import asyncio
+import atexit
+import bisect
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from django.conf import settings
+
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+METRICS_DIR = getattr(settings, 'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'expense-splitter-metrics'))
+# Seconds between writes of this process's file; /metrics always writes first
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'expense_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'expense_engine_duration_seconds': ('histogram', 'Time spent in balance, simplification and statistics engines.'),
+    'expense_expenses_written_total': ('counter', 'Expenses inserted.'),
+    'expense_splits_written_total': ('counter', 'Expense splits inserted.'),
+    'expense_export_rows_total': ('counter', 'CSV rows streamed by exports.'),
+    'expense_tasks_total': ('counter', 'Background tasks run, by task name and outcome.'),
+    'expense_task_duration_seconds': ('histogram', 'Background task run time by name.'),
+}
+
+
+class Registry:
+    """
+    Counters and histograms for this process.
+
+    Each process writes its values to <METRICS_DIR>/<pid>-<random>.json, and
+    the /metrics view adds up every file in the directory, so gunicorn
+    workers report as one. Files of exited workers are kept, and a new
+    process never reuses one even when it gets a dead worker's pid, so
+    totals never go backwards; clear the directory on deploy.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = None
+        self.filename = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.dirty = False
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.dirty = True
+        self.flush_if_due()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            histogram['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+            self.dirty = True
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if time.monotonic() - self.last_flush >= METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Atomically replace this process's file with its current values.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), histogram] for (name, labels), histogram in self.histograms.items()],
+            }
+            self.dirty = False
+            self.last_flush = time.monotonic()
+            if self.pid != os.getpid():
+                # First write in this process (the registry may predate a fork)
+                self.pid = os.getpid()
+                self.filename = f'{self.pid}-{uuid.uuid4().hex[:12]}.json'
+            filename = self.filename
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        partial = f'{path}.{threading.get_ident()}.tmp'
+        with open(partial, 'w') as f:
+            json.dump(data, f)
+        os.replace(partial, path)
+
+    def collect(self):
+        """
+        Sum the values written by every process.
+        """
+        self.flush()
+        counters = {}
+        histograms = {}
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except FileNotFoundError:
+            names = []
+
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for metric, labels, value in data['counters']:
+                key = (metric, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0) + value
+            for metric, labels, histogram in data['histograms']:
+                key = (metric, tuple(sorted(labels.items())))
+                total = histograms.setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+                total['sum'] += histogram['sum']
+                total['count'] += histogram['count']
+
+        return counters, histograms
+
+
+registry = Registry(METRICS_DIR)
+atexit.register(registry.flush)
+
+
+def inc(name, value=1, **labels):
+    if METRICS_ENABLED and value:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    if METRICS_ENABLED:
+        registry.observe(name, seconds, **labels)
+
+
+def timed(engine):
+    """
+    Decorator recording a function's duration as an engine histogram.
+    Works on coroutine functions too.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe('expense_engine_duration_seconds', time.perf_counter() - started, engine=engine)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe('expense_engine_duration_seconds', time.perf_counter() - started, engine=engine)
+        return wrapper
+    return decorator
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    counters, histograms = registry.collect()
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+    return '\n'.join(lines) + '\n'
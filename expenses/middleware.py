@@ -0,0 +1,216 @@
+# expenses/middleware.py
+
+import json
+import logging
+import math
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from . import metrics, routers
+
+slow_log = logging.getLogger('expenses.sql')
+
+# Literals and placeholder lists that differ between otherwise identical queries
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:,\s*(?:%s|\?))*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape so N+1 repeats group together.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql.replace('%s', '?'))
+    return ' '.join(sql.split())
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper hook that counts queries and times them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.by_statement = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            stats = self.by_statement[sql]
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def top_statements(self, limit):
+        """
+        Most repeated statement shapes, with how often they ran and their total time.
+        """
+        totals = defaultdict(lambda: [0, 0.0])
+        for sql, (count, duration) in self.by_statement.items():
+            stats = totals[normalize_sql(sql)]
+            stats[0] += count
+            stats[1] += duration
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1][0], -item[1][1]))
+        return [
+            {'sql': sql, 'count': count, 'total_ms': round(duration * 1000, 2)}
+            for sql, (count, duration) in ranked[:limit]
+        ]
+
+
+class SQLProfilingMiddleware:
+    """
+    Count queries and time DB work against the whole request.
+
+    Adds a Server-Timing header (db, app and total) to every response and
+    logs requests over SQL_PROFILING_SLOW_MS or SQL_PROFILING_SLOW_QUERIES to
+    the "expenses.sql" logger with their most repeated statements. Enabled
+    with SQL_PROFILING; when it is off Django drops the middleware at startup,
+    so it costs nothing. Streaming responses only count work done before the
+    body starts.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SQL_PROFILING_SLOW_MS', 500)
+        self.slow_queries = getattr(settings, 'SQL_PROFILING_SLOW_QUERIES', 100)
+        self.top = getattr(settings, 'SQL_PROFILING_TOP_STATEMENTS', 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = recorder.duration * 1000
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+            f'app;dur={total_ms - db_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        if total_ms >= self.slow_ms or recorder.count >= self.slow_queries:
+            match = request.resolver_match
+            slow_log.warning(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'db_ms': round(db_ms, 1),
+                'queries': recorder.count,
+                'top_statements': recorder.top_statements(self.top),
+            }))
+
+        return response
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so async
+    views are not pushed back onto a thread. Subclasses implement before()
+    and after(); neither may block.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.before(request)
+        return self.after(request, self.get_response(request), state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        return self.after(request, await self.get_response(request), state)
+
+    def before(self, request):
+        return None
+
+    def after(self, request, response, state):
+        return response
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Record request latency per URL name in the metrics registry.
+    Removed at startup when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def before(self, request):
+        return time.perf_counter()
+
+    def after(self, request, response, started):
+        match = request.resolver_match
+        metrics.observe(
+            'expense_request_duration_seconds',
+            time.perf_counter() - started,
+            view=(match.url_name or match.view_name) if match else 'unmatched',
+            method=request.method,
+        )
+        return response
+
+
+class PrimaryPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    Keep a client's reads on the primary database for DB_PRIMARY_PIN_SECONDS
+    after it writes, so replica lag never hides a change the user just made.
+    The deadline is kept in a cookie; unsafe methods always use the primary.
+    Removed at startup when no replicas are configured.
+    """
+
+    cookie_name = 'db_primary_until'
+
+    def __init__(self, get_response):
+        if not routers.replica_aliases():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def before(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        routers.begin_request(
+            request.method not in ('GET', 'HEAD', 'OPTIONS') or pinned_until > time.time()
+        )
+
+    def after(self, request, response, state):
+        window = getattr(settings, 'DB_PRIMARY_PIN_SECONDS', 10)
+        if routers.wrote_to_primary() and window > 0:
+            # Whole milliseconds, rounded down so the pin never outlasts the window
+            pinned_until = math.floor((time.time() + window) * 1000) / 1000
+            response.set_cookie(
+                self.cookie_name, f'{pinned_until:.3f}',
+                max_age=window, httponly=True, samesite='Lax'
+            )
+        return response
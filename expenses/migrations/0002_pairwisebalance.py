@@ -0,0 +1,51 @@
+# Generated by Django 5.0.13 on 2026-10-18 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    ExpenseSplit = apps.get_model('expenses', 'ExpenseSplit')
+    PairwiseBalance = apps.get_model('expenses', 'PairwiseBalance')
+
+    rows = ExpenseSplit.objects.filter(
+        is_settled=False
+    ).values('expense__group_id', 'user_id', 'expense__paid_by_id').annotate(total=Sum('amount_owed'))
+
+    PairwiseBalance.objects.bulk_create([
+        PairwiseBalance(
+            group_id=row['expense__group_id'],
+            debtor_id=row['user_id'],
+            creditor_id=row['expense__paid_by_id'],
+            amount=row['total']
+        )
+        for row in rows
+        if row['user_id'] != row['expense__paid_by_id'] and row['total']
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairwiseBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairwise_balances', to='expenses.group')),
+            ],
+            options={
+                'unique_together': {('group', 'debtor', 'creditor')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.13 on 2026-10-18 02:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_opening_balances(apps, schema_editor):
+    PairwiseBalance = apps.get_model('expenses', 'PairwiseBalance')
+    BalanceJournalEntry = apps.get_model('expenses', 'BalanceJournalEntry')
+
+    BalanceJournalEntry.objects.bulk_create([
+        BalanceJournalEntry(
+            group_id=row.group_id,
+            debtor_id=row.debtor_id,
+            creditor_id=row.creditor_id,
+            amount=row.amount,
+            kind='opening'
+        )
+        for row in PairwiseBalance.objects.exclude(amount=0)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_pairwisebalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('balances', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='expenses.group')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'created_at'], name='expenses_ba_group_i_cba57b_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceJournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('expense', 'Expense added'), ('expense_deleted', 'Expense deleted'), ('settlement', 'Settlement'), ('rebuild', 'Ledger correction')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('expense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='expenses.expense')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_journal', to='expenses.group')),
+                ('settlement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='expenses.settlement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'created_at'], name='expenses_ba_group_i_669db0_idx')],
+            },
+        ),
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+    ]
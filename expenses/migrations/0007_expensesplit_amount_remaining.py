@@ -0,0 +1,27 @@
+# Generated by Django 5.0.13 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_remaining(apps, schema_editor):
+    ExpenseSplit = apps.get_model('expenses', 'ExpenseSplit')
+
+    # Settlements used to be all-or-nothing, so an unsettled split still owes all of it
+    ExpenseSplit.objects.filter(is_settled=False).update(amount_remaining=F('amount_owed'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expensesplit',
+            name='amount_remaining',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_remaining, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.13 on 2026-10-18 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expensesplit_amount_remaining'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'paid_by'], name='expense_group_payer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(condition=models.Q(('is_settled', False)), fields=['expense', 'user'], name='split_open_expense_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensesplit',
+            index=models.Index(condition=models.Q(('is_settled', False)), fields=['user', 'expense'], name='split_open_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['group', 'settled_at', 'id'], name='settlement_group_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['paid_by', 'settled_at'], name='settlement_payer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['paid_to', 'settled_at'], name='settlement_payee_time_idx'),
+        ),
+    ]
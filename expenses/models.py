@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Group(models.Model):
     name = models.CharField(max_length=100)
@@ -9,6 +10,8 @@ class Group(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     members = models.ManyToManyField(User, related_name='expense_groups')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every expense, settlement or membership change; used as a cache key
+    version = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.name
@@ -22,6 +25,15 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     date = models.DateField()
     
+    class Meta:
+        indexes = [
+            # Keyset pagination and per-group listings walk (date, id)
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['group', 'date', 'id']),
+            # Per-payer totals inside a group and settlement allocation
+            models.Index(fields=['group', 'paid_by'], name='expense_group_payer_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.description} - ${self.amount}"
 
@@ -30,10 +42,18 @@ class ExpenseSplit(models.Model):
     expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='splits')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     amount_owed = models.DecimalField(max_digits=10, decimal_places=2)
+    # Still unpaid; settlements pay splits down FIFO and is_settled flips at zero
+    amount_remaining = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_settled = models.BooleanField(default=False)
     
     class Meta:
         unique_together = ('expense', 'user')
+        indexes = [
+            # Open splits only: hot queries filter on is_settled=False, which
+            # compiles to a parameter-free predicate the planner can match
+            models.Index(fields=['expense', 'user'], name='split_open_expense_idx', condition=models.Q(is_settled=False)),
+            models.Index(fields=['user', 'expense'], name='split_open_user_idx', condition=models.Q(is_settled=False)),
+        ]
     
     def __str__(self):
         return f"{self.user.username} owes ${self.amount_owed} for {self.expense.description}"
@@ -46,5 +66,140 @@ class Settlement(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     settled_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['settled_at', 'id']),
+            # Per-group and per-user listings, newest first
+            models.Index(fields=['group', 'settled_at', 'id'], name='settlement_group_time_idx'),
+            models.Index(fields=['paid_by', 'settled_at'], name='settlement_payer_time_idx'),
+            models.Index(fields=['paid_to', 'settled_at'], name='settlement_payee_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.paid_by.username} paid ${self.amount} to {self.paid_to.username}"
+
+
+class PairwiseBalance(models.Model):
+    """
+    Materialized ledger of what one member owes another inside a group.
+    Kept up to date by expenses.ledger on every expense and settlement write.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='pairwise_balances')
+    debtor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    creditor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ('group', 'debtor', 'creditor')
+    
+    def __str__(self):
+        return f"{self.debtor.username} owes {self.creditor.username} ${self.amount} in {self.group.name}"
+
+
+class BalanceJournalEntry(models.Model):
+    """
+    Append-only record of every change made to the pairwise ledger.
+    Replaying entries up to a point in time gives the balances at that time.
+    """
+    KIND_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('expense', 'Expense added'),
+        ('expense_deleted', 'Expense deleted'),
+        ('settlement', 'Settlement'),
+        ('rebuild', 'Ledger correction'),
+    ]
+    
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='balance_journal')
+    debtor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    creditor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    expense = models.ForeignKey(Expense, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    settlement = models.ForeignKey(Settlement, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.debtor.username} -> {self.creditor.username} {self.amount}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Snapshot of a group's ledger covering every journal entry up to last_entry_id.
+    Balances are stored as {"<debtor_id>:<creditor_id>": "<amount>"}.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    last_entry_id = models.BigIntegerField()
+    balances = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Checkpoint for {self.group.name} at {self.created_at}"
+
+
+class ExportJob(models.Model):
+    """
+    An "export everything" archive built in the background for one user.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Export {self.id} for {self.user.username} ({self.status})"
+
+
+class Task(models.Model):
+    """
+    A unit of background work in the database-backed queue; see expenses.tasks.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Higher runs first; ties run oldest first
+    priority = models.SmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tasks')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Workers claim the next ready task in this order
+            models.Index(fields=['status', '-priority', 'run_after'], name='task_queue_idx'),
+        ]
+    
     def __str__(self):
-        return f"{self.paid_by.username} paid ${self.amount} to {self.paid_to.username}"
\ No newline at end of file
+        return f"Task {self.id} {self.name} ({self.status})"
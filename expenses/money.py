@@ -0,0 +1,67 @@
+# expenses/money.py
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    """
+    Convert a money amount (int, float, Decimal or numeric string) to integer cents.
+    Ints are whole currency units; half-cents round away from zero.
+    """
+    if isinstance(amount, int):
+        return amount * 100
+    if isinstance(amount, float):
+        return int(round(amount * 100))
+    return int((Decimal(amount) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """
+    Integer cents as a two-place Decimal, ready for a DecimalField.
+    """
+    return Decimal(cents).scaleb(-2)
+
+
+def cents_to_float(cents):
+    """
+    Integer cents as a float for JSON responses and templates.
+    """
+    return cents / 100
+
+
+def split_cents(total, parts):
+    """
+    Split integer cents into `parts` shares that add up to exactly `total`.
+
+    Every share gets total // parts and the leftover cents go one each to
+    the first shares, so the same inputs always split the same way.
+    """
+    if parts < 1:
+        raise ValueError('Cannot split into fewer than one part')
+    base, leftover = divmod(total, parts)
+    return [base + 1] * leftover + [base] * (parts - leftover)
+
+
+def split_amount(amount, parts):
+    """
+    split_cents for a money amount; returns two-place Decimals.
+    """
+    return [from_cents(cents) for cents in split_cents(to_cents(amount), parts)]
+
+
+def parse_amount(text):
+    """
+    Parse user input such as "1,234.50" or "$12" into a positive two-place
+    Decimal. Raises ValueError with a message fit to show the user.
+    """
+    try:
+        amount = Decimal(str(text).strip().replace(',', '').lstrip('$'))
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount "{text}"')
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError('Amount must be greater than zero')
+    if amount != amount.quantize(CENT):
+        raise ValueError('Amount can have at most two decimal places')
+    return amount.quantize(CENT)
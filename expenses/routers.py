@@ -0,0 +1,75 @@
+# expenses/routers.py
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set per request by PrimaryPinMiddleware: read from the primary, and did we write?
+_pinned = ContextVar('expenses_db_pinned', default=False)
+_wrote = ContextVar('expenses_db_wrote', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DB_REPLICAS', [])
+
+
+def begin_request(pinned):
+    """
+    Reset the routing state at the start of a request; called by PrimaryPinMiddleware.
+    """
+    _pinned.set(pinned)
+    _wrote.set(False)
+
+
+def end_request():
+    """
+    Clear the routing state once the response has been sent; see expenses.signals.
+    """
+    _pinned.set(False)
+    _wrote.set(False)
+
+
+def wrote_to_primary():
+    return _wrote.get()
+
+
+@contextmanager
+def use_primary():
+    """
+    Send reads in the block to the primary, e.g. in a background job that
+    must see rows the request that queued it just wrote.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary ("default"), reads to a random DB_REPLICAS alias.
+
+    Reads stay on the primary when there are no replicas, inside a
+    transaction on the primary (read-modify-write must see its own rows),
+    and while the current request is pinned by PrimaryPinMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
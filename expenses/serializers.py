@@ -2,14 +2,49 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Group, Expense, ExpenseSplit, Settlement
+from django.db.models import Prefetch
+from django.urls import reverse
+from .models import Group, Expense, ExpenseSplit, Settlement, ExportJob, Task
+from .writers import create_expenses, update_expense
+from .money import parse_amount
 
-class UserSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads so viewsets can load
+    them up front instead of one query per row.
+    
+    prefetch_related_fields entries are either a relation name or a
+    (relation name, nested serializer) pair; pairs prefetch with the nested
+    serializer's own eager loading applied.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        for entry in cls.prefetch_related_fields:
+            if isinstance(entry, tuple):
+                name, serializer_class = entry
+                related_model = queryset.model._meta.get_field(name).related_model
+                queryset = queryset.prefetch_related(Prefetch(
+                    name,
+                    queryset=serializer_class.setup_eager_loading(related_model._default_manager.all())
+                ))
+            else:
+                queryset = queryset.prefetch_related(entry)
+        return queryset
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('created_by',)
+    prefetch_related_fields = (('members', UserSerializer),)
+    
     created_by = UserSerializer(read_only=True)
     members = UserSerializer(many=True, read_only=True)
     member_ids = serializers.ListField(
@@ -35,14 +70,83 @@ class GroupSerializer(serializers.ModelSerializer):
         
         return group
 
-class ExpenseSplitSerializer(serializers.ModelSerializer):
+class ExpenseSplitSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
+    
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = ExpenseSplit
-        fields = ['id', 'user', 'amount_owed', 'is_settled']
+        fields = ['id', 'user', 'amount_owed', 'amount_remaining', 'is_settled']
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Looks each related object up once per serializer run, so a bulk payload
+    that repeats the same group doesn't cost a query per item.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, (int, str)):
+            return super().to_internal_value(data)
+        cache = self.context.setdefault(f'_{self.field_name}_cache', {})
+        if data not in cache:
+            cache[data] = super().to_internal_value(data)
+        return cache[data]
+
+
+def membership_errors(items, user):
+    """
+    Check that user belongs to each item's group and that every split member
+    does too, using one query for the whole batch.
+    Returns one error dict per item ({} when the item is fine).
+    """
+    group_ids = {item['group'].pk for item in items}
+    memberships = set(
+        Group.members.through.objects.filter(
+            group_id__in=group_ids
+        ).values_list('group_id', 'user_id')
+    )
 
-class ExpenseSerializer(serializers.ModelSerializer):
+    errors = []
+    for item in items:
+        group_id = item['group'].pk
+        item_errors = {}
+        if (group_id, user.pk) not in memberships:
+            item_errors['group'] = ['You are not a member of this group.']
+        outsiders = [
+            user_id for user_id in item.get('split_members', [])
+            if (group_id, user_id) not in memberships
+        ]
+        if outsiders:
+            item_errors['split_members'] = [f'Not members of this group: {outsiders}']
+        errors.append(item_errors)
+    return errors
+
+
+class ExpenseListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of expenses together and writes them with bulk inserts.
+    """
+
+    def to_internal_value(self, data):
+        # Raised from here (not validate()) so errors stay one-per-item
+        items = super().to_internal_value(data)
+        request = self.context.get('request')
+        if request is not None:
+            errors = membership_errors(items, request.user)
+            if any(errors):
+                raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        return create_expenses(validated_data)
+
+
+class ExpenseSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('paid_by',)
+    prefetch_related_fields = (('splits', ExpenseSplitSerializer),)
+    
+    group = CachedPrimaryKeyRelatedField(queryset=Group.objects.all())
     paid_by = UserSerializer(read_only=True)
     splits = ExpenseSplitSerializer(many=True, read_only=True)
     split_members = serializers.ListField(
@@ -53,28 +157,94 @@ class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = ['id', 'group', 'description', 'amount', 'paid_by', 'date', 'created_at', 'splits', 'split_members']
+        list_serializer_class = ExpenseListSerializer
     
-    def create(self, validated_data):
-        split_members = validated_data.pop('split_members')
-        expense = Expense.objects.create(**validated_data)
-        
-        # Calculate split amount
-        split_amount = expense.amount / len(split_members)
-        
-        # Create splits for each member
-        for user_id in split_members:
-            ExpenseSplit.objects.create(
-                expense=expense,
-                user_id=user_id,
-                amount_owed=split_amount
-            )
+    def validate_amount(self, value):
+        try:
+            return parse_amount(value)
+        except ValueError as e:
+            raise serializers.ValidationError(f'{e}.')
+    
+    def validate_split_members(self, value):
+        if not value:
+            raise serializers.ValidationError('Select at least one member to split with.')
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('Each member can only appear once.')
+        return value
+    
+    def validate(self, attrs):
+        if self.instance is not None and 'group' in attrs and attrs['group'].pk != self.instance.group_id:
+            raise serializers.ValidationError({'group': ['An expense cannot be moved to another group.']})
         
-        return expense
+        request = self.context.get('request')
+        # Batches are checked together by ExpenseListSerializer
+        if request is not None and self.parent is None:
+            item = attrs if 'group' in attrs else {**attrs, 'group': self.instance.group}
+            errors = membership_errors([item], request.user)[0]
+            if errors:
+                raise serializers.ValidationError(errors)
+        return attrs
+    
+    def create(self, validated_data):
+        return create_expenses([validated_data])[0]
+    
+    def update(self, instance, validated_data):
+        return update_expense(instance, validated_data)
 
-class SettlementSerializer(serializers.ModelSerializer):
+class SettlementSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('paid_by', 'paid_to')
+    
     paid_by = UserSerializer(read_only=True)
     paid_to = UserSerializer(read_only=True)
+    paid_to_id = serializers.PrimaryKeyRelatedField(
+        source='paid_to', queryset=User.objects.all(), write_only=True
+    )
     
     class Meta:
         model = Settlement
-        fields = ['id', 'group', 'paid_by', 'paid_to', 'amount', 'settled_at']
\ No newline at end of file
+        fields = ['id', 'group', 'paid_by', 'paid_to', 'paid_to_id', 'amount', 'settled_at']
+    
+    def validate_amount(self, value):
+        try:
+            return parse_amount(value)
+        except ValueError as e:
+            raise serializers.ValidationError(f'{e}.')
+    
+    def validate(self, data):
+        user = self.context['request'].user
+        group = data['group']
+        member_ids = set(group.members.filter(
+            id__in=[user.id, data['paid_to'].id]
+        ).values_list('id', flat=True))
+        
+        if user.id not in member_ids:
+            raise serializers.ValidationError({'group': ['You are not a member of this group.']})
+        if data['paid_to'].id not in member_ids:
+            raise serializers.ValidationError({'paid_to_id': ['Not a member of this group.']})
+        if data['paid_to'].id == user.id:
+            raise serializers.ValidationError({'paid_to_id': ['You cannot pay yourself.']})
+        return data
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'status', 'error', 'created_at', 'finished_at', 'download_url']
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        url = reverse('export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class TaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'name', 'args', 'status', 'priority', 'attempts', 'max_attempts',
+            'result', 'error', 'run_after', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,65 @@
+# expenses/settlements.py
+
+from decimal import Decimal
+from django.db import transaction
+from .models import Group, ExpenseSplit
+from .ledger import record_settlement
+
+# Split ids per UPDATE ... WHERE id IN (...), under every backend's parameter limit
+UPDATE_BATCH_SIZE = 500
+
+
+def allocate_settlement(settlement):
+    """
+    Pay down what the settlement's payer owes its payee, oldest expense first.
+
+    Walks the open splits FIFO by expense date under row locks. Splits the
+    payment covers are closed with batched UPDATEs, and the one it only
+    partly covers keeps the rest in amount_remaining. The ledger is reduced
+    by the amount actually allocated; anything paid beyond what is owed is
+    reported as unallocated. Costs a handful of queries however many splits
+    a payment clears.
+    """
+    amount = Decimal(str(settlement.amount))
+
+    with transaction.atomic():
+        # Group first, in the same order as every other ledger write, so
+        # concurrent settlements and expense changes queue instead of deadlocking
+        list(Group.objects.select_for_update().filter(pk=settlement.group_id).values_list('pk', flat=True))
+
+        open_splits = ExpenseSplit.objects.select_for_update(of=('self',)).filter(
+            expense__group_id=settlement.group_id,
+            user_id=settlement.paid_by_id,
+            expense__paid_by_id=settlement.paid_to_id,
+            is_settled=False
+        ).order_by('expense__date', 'expense_id', 'id').values_list('id', 'amount_remaining')
+
+        left = amount
+        closed = []
+        partial = None
+        for split_id, remaining in open_splits:
+            if left <= 0:
+                break
+            if left >= remaining:
+                closed.append(split_id)
+                left -= remaining
+            else:
+                partial = (split_id, remaining - left)
+                left = Decimal('0')
+
+        for start in range(0, len(closed), UPDATE_BATCH_SIZE):
+            ExpenseSplit.objects.filter(
+                id__in=closed[start:start + UPDATE_BATCH_SIZE]
+            ).update(amount_remaining=0, is_settled=True)
+        if partial:
+            ExpenseSplit.objects.filter(id=partial[0]).update(amount_remaining=partial[1])
+
+        allocated = amount - left
+        record_settlement(settlement, allocated)
+
+    return {
+        'allocated': float(allocated),
+        'unallocated': float(left),
+        'splits_settled': len(closed),
+        'splits_partially_settled': 1 if partial else 0,
+    }
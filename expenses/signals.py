@@ -0,0 +1,67 @@
+# expenses/signals.py
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from .models import Group, Expense, Settlement
+from .cache import bump_group_version
+from .routers import end_request
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Membership changes invalidate cached statistics for the affected group(s).
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        bump_group_version(instance.pk)
+    elif pk_set:
+        # user.expense_groups.add(...) - instance is the user
+        for group_id in pk_set:
+            bump_group_version(group_id)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Settlement)
+def row_updated(sender, instance, created, **kwargs):
+    """
+    Creations go through expenses.ledger, which bumps the version itself;
+    edits made elsewhere (API updates, admin) are caught here.
+    """
+    if not created:
+        bump_group_version(instance.group_id)
+
+
+@receiver(post_delete, sender=Settlement)
+def settlement_deleted(sender, instance, **kwargs):
+    bump_group_version(instance.group_id)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """
+    Apply the SQLITE_TUNED pragmas to every new SQLite connection. WAL is
+    stored in the database file, so setting it again is a no-op; in-memory
+    test databases ignore it.
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_TUNED', False):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    """
+    Clear the request's primary pin once the response, streamed ones
+    included, has been sent.
+    """
+    end_request()
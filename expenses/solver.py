@@ -0,0 +1,152 @@
+# expenses/solver.py
+
+import heapq
+from django.conf import settings
+from .money import to_cents
+
+# Largest number of non-zero members solved exactly with the bitmask DP.
+# The DP costs O(n * 2^n), so above this the heuristic is used instead.
+EXACT_MEMBER_LIMIT = getattr(settings, 'DEBT_SOLVER_EXACT_LIMIT', 14)
+
+STRATEGIES = ('auto', 'exact', 'heuristic')
+
+
+def net_positions(balances):
+    """
+    Collapse {debtor: {creditor: amount}} into {person: net cents}.
+    Positive means the person is owed money, negative means they owe.
+    """
+    net = {}
+    for debtor, creditors in balances.items():
+        for creditor, amount in creditors.items():
+            cents = to_cents(amount)
+            net[debtor] = net.get(debtor, 0) - cents
+            net[creditor] = net.get(creditor, 0) + cents
+    return {person: cents for person, cents in net.items() if cents}
+
+
+def solve(net, strategy='auto', exact_limit=None):
+    """
+    Turn {person: net cents} into a list of (from, to, cents) transfers.
+
+    'exact' finds the minimum number of transfers by partitioning members
+    into as many zero-sum subsets as possible, 'heuristic' is a fast greedy
+    pass and 'auto' picks exact whenever the group is small enough.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}")
+
+    net = {person: cents for person, cents in net.items() if cents}
+    if sum(net.values()) != 0:
+        raise ValueError('Net positions must sum to zero')
+    if exact_limit is None:
+        exact_limit = EXACT_MEMBER_LIMIT
+
+    if strategy == 'exact' or (strategy == 'auto' and len(net) <= exact_limit):
+        return _solve_exact(net)
+    return _solve_heuristic(net)
+
+
+def _settle_greedily(net):
+    """
+    Largest debtor pays largest creditor, re-heaping after every partial match.
+    A zero-sum set of k people is always settled in at most k - 1 transfers.
+    """
+    # Tie-break on position so people never get compared directly
+    order = {person: index for index, person in enumerate(sorted(net, key=str))}
+    debtors = [(cents, order[person], person) for person, cents in net.items() if cents < 0]
+    creditors = [(-cents, order[person], person) for person, cents in net.items() if cents > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor_order, debtor = heapq.heappop(debtors)
+        credit, creditor_order, creditor = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((debtor, creditor, amount))
+
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_order, debtor))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_order, creditor))
+    return transfers
+
+
+def _solve_heuristic(net):
+    """
+    Settle exact opposite pairs first, then fall back to greedy matching.
+    """
+    transfers = []
+    remaining = dict(net)
+
+    # Pair up people whose balances cancel out exactly
+    waiting = {}
+    for person in sorted(remaining, key=lambda p: (abs(remaining[p]), str(p))):
+        cents = remaining[person]
+        partners = waiting.get(-cents)
+        if partners:
+            partner = partners.pop()
+            debtor, creditor = (person, partner) if cents < 0 else (partner, person)
+            transfers.append((debtor, creditor, abs(cents)))
+            remaining[person] = 0
+            remaining[partner] = 0
+        else:
+            waiting.setdefault(cents, []).append(person)
+
+    remaining = {person: cents for person, cents in remaining.items() if cents}
+    return transfers + _settle_greedily(remaining)
+
+
+def _solve_exact(net):
+    """
+    Minimum-transfer settlement via bitmask DP over zero-sum subsets.
+    With k disjoint zero-sum subsets, n people need exactly n - k transfers.
+    """
+    people = sorted(net, key=str)
+    amounts = [net[person] for person in people]
+    n = len(people)
+    if n == 0:
+        return []
+
+    size = 1 << n
+    sums = [0] * size
+    for mask in range(1, size):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+
+    # best[mask] = most zero-sum groups the members in mask can be split into
+    best = [0] * size
+    for mask in range(1, size):
+        top = 0
+        rest = mask
+        while rest:
+            low = rest & -rest
+            value = best[mask ^ low]
+            if value > top:
+                top = value
+            rest ^= low
+        best[mask] = top + (1 if sums[mask] == 0 else 0)
+
+    # Walk back down from the full set, cutting a group at each zero-sum mask
+    groups = []
+    mask = size - 1
+    boundary = mask
+    while mask:
+        target = best[mask] - (1 if sums[mask] == 0 else 0)
+        rest = mask
+        while rest:
+            low = rest & -rest
+            if best[mask ^ low] == target:
+                break
+            rest ^= low
+        mask ^= low
+        if sums[mask] == 0:
+            groups.append(boundary ^ mask)
+            boundary = mask
+
+    transfers = []
+    for group in groups:
+        members = {people[i]: amounts[i] for i in range(n) if group >> i & 1}
+        transfers.extend(_settle_greedily(members))
+    return transfers
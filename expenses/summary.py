@@ -0,0 +1,132 @@
+# expenses/summary.py
+
+import asyncio
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Q, Sum, Count
+from .models import Group, Expense, ExpenseSplit, Settlement, PairwiseBalance
+from .money import to_cents, cents_to_float
+from .utils import alist
+
+
+def _summary_queries(user):
+    """
+    The five independent reads behind the summary: the user's groups,
+    grouped aggregates over expenses, splits and settlements, and the
+    ledger pairs the user is part of.
+    """
+    return (
+        Group.objects.filter(members=user).order_by('name').values_list('id', 'name'),
+        Expense.objects.filter(paid_by=user).order_by().values('group').annotate(
+            count=Count('id'), total=Sum('amount')
+        ),
+        ExpenseSplit.objects.filter(user=user).order_by().values('expense__group').annotate(
+            total=Sum('amount_owed')
+        ).values_list('expense__group', 'total'),
+        Settlement.objects.filter(Q(paid_by=user) | Q(paid_to=user)).order_by().values('group').annotate(
+            paid=Sum('amount', filter=Q(paid_by=user)),
+            received=Sum('amount', filter=Q(paid_to=user)),
+        ),
+        PairwiseBalance.objects.filter(
+            Q(debtor=user) | Q(creditor=user)
+        ).exclude(amount=0).values_list(
+            'group_id', 'debtor_id', 'creditor_id', 'debtor__username', 'creditor__username', 'amount'
+        ),
+    )
+
+
+def user_summary(user):
+    """
+    Everything a user's home screen needs about their money, across groups.
+
+    Spending comes from grouped aggregates over expenses, splits and
+    settlements, and who-owes-whom from the pairwise ledger (which already
+    nets settlements in), one query each - five queries for any number of
+    groups or counterparties. Amounts are floats, like the balances API.
+
+    Returns totals plus a per-group and a per-counterparty breakdown; owed is
+    money others owe the user, owing is money the user owes others.
+    """
+    return _build_summary(user, *(list(queryset) for queryset in _summary_queries(user)))
+
+
+async def auser_summary(user):
+    """
+    Async user_summary; the five reads are issued together.
+    """
+    return _build_summary(user, *await asyncio.gather(*map(alist, _summary_queries(user))))
+
+
+def _build_summary(user, groups, paid_rows, share_rows, settlement_rows, pair_rows):
+    groups = dict(groups)
+    paid_by_group = {row['group']: row for row in paid_rows}
+    share_by_group = dict(share_rows)
+    settlements_by_group = {row['group']: row for row in settlement_rows}
+
+    # Net position per (group, counterparty): positive when they owe the user
+    pair_net = defaultdict(Decimal)
+    usernames = {}
+    for group_id, debtor_id, creditor_id, debtor, creditor, amount in pair_rows:
+        if creditor_id == user.id:
+            pair_net[(group_id, debtor_id)] += amount
+            usernames[debtor_id] = debtor
+        else:
+            pair_net[(group_id, creditor_id)] -= amount
+            usernames[creditor_id] = creditor
+
+    group_rows = {
+        group_id: {
+            'id': group_id,
+            'name': name,
+            'expenses_paid': paid_by_group.get(group_id, {}).get('count', 0),
+            'paid': paid_by_group.get(group_id, {}).get('total') or Decimal(0),
+            'share': share_by_group.get(group_id) or Decimal(0),
+            'settled_paid': settlements_by_group.get(group_id, {}).get('paid') or Decimal(0),
+            'settled_received': settlements_by_group.get(group_id, {}).get('received') or Decimal(0),
+            'owed': Decimal(0),
+            'owing': Decimal(0),
+        }
+        for group_id, name in groups.items()
+    }
+    people = {}
+    for (group_id, other_id), net in pair_net.items():
+        if not net or group_id not in group_rows:
+            continue
+        person = people.setdefault(other_id, {
+            'user_id': other_id, 'username': usernames[other_id], 'owed': Decimal(0), 'owing': Decimal(0)
+        })
+        side = 'owed' if net > 0 else 'owing'
+        group_rows[group_id][side] += abs(net)
+        person[side] += abs(net)
+
+    def total(field):
+        return sum(to_cents(row[field]) for row in group_rows.values())
+
+    totals = {field: total(field) for field in ('paid', 'share', 'owed', 'owing')}
+
+    def as_floats(row, fields):
+        cents = {field: to_cents(row[field]) for field in fields}
+        row.update({field: cents_to_float(value) for field, value in cents.items()})
+        row['net'] = cents_to_float(cents['owed'] - cents['owing'])
+        return row
+
+    group_list = [
+        as_floats(row, ('paid', 'share', 'settled_paid', 'settled_received', 'owed', 'owing'))
+        for row in group_rows.values()
+    ]
+    counterparties = sorted(
+        (as_floats(row, ('owed', 'owing')) for row in people.values()),
+        key=lambda row: (-abs(row['net']), row['username'])
+    )
+
+    return {
+        'groups_count': len(group_list),
+        'expenses_count': sum(row['expenses_paid'] for row in group_list),
+        'total_paid': cents_to_float(totals['paid']),
+        'total_share': cents_to_float(totals['share']),
+        'total_owed': cents_to_float(totals['owed']),
+        'total_owing': cents_to_float(totals['owing']),
+        'net': cents_to_float(totals['owed'] - totals['owing']),
+        'groups': group_list,
+        'counterparties': counterparties,
+    }
@@ -0,0 +1,228 @@
+# expenses/tasks.py
+
+import os
+import socket
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Group, Task
+from .ledger import rebuild_group_ledger, verify_group_ledger
+from .utils import calculate_group_statistics
+from .routers import use_primary
+from . import metrics
+
+# Seconds before the first retry of a failed task; doubles on every attempt
+RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 30)
+# A task running for longer than this is assumed to have lost its worker
+STALE_SECONDS = getattr(settings, 'TASK_STALE_SECONDS', 900)
+
+# Registered task functions by name; see task()
+registry = {}
+
+
+def task(name, priority=0, max_attempts=3, on_failure=None):
+    """
+    Register a function as a background task. It is called by the worker
+    with the task's args as keyword arguments, and what it returns (which
+    must be JSON serializable) is stored as the task's result. on_failure,
+    if given, is called with the same arguments once the task has failed
+    for the last time.
+    """
+    def register(func):
+        func.task_name = name
+        func.priority = priority
+        func.max_attempts = max_attempts
+        func.on_failure = on_failure
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, args=None, user=None, priority=None, delay=0, unique=False):
+    """
+    Queue a task and return it. The row is written in the caller's
+    transaction, so workers only see it once that commits. With unique=True
+    an identical task the same user queued that is still waiting is returned
+    instead of a new one.
+    """
+    func = registry[name]
+    args = args or {}
+    if unique:
+        waiting = Task.objects.filter(
+            name=name, args=args, user=user, status='pending'
+        ).order_by('id').first()
+        if waiting is not None:
+            return waiting
+    return Task.objects.create(
+        name=name,
+        args=args,
+        user=user,
+        priority=func.priority if priority is None else priority,
+        max_attempts=func.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, min_priority=None):
+    """
+    Mark the next ready task as running for this worker and return it, or
+    None when there is nothing to do.
+
+    Where the database supports it (PostgreSQL) the row is locked with
+    SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers pass over each
+    other's candidates instead of queueing on them. Elsewhere (SQLite) a
+    conditional UPDATE on the status makes sure only one worker wins a task.
+    """
+    now = timezone.now()
+    ready = Task.objects.filter(status='pending', run_after__lte=now).order_by('-priority', 'run_after', 'id')
+    if min_priority is not None:
+        ready = ready.filter(priority__gte=min_priority)
+    claimed = {'status': 'running', 'locked_by': worker, 'started_at': now, 'finished_at': None}
+
+    # Claims must see the latest rows, never a lagging replica
+    with use_primary():
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                task = ready.select_for_update(skip_locked=True).first()
+                if task is None:
+                    return None
+                for field, value in claimed.items():
+                    setattr(task, field, value)
+                task.attempts += 1
+                task.save(update_fields=[*claimed, 'attempts'])
+                return task
+
+        for task in ready[:10]:
+            won = Task.objects.filter(pk=task.pk, status='pending').update(
+                attempts=task.attempts + 1, **claimed
+            )
+            if won:
+                for field, value in claimed.items():
+                    setattr(task, field, value)
+                task.attempts += 1
+                return task
+    return None
+
+
+def run(task):
+    """
+    Run a claimed task and record the outcome. A failure is retried with
+    exponential backoff until max_attempts, then the task is marked failed.
+    """
+    started = time.perf_counter()
+    try:
+        func = registry.get(task.name)
+        if func is None:
+            raise LookupError(f'Unknown task "{task.name}"')
+        task.result = func(**task.args)
+    except Exception as e:
+        task.error = f'{type(e).__name__}: {e}'
+        if task.attempts < task.max_attempts:
+            task.status = 'pending'
+            task.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (task.attempts - 1))
+        else:
+            task.status = 'failed'
+            task.finished_at = timezone.now()
+    else:
+        task.status = 'done'
+        task.error = ''
+        task.finished_at = timezone.now()
+
+    task.locked_by = ''
+    task.save(update_fields=['status', 'result', 'error', 'run_after', 'locked_by', 'finished_at'])
+    if task.status == 'failed':
+        gave_up(task)
+    outcome = 'retry' if task.status == 'pending' else task.status
+    metrics.inc('expense_tasks_total', task=task.name, outcome=outcome)
+    metrics.observe('expense_task_duration_seconds', time.perf_counter() - started, task=task.name)
+    return task
+
+
+def gave_up(task):
+    """
+    Run the on_failure hook of a task that has used up its attempts.
+    """
+    func = registry.get(task.name)
+    if func is not None and func.on_failure is not None:
+        func.on_failure(**task.args)
+
+
+def requeue_stale():
+    """
+    Put back tasks whose worker died mid-run, or fail them when they are
+    out of attempts. Returns how many were touched.
+    """
+    cutoff = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    stale = Task.objects.filter(status='running', started_at__lt=cutoff)
+
+    failed = 0
+    for dead in stale.filter(attempts__gte=F('max_attempts')):
+        # Another worker may be sweeping the same rows
+        if Task.objects.filter(pk=dead.pk, status='running').update(
+            status='failed', locked_by='', error='Worker stopped while running the task', finished_at=timezone.now()
+        ):
+            failed += 1
+            gave_up(dead)
+    requeued = stale.update(status='pending', locked_by='', run_after=timezone.now())
+    return failed + requeued
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+@task('refresh_statistics', priority=10)
+def refresh_statistics(group_id, start=None, end=None, by_payer=False):
+    """
+    A group's spending statistics, computed fresh and returned as the task
+    result. Nothing is cached: the worker's cache is its own unless CACHES
+    points at a shared backend, so pages would never see it.
+    """
+    group = Group.objects.get(pk=group_id)
+    return calculate_group_statistics(group, start_date=_date(start), end_date=_date(end), by_payer=by_payer)
+
+
+def export_failed(job_id):
+    from .archives import fail_export_job
+
+    fail_export_job(job_id)
+
+
+@task('export_archive', on_failure=export_failed)
+def export_archive(job_id):
+    """
+    Build an account-wide archive for an ExportJob.
+    """
+    # archives queues its jobs through this module
+    from .archives import run_export_job
+
+    job = run_export_job(job_id)
+    return {'job_id': job.id, 'status': job.status}
+
+
+@task('purge_exports', priority=-10, max_attempts=1)
+def purge_exports():
+    """
+    Delete archives older than EXPORT_RETENTION_DAYS; see purge_expired_exports.
+    """
+    from .archives import purge_expired_exports
+
+    return {'deleted': purge_expired_exports()}
+
+
+@task('rebuild_ledger', priority=-10, max_attempts=1)
+def rebuild_ledger(group_id):
+    """
+    Recompute a group's pairwise ledger from its splits; see rebuild_group_ledger.
+    """
+    group = Group.objects.get(pk=group_id)
+    mismatches = len(verify_group_ledger(group))
+    pairs = rebuild_group_ledger(group)
+    return {'pairs': pairs, 'mismatches_fixed': mismatches}
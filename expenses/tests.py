@@ -1,3 +1,1818 @@
-from django.test import TestCase
+import csv
+import gzip
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+from asgiref.sync import sync_to_async
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, router, transaction
+from django.db.models import Q, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest import skipUnless
+from unittest.mock import patch
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+from .models import (
+    Group, Expense, ExpenseSplit, Settlement, PairwiseBalance, BalanceJournalEntry, BalanceCheckpoint, ExportJob,
+    Task,
+)
+from . import tasks
+from .cache import cache_stats
+from .writers import create_expenses
+from .importers import import_expenses_csv
+from .exporters import iter_expense_chunks
+from .money import cents_to_float, from_cents, parse_amount, split_amount, split_cents, to_cents
+from .archives import start_export
+from .ledger import (
+    HistoryUnavailable, create_checkpoint, get_group_balances, get_group_balances_as_of, reverse_expense,
+    verify_group_ledger,
+)
+from .live import LiveHub, Subscription
+from .management.commands.seed_data import seed_dataset
+from .solver import net_positions, solve
+from .utils import calculate_group_statistics, simplify_debts, greedy_simplify_debts, simplify_debts_batch
+from .management.commands.bench_simplify import random_balances
+from .management.commands.bench_batch_simplify import random_groups
 
-# Create your tests here.
+
+def apply_transfers(net, transfers):
+    """
+    Net positions left after paying every transfer.
+    """
+    remaining = dict(net)
+    for debtor, creditor, cents in transfers:
+        remaining[debtor] = remaining.get(debtor, 0) + cents
+        remaining[creditor] = remaining.get(creditor, 0) - cents
+    return {person: cents for person, cents in remaining.items() if cents}
+
+
+class ExpenseUpdateLedgerTests(TestCase):
+    """
+    Editing an expense through the API must keep its splits and the ledger in step.
+    """
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob, self.carol)
+        self.expense = create_expenses([{
+            'group': self.group,
+            'description': 'Hotel',
+            'amount': '90.00',
+            'paid_by': self.alice,
+            'date': date(2024, 1, 1),
+            'split_members': [self.alice.id, self.bob.id, self.carol.id],
+        }])[0]
+        self.client.force_login(self.alice)
+
+    def patch(self, **data):
+        return self.client.patch(
+            f'/api/expenses/{self.expense.id}/', json.dumps(data), content_type='application/json'
+        )
+
+    def owed(self):
+        return dict(ExpenseSplit.objects.filter(expense=self.expense).values_list('user__username', 'amount_remaining'))
+
+    def test_amount_change_rewrites_splits(self):
+        response = self.patch(amount='60.00')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.owed(), {'alice': 20, 'bob': 20, 'carol': 20})
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_split_members_change_moves_ledger(self):
+        response = self.patch(split_members=[self.alice.id, self.bob.id])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.owed(), {'alice': 45, 'bob': 45})
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_amount_change_keeps_what_was_already_paid(self):
+        self.client.force_login(self.bob)
+        response = self.client.post('/api/settlements/', {
+            'group': self.group.id, 'paid_to_id': self.alice.id, 'amount': '10.00'
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+
+        self.assertEqual(self.patch(amount='120.00').status_code, 200)
+        self.assertEqual(self.owed(), {'alice': 40, 'bob': 30, 'carol': 40})
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_moving_to_another_group_is_rejected(self):
+        other = Group.objects.create(name='Other', created_by=self.alice)
+        other.members.add(self.alice, self.bob, self.carol)
+
+        response = self.patch(group=other.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Expense.objects.get(pk=self.expense.pk).group_id, self.group.id)
+        self.assertEqual(verify_group_ledger(self.group), [])
+        self.assertEqual(verify_group_ledger(other), [])
+
+    def test_description_change_leaves_splits_alone(self):
+        splits = set(ExpenseSplit.objects.filter(expense=self.expense).values_list('id', flat=True))
+        self.assertEqual(self.patch(description='Hostel').status_code, 200)
+        self.assertEqual(set(ExpenseSplit.objects.filter(expense=self.expense).values_list('id', flat=True)), splits)
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+
+class BalanceJournalTests(TestCase):
+    """
+    The journal and its checkpoints must rebuild the same balances the ledger holds.
+    """
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+        self.group = Group.objects.create(name='Flat', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob, self.carol)
+        self.client.force_login(self.alice)
+
+    def add_expense(self, amount, paid_by, when=date(2024, 1, 1)):
+        return create_expenses([{
+            'group': self.group,
+            'description': 'Groceries',
+            'amount': amount,
+            'paid_by': paid_by,
+            'date': when,
+            'split_members': [self.alice.id, self.bob.id, self.carol.id],
+        }])[0]
+
+    def backdate(self, days):
+        """
+        Move everything journaled so far the given number of days into the past.
+        """
+        moved = timezone.now() - timedelta(days=days)
+        BalanceJournalEntry.objects.filter(group=self.group).update(created_at=moved)
+        BalanceCheckpoint.objects.filter(group=self.group).update(created_at=moved)
+
+    def journal_totals(self):
+        return {
+            (row['debtor_id'], row['creditor_id']): row['total']
+            for row in BalanceJournalEntry.objects.filter(group=self.group).values(
+                'debtor_id', 'creditor_id'
+            ).annotate(total=Sum('amount'))
+            if row['total']
+        }
+
+    def ledger(self):
+        return dict(
+            ((debtor_id, creditor_id), amount)
+            for debtor_id, creditor_id, amount in PairwiseBalance.objects.filter(
+                group=self.group
+            ).exclude(amount=0).values_list('debtor_id', 'creditor_id', 'amount')
+        )
+
+    def test_every_write_is_journaled(self):
+        expense = self.add_expense('90.00', self.alice)
+        self.add_expense('30.00', self.bob)
+        self.assertEqual(
+            BalanceJournalEntry.objects.filter(group=self.group, kind='expense').count(), 4
+        )
+        self.assertEqual(self.journal_totals(), self.ledger())
+
+        reverse_expense(expense)
+        expense.delete()
+        self.assertTrue(BalanceJournalEntry.objects.filter(group=self.group, kind='expense_deleted').exists())
+        self.assertEqual(self.journal_totals(), self.ledger())
+
+    def test_replay_from_checkpoints_matches_ledger(self):
+        with patch('expenses.ledger.CHECKPOINT_INTERVAL', 3):
+            for i in range(6):
+                self.add_expense(f'{30 + i}.00', (self.alice, self.bob, self.carol)[i % 3])
+            self.client.force_login(self.bob)
+            response = self.client.post('/api/settlements/', {
+                'group': self.group.id, 'paid_to_id': self.alice.id, 'amount': '5.00'
+            })
+            self.assertEqual(response.status_code, 201, response.content)
+
+        self.assertGreater(BalanceCheckpoint.objects.filter(group=self.group).count(), 0)
+        self.assertEqual(
+            get_group_balances_as_of(self.group, timezone.localdate()), get_group_balances(self.group)
+        )
+
+    def test_past_date_ignores_later_entries(self):
+        self.add_expense('90.00', self.alice)
+        create_checkpoint(self.group.id)
+        earlier = get_group_balances(self.group)
+        self.backdate(days=3)
+
+        self.add_expense('60.00', self.bob)
+        create_checkpoint(self.group.id)
+
+        past = timezone.localdate() - timedelta(days=2)
+        self.assertEqual(get_group_balances_as_of(self.group, past), earlier)
+        self.assertEqual(get_group_balances_as_of(self.group, past - timedelta(days=2)), {})
+        self.assertEqual(get_group_balances_as_of(self.group, timezone.localdate()), get_group_balances(self.group))
+
+    def test_dates_before_the_opening_entries_are_rejected(self):
+        opened = timezone.now() - timedelta(days=10)
+        Group.objects.filter(pk=self.group.pk).update(created_at=opened - timedelta(days=30))
+        self.group.refresh_from_db()
+        BalanceJournalEntry.objects.create(
+            group=self.group, debtor=self.bob, creditor=self.alice,
+            amount='25.00', kind='opening', created_at=opened,
+        )
+        start = timezone.localdate(opened)
+
+        with self.assertRaises(HistoryUnavailable):
+            get_group_balances_as_of(self.group, start - timedelta(days=1))
+        self.assertEqual(get_group_balances_as_of(self.group, start), {'bob': {'alice': 25.0}})
+
+        response = self.client.get(
+            f'/api/groups/{self.group.id}/balances/', {'as_of': (start - timedelta(days=1)).isoformat()}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(start.isoformat(), response.json()['error'])
+
+    def test_groups_created_after_the_journal_have_full_history(self):
+        opened = timezone.now() - timedelta(days=10)
+        BalanceJournalEntry.objects.create(
+            group=self.group, debtor=self.bob, creditor=self.alice,
+            amount='0.00', kind='opening', created_at=opened,
+        )
+        newer = Group.objects.create(name='New', created_by=self.alice)
+        self.assertEqual(get_group_balances_as_of(newer, date(2000, 1, 1)), {})
+
+
+class DebtSolverPropertyTests(SimpleTestCase):
+    """
+    Randomised checks of the solver against the original greedy simplifier.
+    """
+    CASES = 200
+
+    def random_graphs(self, max_members):
+        rng = random.Random(20240601)
+        for _ in range(self.CASES):
+            members = rng.randint(2, max_members)
+            yield random_balances(rng, members, rng.randint(1, members * 3))
+
+    def test_every_strategy_settles_all_balances(self):
+        for balances in self.random_graphs(12):
+            net = net_positions(balances)
+            for strategy in ('auto', 'exact', 'heuristic'):
+                transfers = solve(net, strategy)
+                self.assertEqual(apply_transfers(net, transfers), {})
+                self.assertTrue(all(cents > 0 for _, _, cents in transfers))
+
+    def test_exact_never_needs_more_transfers_than_greedy(self):
+        for balances in self.random_graphs(10):
+            net = net_positions(balances)
+            greedy = greedy_simplify_debts(balances)
+            exact = solve(net, 'exact')
+            self.assertLessEqual(len(exact), len(greedy))
+            self.assertLessEqual(len(exact), max(len(net) - 1, 0))
+
+    def test_greedy_amounts_match_solver_net_positions(self):
+        for balances in self.random_graphs(10):
+            greedy = [
+                (row['from'], row['to'], to_cents(row['amount']))
+                for row in greedy_simplify_debts(balances)
+            ]
+            self.assertEqual(apply_transfers(net_positions(balances), greedy), {})
+
+    def test_exact_finds_independent_pairs(self):
+        net = {'a': -500, 'b': 500, 'c': -300, 'd': 300, 'e': -200, 'f': 200}
+        self.assertEqual(len(solve(net, 'exact')), 3)
+
+    def test_simplify_debts_keeps_output_format(self):
+        simplified = simplify_debts({'bob': {'alice': 10.5}, 'carol': {'alice': 4.25}})
+        self.assertEqual(
+            sorted((row['from'], row['to'], row['amount']) for row in simplified),
+            [('bob', 'alice', 10.5), ('carol', 'alice', 4.25)]
+        )
+
+    def test_rejects_unbalanced_positions(self):
+        with self.assertRaises(ValueError):
+            solve({'a': -100, 'b': 50})
+
+
+class BatchSimplifyTests(SimpleTestCase):
+    """
+    The vectorized simplifier against the per-group greedy pass.
+    """
+
+    def test_transfers_settle_every_group_like_greedy(self):
+        rng = random.Random(20240602)
+        group_ids, user_ids, cents, per_group = random_groups(rng, 300, 8)
+        transfers = simplify_debts_batch(group_ids, user_ids, cents)
+
+        nets = {}
+        for group_id, user_id, amount in zip(group_ids, user_ids, cents):
+            net = nets.setdefault(group_id, {})
+            net[user_id] = net.get(user_id, 0) + amount
+
+        by_group = {}
+        for row in transfers:
+            by_group.setdefault(int(row['group']), []).append((int(row['from']), int(row['to']), int(row['amount'])))
+
+        self.assertTrue((transfers['amount'] > 0).all())
+        for group_id, balances in enumerate(per_group):
+            group_transfers = by_group.get(group_id, [])
+            self.assertEqual(apply_transfers(nets[group_id], group_transfers), {})
+            self.assertEqual(len(group_transfers), len(greedy_simplify_debts(balances)))
+
+    def test_rejects_unbalanced_group(self):
+        with self.assertRaises(ValueError):
+            simplify_debts_batch([1, 1, 2, 2], [1, 2, 1, 2], [-100, 100, -100, 50])
+
+    def test_empty_input(self):
+        self.assertEqual(len(simplify_debts_batch([], [], [])), 0)
+
+
+class GroupStatisticsTests(TestCase):
+    """
+    Group statistics come from a fixed number of queries and agree with the splits.
+    """
+
+    def make_group(self, size):
+        members = [User.objects.create_user(f'member{self.created + i}') for i in range(size)]
+        self.created += size
+        group = Group.objects.create(name=f'group {self.created}', created_by=members[0])
+        group.members.add(*members)
+        create_expenses([
+            {
+                'group': group,
+                'description': f'expense {i}',
+                'amount': '20.00',
+                'paid_by': members[i % size],
+                'date': date(2024, 1, 1) + timedelta(days=i),
+                'split_members': [member.id for member in members[:2]],
+            }
+            for i in range(size)
+        ])
+        return group, members
+
+    def setUp(self):
+        self.created = 0
+
+    def test_query_count_does_not_grow_with_members(self):
+        small, _ = self.make_group(3)
+        large, _ = self.make_group(30)
+        counts = []
+        for group in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                calculate_group_statistics(group)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 4)
+
+    def test_figures_match_the_splits(self):
+        group, members = self.make_group(4)
+        stats = calculate_group_statistics(group)
+        self.assertEqual(stats['total_spent'], 80.0)
+        self.assertEqual(stats['expense_count'], 4)
+        for member in members:
+            paid = group.expenses.filter(paid_by=member).aggregate(total=Sum('amount'))['total'] or 0
+            owes = ExpenseSplit.objects.filter(
+                expense__group=group, user=member, is_settled=False
+            ).aggregate(total=Sum('amount_remaining'))['total'] or 0
+            self.assertEqual(stats['member_stats'][member.username], {
+                'paid': float(paid), 'owes': float(owes), 'balance': float(paid - owes),
+            })
+
+    def test_date_range_and_payer_breakdown(self):
+        group, members = self.make_group(4)
+        stats = calculate_group_statistics(
+            group, start_date=date(2024, 1, 2), end_date=date(2024, 1, 3), by_payer=True
+        )
+        self.assertEqual(stats['expense_count'], 2)
+        self.assertEqual(stats['total_spent'], 40.0)
+        # member0 owes 10.00 of each expense paid by member1 and member2
+        self.assertEqual(stats['member_stats']['member0']['owes_by_payer'], {'member1': 10.0, 'member2': 10.0})
+        self.assertEqual(stats['member_stats']['member1']['owes_by_payer'], {'member2': 10.0})
+
+
+class GroupResultCacheTests(TestCase):
+    """
+    Cached group results are reused until a write moves the group to a new version.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def add_expense(self, amount):
+        return create_expenses([{
+            'group': self.group,
+            'description': 'Taxi',
+            'amount': amount,
+            'paid_by': self.alice,
+            'date': date(2024, 1, 1),
+            'split_members': [self.alice.id, self.bob.id],
+        }])[0]
+
+    def version(self):
+        return Group.objects.get(pk=self.group.pk).version
+
+    def balances(self):
+        response = self.client.get(f'/api/groups/{self.group.id}/balances/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes_bump_the_version(self):
+        before = self.version()
+        expense = self.add_expense('10.00')
+        self.assertGreater(self.version(), before)
+
+        before = self.version()
+        self.client.force_login(self.bob)
+        response = self.client.post('/api/settlements/', {
+            'group': self.group.id, 'paid_to_id': self.alice.id, 'amount': '1.00'
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertGreater(self.version(), before)
+
+        before = self.version()
+        self.group.members.add(User.objects.create_user('carol'))
+        self.assertGreater(self.version(), before)
+
+        before = self.version()
+        Expense.objects.filter(pk=expense.pk).get().save()
+        self.assertGreater(self.version(), before)
+
+    def test_repeat_reads_hit_the_cache(self):
+        self.add_expense('10.00')
+        self.balances()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.balances(), {'bob': {'alice': 5.0}})
+        self.assertFalse(any('pairwisebalance' in q['sql'].lower() for q in queries))
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_write_invalidates_cached_balances(self):
+        self.add_expense('10.00')
+        self.assertEqual(self.balances(), {'bob': {'alice': 5.0}})
+        self.add_expense('20.00')
+        self.assertEqual(self.balances(), {'bob': {'alice': 15.0}})
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+        self.alice.is_staff = True
+        self.alice.save()
+        self.assertEqual(self.client.get('/api/cache-stats/').json(), {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+
+
+class AddExpenseTests(TestCase):
+    """
+    Expenses created through the bulk API or the web form go through the same checks.
+    """
+
+    def setUp(self):
+        self.alice, self.bob, self.mallory = (User.objects.create_user(name) for name in ('alice', 'bob', 'mallory'))
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+        self.url = f'/group/{self.group.id}/add-expense/'
+
+    def post_form(self, **overrides):
+        data = {
+            'description': 'Dinner',
+            'amount': '30.00',
+            'date': '2024-01-01',
+            'split_members': [self.alice.id, self.bob.id],
+            **overrides,
+        }
+        return self.client.post(self.url, data, follow=True)
+
+    def error_messages(self, response):
+        return [str(message) for message in response.context['messages'] if message.level_tag == 'error']
+
+    def test_form_creates_expense_and_splits(self):
+        response = self.post_form()
+        self.assertRedirects(response, f'/group/{self.group.id}/')
+        expense = Expense.objects.get(group=self.group)
+        self.assertEqual(expense.paid_by, self.alice)
+        self.assertEqual(
+            dict(expense.splits.values_list('user__username', 'amount_owed')), {'alice': 15, 'bob': 15}
+        )
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_form_rejects_bad_input(self):
+        cases = {
+            'outsider': {'split_members': [self.alice.id, self.mallory.id]},
+            'duplicate': {'split_members': [self.bob.id, self.bob.id]},
+            'no members': {'split_members': []},
+            'empty date': {'date': ''},
+            'bad date': {'date': '01/02/2024'},
+            'bad amount': {'amount': 'ten'},
+            'negative amount': {'amount': '-5'},
+        }
+        for case, overrides in cases.items():
+            with self.subTest(case):
+                response = self.post_form(**overrides)
+                self.assertRedirects(response, self.url)
+                self.assertTrue(self.error_messages(response))
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(ExpenseSplit.objects.exists())
+
+    def test_bulk_endpoint_creates_all_or_nothing(self):
+        item = {
+            'group': self.group.id, 'description': 'Fuel', 'amount': '20.00',
+            'date': '2024-01-02', 'split_members': [self.alice.id, self.bob.id],
+        }
+        response = self.client.post(
+            '/api/expenses/bulk/', json.dumps([item, {**item, 'split_members': [self.mallory.id]}]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['valid', 'invalid'])
+        self.assertFalse(Expense.objects.exists())
+
+        response = self.client.post('/api/expenses/bulk/', json.dumps([item] * 3), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(ExpenseSplit.objects.filter(expense__group=self.group).count(), 6)
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+
+class CsvImportTests(TestCase):
+    """
+    Bad rows in an import are reported and skipped without losing the rest of the file.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer')
+        self.group = Group.objects.create(name='Flat', created_by=self.user)
+        self.group.members.add(self.user)
+
+    def import_bytes(self, content):
+        return import_expenses_csv(self.group, SimpleUploadedFile('expenses.csv', content), self.user)
+
+    def rows(self, start, count):
+        return b''.join(b'2024-01-%02d,Row %d,10.00\r\n' % (i % 28 + 1, i) for i in range(start, start + count))
+
+    def test_invalid_utf8_row_does_not_end_the_import(self):
+        content = b'Date,Description,Amount\r\n' + self.rows(0, 5) + b'2024-01-06,Caf\xe9,10.00\r\n' + self.rows(5, 5)
+        report = self.import_bytes(content)
+
+        self.assertEqual((report['imported'], report['failed']), (10, 1))
+        self.assertEqual(report['errors'], [{'line': 7, 'error': 'Row is not valid UTF-8'}])
+        self.assertEqual(Expense.objects.filter(group=self.group).count(), 10)
+
+    def test_bad_rows_are_reported_by_line(self):
+        content = (
+            '\ufeffDate,Description,Amount\n'
+            '2024-01-01,"Multi\nline",5.00\n'
+            'not a date,Broken,5.00\n'
+            '2024-01-03,Fine,-1\n'
+            '2024-01-04,Last,7.50\n'
+        ).encode('utf-8')
+        report = self.import_bytes(content)
+
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual([error['line'] for error in report['errors']], [4, 5])
+
+    def test_non_utf8_header_is_rejected(self):
+        report = self.import_bytes(b'D\xe4te,Description,Amount\n2024-01-01,Row,1.00\n')
+        self.assertEqual(report['errors'], [{'line': 1, 'error': 'File is not UTF-8 encoded CSV'}])
+
+
+class CsvExportTests(TestCase):
+    """
+    The streamed export must contain every expense once, in order, in a fixed number of queries.
+    """
+
+    def setUp(self):
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def add_expenses(self, count):
+        # Three expenses per date, so pages also split between same-day rows
+        return create_expenses([
+            {
+                'group': self.group,
+                'description': f'expense {i}',
+                'amount': f'{i + 1}.00',
+                'paid_by': (self.alice, self.bob)[i % 2],
+                'date': date(2024, 1, 1) + timedelta(days=i // 3),
+                'split_members': [self.alice.id, self.bob.id] if i % 2 else [self.bob.id],
+            }
+            for i in range(count)
+        ])
+
+    def export(self, **params):
+        response = self.client.get(f'/group/{self.group.id}/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_rows_match_expenses(self):
+        self.add_expenses(7)
+        rows = list(csv.reader(StringIO(self.export().decode())))
+        self.assertEqual(rows[0], ['Date', 'Description', 'Amount', 'Paid By', 'Split Among'])
+        self.assertEqual(rows[1:], [
+            [
+                expense.date.isoformat(), expense.description, str(expense.amount), expense.paid_by.username,
+                'alice, bob' if expense.splits.count() == 2 else 'bob',
+            ]
+            for expense in Expense.objects.filter(group=self.group).order_by('-date', '-id')
+        ])
+
+    def test_date_range_and_gzip(self):
+        self.add_expenses(9)
+        plain = self.export(start='2024-01-02', end='2024-01-02')
+        self.assertEqual(len(plain.decode().splitlines()), 4)
+        self.assertEqual(gzip.decompress(self.export(start='2024-01-02', end='2024-01-02', compress='gzip')), plain)
+
+    def test_pages_cover_every_expense_once(self):
+        expenses = self.add_expenses(10)
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(iter_expense_chunks(self.group, chunk_size=4))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+        self.assertEqual(len(queries), 2 * len(chunks))
+        self.assertEqual(
+            [expense['id'] for chunk in chunks for expense in chunk],
+            [expense.id for expense in sorted(expenses, key=lambda e: (e.date, e.id), reverse=True)]
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        counts = []
+        for count in (1, 30):
+            self.add_expenses(count)
+            with CaptureQueriesContext(connection) as queries:
+                self.export()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ArchiveExportTests(TestCase):
+    """
+    Archive exports are built by the task queue, retried, and swept away when they expire.
+    """
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        patcher = patch('expenses.archives.EXPORT_ROOT', root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.group = Group.objects.create(name='Ski trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        create_expenses([{
+            'group': self.group, 'description': 'Lift pass', 'amount': '80.00', 'paid_by': self.alice,
+            'date': date(2024, 1, 1), 'split_members': [self.alice.id, self.bob.id],
+        }])
+        self.client.force_login(self.alice)
+
+    def run_export_task(self):
+        # Make retries due now; the retention sweep has a lower priority
+        Task.objects.filter(name='export_archive').update(run_after=timezone.now())
+        return tasks.run(tasks.claim('w', min_priority=0))
+
+    def test_archive_contains_every_group_file(self):
+        self.assertRedirects(self.client.post('/exports/'), '/profile/', fetch_redirect_response=False)
+        self.assertEqual(self.run_export_task().status, 'done')
+
+        job = ExportJob.objects.get(user=self.alice)
+        self.assertEqual(job.status, 'done')
+        response = self.client.get(f'/exports/{job.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            folder = f'{self.group.id}-Ski-trip'
+            self.assertEqual(sorted(archive.namelist()), [
+                f'{folder}/expenses.csv', f'{folder}/settlements.csv', f'{folder}/splits.csv',
+            ])
+            expenses = archive.read(f'{folder}/expenses.csv').decode().splitlines()
+        self.assertEqual(len(expenses), 2)
+        self.assertIn('Lift pass', expenses[1])
+
+    def test_job_stays_pending_until_retries_run_out(self):
+        job = start_export(self.alice)
+        with patch('expenses.archives.build_archive', side_effect=OSError('disk full')):
+            statuses = []
+            for _ in range(3):
+                self.run_export_task()
+                job.refresh_from_db()
+                statuses.append(job.status)
+        self.assertEqual(statuses, ['pending', 'pending', 'failed'])
+        self.assertEqual(job.error, 'disk full')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_expired_archives_are_deleted(self):
+        old, recent = start_export(self.alice), start_export(self.alice)
+        for _ in range(2):
+            self.run_export_task()
+        old.refresh_from_db()
+        ExportJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(Task.objects.filter(name='purge_exports', status='pending').count(), 1)
+        Task.objects.filter(name='purge_exports').update(run_after=timezone.now(), priority=100)
+        self.assertEqual(tasks.run(tasks.claim('w')).result, {'deleted': 1})
+        self.assertFalse(os.path.exists(old.file_path))
+        self.assertEqual(list(ExportJob.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Cursor pages and list filters of the expense, settlement and user APIs.
+    """
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob, self.carol)
+        self.client.force_login(self.alice)
+
+    def add_expense(self, amount, when=date(2024, 1, 1)):
+        return create_expenses([{
+            'group': self.group, 'description': 'Dinner', 'amount': amount, 'paid_by': self.alice,
+            'date': when, 'split_members': [self.alice.id, self.bob.id, self.carol.id],
+        }])[0]
+
+    def settle(self, user, amount):
+        self.client.force_login(user)
+        response = self.client.post('/api/settlements/', {
+            'group': self.group.id, 'paid_to_id': self.alice.id, 'amount': amount
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.client.force_login(self.alice)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_cursor_round_trip_visits_every_row_once(self):
+        # Several expenses share each date, so pages break inside ties
+        expenses = [self.add_expense('3.00', date(2024, 1, 1) + timedelta(days=i // 4)) for i in range(11)]
+        for i in range(5):
+            Settlement.objects.create(group=self.group, paid_by=self.bob, paid_to=self.alice, amount='1.00')
+
+        self.assertEqual(
+            self.walk(f'/api/expenses/?group={self.group.id}&page_size=3'),
+            [expense.id for expense in sorted(expenses, key=lambda e: (e.date, e.id), reverse=True)]
+        )
+        self.assertEqual(
+            self.walk(f'/api/settlements/?group={self.group.id}&page_size=2'),
+            list(Settlement.objects.order_by('-settled_at', '-id').values_list('id', flat=True))
+        )
+        self.assertEqual(
+            self.walk(f'/api/users/?group={self.group.id}&page_size=2'),
+            [self.alice.id, self.bob.id, self.carol.id]
+        )
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/expenses/?cursor=nonsense').status_code, 404)
+
+    def test_settled_filter(self):
+        settled = self.add_expense('30.00', date(2024, 1, 1))
+        partly = self.add_expense('30.00', date(2024, 1, 2))
+        open_ = self.add_expense('30.00', date(2024, 1, 3))
+        # Settlements pay off the oldest splits first: bob and carol clear the
+        # first expense, and bob also clears his share of the second
+        self.settle(self.bob, '20.00')
+        self.settle(self.carol, '10.00')
+
+        def listed(settled_param):
+            return set(self.walk(f'/api/expenses/?group={self.group.id}&settled={settled_param}'))
+
+        self.assertEqual(listed('true'), {settled.id})
+        self.assertEqual(listed('false'), {partly.id, open_.id})
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every API read must cost a fixed number of queries however many rows it
+    returns; an N+1 regression makes the large run exceed the budget.
+    """
+
+    def make_data(self, rows):
+        users = [User.objects.create_user(f'user{self.created + i}') for i in range(3)]
+        self.created += 3
+        users.append(self.user)
+
+        group = Group.objects.create(name=f'group {self.created}', created_by=users[0])
+        group.members.add(*users)
+
+        create_expenses([
+            {
+                'group': group,
+                'description': f'expense {i}',
+                'amount': '30.00',
+                'paid_by': users[i % len(users)],
+                'date': date(2024, 1, 1) + timedelta(days=i),
+                'split_members': [user.id for user in users],
+            }
+            for i in range(rows)
+        ])
+        Settlement.objects.bulk_create([
+            Settlement(group=group, paid_by=self.user, paid_to=users[i % 3], amount='5.00')
+            for i in range(rows)
+        ])
+        return group
+
+    def setUp(self):
+        # Group ids and versions repeat across rolled back tests, so cached
+        # results from an earlier test would otherwise be served as hits
+        cache.clear()
+        self.created = 0
+        self.user = User.objects.create_user('viewer')
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertQueryBudget(self, url_for_group, budget):
+        small = self.make_data(1)
+        small_count = self.count_queries(url_for_group(small))
+
+        large = self.make_data(40)
+        large_count = self.count_queries(url_for_group(large))
+
+        self.assertLessEqual(small_count, budget)
+        self.assertEqual(small_count, large_count, f'{url_for_group(large)} grows with row count')
+
+    def test_expense_list(self):
+        self.assertQueryBudget(lambda group: f'/api/expenses/?group={group.id}', 5)
+
+    def test_expense_detail(self):
+        self.assertQueryBudget(lambda group: f'/api/expenses/{group.expenses.last().id}/', 5)
+
+    def test_group_list(self):
+        self.assertQueryBudget(lambda group: '/api/groups/', 5)
+
+    def test_group_detail(self):
+        self.assertQueryBudget(lambda group: f'/api/groups/{group.id}/', 5)
+
+    def test_group_balances(self):
+        self.assertQueryBudget(lambda group: f'/api/groups/{group.id}/balances/', 5)
+
+    def test_settlement_list(self):
+        self.assertQueryBudget(lambda group: f'/api/settlements/?group={group.id}', 5)
+
+    def test_user_list(self):
+        self.assertQueryBudget(lambda group: f'/api/users/?group={group.id}', 5)
+
+
+class SeedDataFlushTests(TestCase):
+    """
+    seed_data --flush removes only what seed_data created.
+    """
+
+    def seed(self):
+        call_command('seed_data', users=4, groups=2, members=3, expenses=3, flush=True, stdout=StringIO())
+
+    def test_flush_keeps_real_accounts_sharing_the_prefix(self):
+        loader = User.objects.create_user('loader')
+        group = Group.objects.create(name='Warehouse', created_by=loader)
+
+        self.seed()
+        self.seed()
+
+        self.assertTrue(User.objects.filter(pk=loader.pk).exists())
+        self.assertTrue(Group.objects.filter(pk=group.pk).exists())
+        self.assertEqual(User.objects.filter(username__startswith='load').count(), 5)
+        self.assertEqual(Group.objects.filter(description='Seeded load data').count(), 2)
+
+
+@override_settings(SQL_PROFILING=True, SQL_PROFILING_SLOW_MS=60000, SQL_PROFILING_SLOW_QUERIES=50)
+class SQLProfilingMiddlewareTests(TestCase):
+    """
+    Opt-in Server-Timing headers and the slow request log.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.client.force_login(self.user)
+
+    def timings(self, response):
+        return dict(
+            (part.split(';')[0], part) for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/groups/')
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'app', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+
+    def test_fast_request_is_not_logged(self):
+        with self.assertNoLogs('expenses.sql'):
+            self.client.get('/api/groups/')
+
+    def test_slow_request_logs_repeated_statements(self):
+        group = Group.objects.create(name='Trip', created_by=self.user)
+        group.members.add(self.user)
+        with override_settings(SQL_PROFILING_SLOW_QUERIES=1), self.assertLogs('expenses.sql') as logs:
+            # The middleware reads its thresholds when the handler loads it
+            client = self.client_class()
+            client.force_login(self.user)
+            client.get(f'/api/groups/{group.id}/')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['path'], f'/api/groups/{group.id}/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreaterEqual(record['queries'], 1)
+        counts = [statement['count'] for statement in record['top_statements']]
+        self.assertTrue(counts)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertLessEqual(sum(counts), record['queries'])
+
+    @override_settings(SQL_PROFILING=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/groups/'))
+
+
+@override_settings(METRICS_TOKEN='s3cret')
+class MetricsEndpointTests(TestCase):
+    """
+    /metrics needs the bearer token or a staff login, whatever the client address.
+    """
+
+    def test_loopback_client_without_token_is_refused(self):
+        # The test client connects from 127.0.0.1, like everything behind a local proxy
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_bearer_token(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    def test_staff_login(self):
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class MoneyAcrossGroupsMixin:
+    """
+    alice is owed 50.00 in a trip (after bob paid 10.00 back) and owes bob
+    20.00 in a flat.
+    """
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = (User.objects.create_user(name) for name in ('alice', 'bob', 'carol'))
+        self.trip = Group.objects.create(name='Trip', created_by=self.alice)
+        self.trip.members.add(self.alice, self.bob, self.carol)
+        self.flat = Group.objects.create(name='Flat', created_by=self.bob)
+        self.flat.members.add(self.alice, self.bob)
+        create_expenses([
+            {
+                'group': self.trip, 'description': 'Hotel', 'amount': '90.00', 'paid_by': self.alice,
+                'date': date(2024, 1, 1), 'split_members': [self.alice.id, self.bob.id, self.carol.id],
+            },
+            {
+                'group': self.flat, 'description': 'Rent', 'amount': '40.00', 'paid_by': self.bob,
+                'date': date(2024, 1, 2), 'split_members': [self.alice.id, self.bob.id],
+            },
+        ])
+        self.client.force_login(self.bob)
+        response = self.client.post('/api/settlements/', {
+            'group': self.trip.id, 'paid_to_id': self.alice.id, 'amount': '10.00'
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.client.force_login(self.alice)
+
+    def add_groups(self, count):
+        for i in range(count):
+            group = Group.objects.create(name=f'Extra {i}', created_by=self.alice)
+            group.members.add(self.alice, self.carol)
+            create_expenses([{
+                'group': group, 'description': 'Snacks', 'amount': '10.00', 'paid_by': self.carol,
+                'date': date(2024, 1, 3), 'split_members': [self.alice.id, self.carol.id],
+            }])
+
+
+class DashboardTests(MoneyAcrossGroupsMixin, TestCase):
+    """
+    Dashboard cards show counts and the user's net balance, in a fixed number of queries.
+    """
+
+    def test_cards(self):
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        cards = {
+            group.name: (group.member_count, group.expense_count, group.net_balance)
+            for group in response.context['groups']
+        }
+        self.assertEqual(cards, {'Trip': (3, 1, 50), 'Flat': (2, 1, -20)})
+        self.assertEqual(response.context['total_net'], 30)
+        self.assertContains(response, 'Overall you are owed $30.00')
+
+    def test_query_count_does_not_grow_with_groups(self):
+        counts = []
+        for extra in (0, 10):
+            self.add_groups(extra)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/dashboard/').status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class UserSummaryTests(MoneyAcrossGroupsMixin, TestCase):
+    """
+    /api/users/me/summary/ totals the user's money across every group.
+    """
+
+    def summary(self):
+        response = self.client.get('/api/users/me/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_totals_and_breakdowns(self):
+        summary = self.summary()
+        self.assertEqual(
+            {key: summary[key] for key in (
+                'groups_count', 'expenses_count', 'total_paid', 'total_share', 'total_owed', 'total_owing', 'net'
+            )},
+            {
+                'groups_count': 2, 'expenses_count': 1, 'total_paid': 90.0, 'total_share': 50.0,
+                'total_owed': 50.0, 'total_owing': 20.0, 'net': 30.0,
+            }
+        )
+        groups = {group['name']: group for group in summary['groups']}
+        self.assertEqual((groups['Trip']['owed'], groups['Trip']['settled_received']), (50.0, 10.0))
+        self.assertEqual((groups['Flat']['owing'], groups['Flat']['net']), (20.0, -20.0))
+        # bob owes alice in one group and is owed by her in the other
+        self.assertEqual(
+            [(person['username'], person['owed'], person['owing'], person['net']) for person in summary['counterparties']],
+            [('carol', 30.0, 0.0, 30.0), ('bob', 20.0, 20.0, 0.0)]
+        )
+
+    def test_query_count_does_not_grow_with_groups(self):
+        counts = []
+        for extra in (0, 10):
+            self.add_groups(extra)
+            with CaptureQueriesContext(connection) as queries:
+                self.summary()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.summary()['groups_count'], 12)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertIn(self.client.get('/api/users/me/summary/').status_code, (401, 403))
+
+
+class SettlementAllocationTests(TestCase):
+    """
+    Settlements pay down the payer's splits oldest first, partly settling the last one.
+    """
+
+    def setUp(self):
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.group = Group.objects.create(name='Flat', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        # bob owes alice 10.00, 20.00 and 30.00; created newest first, so FIFO must follow the dates
+        self.expenses = create_expenses([
+            {
+                'group': self.group, 'description': f'Bill {day}', 'amount': f'{amount}.00', 'paid_by': self.alice,
+                'date': date(2024, 1, day), 'split_members': [self.alice.id, self.bob.id],
+            }
+            for day, amount in ((3, 60), (2, 40), (1, 20))
+        ])
+        self.client.force_login(self.bob)
+
+    def pay(self, amount):
+        response = self.client.post('/api/settlements/', {
+            'group': self.group.id, 'paid_to_id': self.alice.id, 'amount': amount
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['allocation']
+
+    def bob_owes(self):
+        return [
+            (str(split.amount_remaining), split.is_settled)
+            for split in ExpenseSplit.objects.filter(user=self.bob).order_by('expense__date')
+        ]
+
+    def test_partial_payment(self):
+        self.assertEqual(self.pay('15.00'), {
+            'allocated': 15.0, 'unallocated': 0.0, 'splits_settled': 1, 'splits_partially_settled': 1,
+        })
+        self.assertEqual(self.bob_owes(), [('0.00', True), ('15.00', False), ('30.00', False)])
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_exact_payoff(self):
+        self.assertEqual(self.pay('60.00'), {
+            'allocated': 60.0, 'unallocated': 0.0, 'splits_settled': 3, 'splits_partially_settled': 0,
+        })
+        self.assertEqual(self.bob_owes(), [('0.00', True)] * 3)
+        self.assertFalse(PairwiseBalance.objects.filter(group=self.group).exclude(amount=0).exists())
+
+    def test_overpayment_leaves_the_rest_unallocated(self):
+        self.assertEqual(self.pay('75.00'), {
+            'allocated': 60.0, 'unallocated': 15.0, 'splits_settled': 3, 'splits_partially_settled': 0,
+        })
+        self.assertEqual(self.bob_owes(), [('0.00', True)] * 3)
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+    def test_paying_yourself_is_rejected(self):
+        response = self.client.post('/api/settlements/', {
+            'group': self.group.id, 'paid_to_id': self.bob.id, 'amount': '5.00'
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            f'/group/{self.group.id}/settle-debt/', {'paid_to': self.bob.id, 'amount': '5.00'}, follow=True
+        )
+        self.assertRedirects(response, f'/group/{self.group.id}/settle-debt/')
+        self.assertIn('You cannot pay yourself!', [str(message) for message in response.context['messages']])
+        self.assertFalse(Settlement.objects.exists())
+
+    def test_web_form_allocates(self):
+        response = self.client.post(f'/group/{self.group.id}/settle-debt/', {'paid_to': self.alice.id, 'amount': '30.00'})
+        self.assertRedirects(response, f'/group/{self.group.id}/', fetch_redirect_response=False)
+        self.assertEqual(self.bob_owes(), [('0.00', True), ('0.00', True), ('30.00', False)])
+        self.assertEqual(verify_group_ledger(self.group), [])
+
+
+class MoneyTests(SimpleTestCase):
+    """
+    Integer-cent conversions and splits never lose or invent a cent.
+    """
+
+    def test_split_cents_adds_up(self):
+        rng = random.Random(20240601)
+        for _ in range(500):
+            total, parts = rng.randint(0, 10 ** 7), rng.randint(1, 50)
+            shares = split_cents(total, parts)
+            self.assertEqual(len(shares), parts)
+            self.assertEqual(sum(shares), total)
+            self.assertLessEqual(max(shares) - min(shares), 1)
+            self.assertEqual(shares, sorted(shares, reverse=True))
+
+    def test_split_amount(self):
+        self.assertEqual(split_amount('100.00', 3), [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')])
+        self.assertEqual(split_amount('0.05', 2), [Decimal('0.03'), Decimal('0.02')])
+        with self.assertRaises(ValueError):
+            split_cents(100, 0)
+
+    def test_to_cents(self):
+        self.assertEqual(to_cents(0.1 + 0.2), 30)
+        self.assertEqual(to_cents(12), 1200)
+        self.assertEqual(to_cents('19.99'), 1999)
+        self.assertEqual(to_cents(Decimal('0.005')), 1)
+        self.assertEqual(to_cents(Decimal('-0.005')), -1)
+        self.assertEqual(cents_to_float(to_cents('1234.56')), 1234.56)
+        self.assertEqual(from_cents(1999), Decimal('19.99'))
+
+    def test_parse_amount(self):
+        self.assertEqual(parse_amount(' $1,234.5 '), Decimal('1234.50'))
+        for text in ('', 'ten', '0', '-1', '1.234', 'NaN', 'Infinity'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_amount(text)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every hot query shape and fail if it reads a whole table.
+    Runs on SQLite, and on PostgreSQL when that is the configured database.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=40, groups=10, members=5, expenses=100, settlement_ratio=0.5, prefix='plan')
+        cls.group = Group.objects.order_by('id').first()
+        # plan0 is in every group; plans are checked for a typical member
+        cls.user, cls.other = cls.group.members.exclude(username='plan0').order_by('id')[:2]
+        cls.expense = cls.group.expenses.first()
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # Tables this small would otherwise be seq scanned on cost alone
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def full_scans(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            return [line for line in plan.splitlines() if re.search(r'\bSCAN (?!CONSTANT ROW)', line)]
+        if connection.vendor == 'postgresql':
+            return [line for line in plan.splitlines() if 'Seq Scan' in line]
+        self.skipTest(f'No plan check for {connection.vendor}')
+
+    def assertNoFullScan(self, queryset):
+        scans = self.full_scans(queryset)
+        self.assertEqual(scans, [], f'Full scan in plan for:\n{queryset.query}\n{queryset.explain()}')
+
+    def test_open_splits_by_group(self):
+        # ledger.compute_pairs_from_splits / calculate_group_statistics
+        self.assertNoFullScan(
+            ExpenseSplit.objects.filter(expense__group=self.group, is_settled=False)
+            .values('user_id', 'expense__paid_by_id').annotate(total=Sum('amount_remaining'))
+        )
+
+    def test_open_splits_for_allocation(self):
+        # settlements.allocate_settlement
+        self.assertNoFullScan(
+            ExpenseSplit.objects.filter(
+                expense__group=self.group, user=self.user, expense__paid_by=self.other, is_settled=False
+            ).order_by('expense__date', 'expense_id', 'id').values_list('id', 'amount_remaining')
+        )
+
+    def test_open_splits_of_expense(self):
+        # ledger.reverse_expense
+        self.assertNoFullScan(
+            ExpenseSplit.objects.filter(expense=self.expense, is_settled=False).values_list('user_id', 'amount_remaining')
+        )
+
+    def test_splits_by_user(self):
+        # summary.user_summary
+        self.assertNoFullScan(
+            ExpenseSplit.objects.filter(user=self.user).order_by()
+            .values('expense__group').annotate(total=Sum('amount_owed'))
+        )
+
+    def test_expenses_by_group_and_date(self):
+        # ExpensePagination / exporters.iter_expense_chunks
+        self.assertNoFullScan(Expense.objects.filter(group=self.group).order_by('-date', '-id')[:51])
+
+    def test_paid_by_member(self):
+        # calculate_group_statistics
+        self.assertNoFullScan(
+            Expense.objects.filter(group=self.group).order_by().values('paid_by').annotate(total=Sum('amount'))
+        )
+
+    def test_settlements_by_group(self):
+        self.assertNoFullScan(Settlement.objects.filter(group=self.group).order_by('-settled_at', '-id')[:51])
+
+    def test_settlements_by_user(self):
+        # SettlementViewSet.get_queryset
+        self.assertNoFullScan(
+            Settlement.objects.filter(Q(paid_by=self.user) | Q(paid_to=self.user)).order_by('-settled_at', '-id')[:51]
+        )
+
+    def test_ledger_by_group(self):
+        # ledger.get_group_balances
+        self.assertNoFullScan(PairwiseBalance.objects.filter(group=self.group).exclude(amount=0))
+
+    def test_ledger_by_user(self):
+        # summary.user_summary
+        self.assertNoFullScan(
+            PairwiseBalance.objects.filter(Q(debtor=self.user) | Q(creditor=self.user)).exclude(amount=0)
+        )
+
+
+class FakePgConnection:
+    """
+    Stands in for a psycopg2 connection; a dead one fails its health check.
+    """
+
+    def __init__(self, dead=False):
+        self.dead = dead
+        self.closed = 0
+        self.resets = 0
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def reset(self):
+        self.resets += 1
+
+    @contextmanager
+    def cursor(self):
+        cursor = SimpleNamespace(execute=self.execute)
+        yield cursor
+
+    def execute(self, sql):
+        if self.dead:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+    def close(self):
+        self.closed = 1
+
+
+@skipUnless(psycopg2, 'needs psycopg2')
+class PooledPostgresBackendTests(SimpleTestCase):
+    """
+    The pooled backend replaces dead connections and makes borrowers wait
+    for a free one, checked against fake psycopg2 connections.
+    """
+
+    def setUp(self):
+        from .backends.postgresql_pool import base as pool_backend
+
+        self.backend = pool_backend
+        for patcher in (
+            patch.dict(pool_backend._pools, clear=True),
+            patch('psycopg2.extras.register_default_jsonb'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connect_returning(self, *connections):
+        patcher = patch('psycopg2.connect', side_effect=connections)
+        connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        return connect
+
+    def wrapper(self, **pool):
+        return self.backend.DatabaseWrapper({
+            'ENGINE': 'expenses.backends.postgresql_pool',
+            'NAME': 'expenses', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'OPTIONS': {}, 'CONN_HEALTH_CHECKS': True, 'CONN_MAX_AGE': 0, 'TIME_ZONE': None,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'TEST': {},
+            'POOL': {'MIN_SIZE': 2, 'MAX_SIZE': 2, 'TIMEOUT': 1, **pool},
+        }, 'pooled')
+
+    def test_dead_connections_are_replaced(self):
+        dead = [FakePgConnection(dead=True), FakePgConnection(dead=True)]
+        fresh = FakePgConnection()
+        connect = self.connect_returning(*dead, fresh)
+
+        connection = self.wrapper().get_new_connection({'dbname': 'expenses'})
+        self.assertIs(connection, fresh)
+        self.assertEqual(connect.call_count, 3)
+        self.assertTrue(all(conn.closed for conn in dead))
+        self.assertEqual(fresh.resets, 1)
+
+    def test_gives_up_when_every_connection_is_dead(self):
+        self.connect_returning(*(FakePgConnection(dead=True) for _ in range(3)))
+        with self.assertRaises(psycopg2.OperationalError):
+            self.wrapper().get_new_connection({'dbname': 'expenses'})
+
+    def test_borrower_waits_for_a_free_connection(self):
+        self.connect_returning(FakePgConnection(), FakePgConnection())
+        pool = self.backend.BlockingPool(1, 1, 2, dbname='expenses')
+        first = pool.getconn()
+
+        timer = threading.Timer(0.1, pool.putconn, [first])
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertIs(pool.getconn(), first)
+
+    def test_full_pool_times_out(self):
+        self.connect_returning(FakePgConnection())
+        pool = self.backend.BlockingPool(1, 1, 0.05, dbname='expenses')
+        pool.getconn()
+        with self.assertRaisesMessage(psycopg2.OperationalError, 'MAX_SIZE is 1'):
+            pool.getconn()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'replicates with the SQLite backup API')
+@override_settings(DB_REPLICAS=['replica'], DB_PRIMARY_PIN_SECONDS=30)
+class ReadReplicaRouterTests(TransactionTestCase):
+    """
+    PrimaryReplicaRouter against two SQLite databases. Replication is
+    stood in for by replicate(), so anything written after it is "lag":
+    on the primary but not yet on the replica.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A second database alias only these tests use. It is overwritten
+        # wholesale by replicate(), so the test runner needn't manage it.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['replica'] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def replicate(self):
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def setUp(self):
+        cache.clear()
+        # Schema first: logging in reads the session table on the replica
+        self.replicate()
+        self.user = User.objects.create_user('writer')
+        self.other = User.objects.create_user('reader')
+        self.group = Group.objects.create(name='trip', created_by=self.user)
+        self.group.members.add(self.user, self.other)
+        self.client.force_login(self.user)
+        self.reader = self.client_class()
+        self.reader.force_login(self.other)
+        self.replicate()
+
+    def add_expense(self, client):
+        response = client.post('/api/expenses/', json.dumps({
+            'group': self.group.id,
+            'description': 'dinner',
+            'amount': '30.00',
+            'date': '2024-01-01',
+            'split_members': [self.user.id, self.other.id],
+        }), content_type='application/json', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response
+
+    def expense_count(self, client):
+        response = client.get(f'/api/expenses/?group={self.group.id}', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(response.json()['results'])
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        self.assertEqual(router.db_for_read(Group), 'replica')
+        self.assertEqual(router.db_for_write(Group), 'default')
+
+        Group.objects.create(name='new', created_by=self.user)
+        self.assertEqual(Group.objects.using('default').count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+
+        self.replicate()
+        self.assertEqual(Group.objects.count(), 2)
+
+    def test_reads_inside_a_transaction_use_primary(self):
+        with transaction.atomic():
+            Group.objects.create(name='new', created_by=self.user)
+            self.assertEqual(router.db_for_read(Group), 'default')
+            self.assertEqual(Group.objects.count(), 2)
+
+    def test_writer_reads_own_writes_until_replica_catches_up(self):
+        response = self.add_expense(self.client)
+        self.assertIn('db_primary_until', response.cookies)
+
+        # The writer is pinned to the primary; everyone else still reads the lagging replica
+        self.assertEqual(self.expense_count(self.client), 1)
+        self.assertEqual(self.expense_count(self.reader), 0)
+
+        self.replicate()
+        self.assertEqual(self.expense_count(self.reader), 1)
+
+    @override_settings(DB_PRIMARY_PIN_SECONDS=0)
+    def test_pin_expires_after_window(self):
+        self.add_expense(self.client)
+        self.assertEqual(self.expense_count(self.client), 0)
+
+    def test_reads_do_not_pin(self):
+        response = self.client.get(f'/api/expenses/?group={self.group.id}', HTTP_HOST='localhost')
+        self.assertNotIn('db_primary_until', response.cookies)
+
+
+class AsyncApiTests(MoneyAcrossGroupsMixin, TestCase):
+    """
+    The async endpoints answer like their sync counterparts and stream group events.
+    """
+
+    async def get_both(self, sync_url, async_url):
+        await self.async_client.aforce_login(self.alice)
+        expected = await sync_to_async(self.client.get)(sync_url)
+        response = await self.async_client.get(async_url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return expected.json(), response.json()
+
+    async def test_group_endpoints_match_the_sync_api(self):
+        for name in ('balances', 'statistics'):
+            with self.subTest(name):
+                expected, actual = await self.get_both(
+                    f'/api/groups/{self.trip.id}/{name}/', f'/api/async/groups/{self.trip.id}/{name}/'
+                )
+                self.assertEqual(actual, expected)
+
+        expected, actual = await self.get_both(
+            f'/api/groups/{self.trip.id}/statistics/?by_payer=true&start=2024-01-01',
+            f'/api/async/groups/{self.trip.id}/statistics/?by_payer=true&start=2024-01-01',
+        )
+        self.assertEqual(actual, expected)
+
+        expected, actual = await self.get_both(
+            f'/api/groups/{self.trip.id}/balances/?as_of=2099-01-01',
+            f'/api/async/groups/{self.trip.id}/balances/?as_of=2099-01-01',
+        )
+        self.assertEqual(actual, expected)
+
+    async def test_settlements_and_summary(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(f'/api/async/groups/{self.trip.id}/settlements/')
+        self.assertEqual(
+            sorted((row['from'], row['to'], row['amount']) for row in response.json()),
+            [('bob', 'alice', 20.0), ('carol', 'alice', 30.0)]
+        )
+
+        expected, actual = await self.get_both('/api/users/me/summary/', '/api/async/users/me/summary/')
+        self.assertEqual(actual, expected)
+
+    async def test_dashboard(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get('/api/async/dashboard/')
+        self.assertEqual(
+            {group['name']: (group['member_count'], group['net_balance']) for group in response.json()['groups']},
+            {'Trip': (3, 50.0), 'Flat': (2, -20.0)}
+        )
+        self.assertEqual(response.json()['total_net'], 30.0)
+
+    async def test_errors(self):
+        self.assertEqual((await self.async_client.get('/api/async/dashboard/')).status_code, 403)
+
+        await self.async_client.aforce_login(self.carol)
+        self.assertEqual((await self.async_client.get(f'/api/async/groups/{self.flat.id}/balances/')).status_code, 404)
+        self.assertEqual((await self.async_client.post('/api/async/dashboard/')).status_code, 405)
+        response = await self.async_client.get(f'/api/async/groups/{self.trip.id}/balances/?as_of=soon')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_event_stream(self):
+        # A hub without its poller thread; the test drives poll()
+        live_hub = LiveHub()
+        live_hub.subscribe = lambda subscription: live_hub.subscribers[subscription.group_id].add(subscription)
+        await self.async_client.aforce_login(self.alice)
+        version = (await Group.objects.aget(pk=self.trip.pk)).version
+        with patch('expenses.live.hub', live_hub):
+            response = await self.async_client.get(f'/group/{self.trip.id}/events/?version={version - 1}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(response['Cache-Control'], 'no-cache')
+
+            events = aiter(response.streaming_content)
+            self.assertEqual(await anext(events), b'retry: 3000\n\n')
+            await sync_to_async(live_hub.poll)([self.trip.id])
+            self.assertEqual(
+                await asyncio.wait_for(anext(events), 1),
+                f'id: {version}\nevent: resync\ndata: {{"version":{version}}}\n\n'.encode()
+            )
+            await response.streaming_content.aclose()
+
+
+class LiveGroupEventsTests(TestCase):
+    """
+    LiveHub turns a group's version changes into one event per write for its subscribers.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        self.group = Group.objects.create(name='Flat', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob)
+        self.hub = LiveHub()
+
+    def subscribe(self, version):
+        # Registered directly so no poller thread starts; the tests drive poll()
+        subscription = Subscription(self.group.id, version)
+        self.hub.subscribers[self.group.id].add(subscription)
+        return subscription
+
+    def add_expense(self, amount):
+        return create_expenses([{
+            'group': self.group, 'description': 'Groceries', 'amount': amount,
+            'paid_by': self.alice, 'date': date(2024, 3, 1),
+            'split_members': [self.alice.id, self.bob.id],
+        }])[0]
+
+    def version(self):
+        return Group.objects.get(pk=self.group.pk).version
+
+    def events(self, subscription):
+        messages = []
+        while not subscription.events.empty():
+            message = subscription.events.get()
+            event = re.search(r'^event: (\w+)$', message, re.M).group(1)
+            messages.append((event, json.loads(re.search(r'^data: (.*)$', message, re.M).group(1))))
+        return messages
+
+    def test_write_reaches_every_subscriber_as_one_change(self):
+        watchers = [self.subscribe(self.version()) for _ in range(3)]
+        self.hub.poll([self.group.id])
+        self.assertEqual([self.events(watcher) for watcher in watchers], [[], [], []])
+
+        previous = self.version()
+        expense = self.add_expense('30.00')
+        self.hub.poll([self.group.id])
+
+        for watcher in watchers:
+            [(event, change)] = self.events(watcher)
+            self.assertEqual(event, 'change')
+            self.assertEqual((change['previous'], change['version']), (previous, self.version()))
+            self.assertEqual(change['balances'], [['bob', 'alice', 15.0]])
+            self.assertEqual([row['id'] for row in change['expenses']['added']], [expense.id])
+            self.assertEqual(change['statistics']['total_spent'], 30.0)
+            self.assertEqual(watcher.version, self.version())
+
+    def test_deleted_expense_and_paid_off_pair(self):
+        expense = self.add_expense('30.00')
+        watcher = self.subscribe(self.version())
+        self.hub.poll([self.group.id])
+
+        expense_id = expense.id
+        with transaction.atomic():
+            reverse_expense(expense)
+            expense.delete()
+        self.hub.poll([self.group.id])
+
+        [(event, change)] = self.events(watcher)
+        self.assertEqual(change['balances'], [['bob', 'alice', 0]])
+        self.assertEqual(change['expenses'], {'added': [], 'removed': [expense_id]})
+
+    def test_subscriber_behind_by_more_than_one_change_resyncs(self):
+        stale = self.subscribe(self.version() - 1)
+        current = self.subscribe(self.version())
+        self.hub.poll([self.group.id])
+
+        self.assertEqual(self.events(stale), [('resync', {'version': self.version()})])
+        self.assertEqual(self.events(current), [])
+
+        self.add_expense('10.00')
+        self.add_expense('20.00')
+        self.hub.poll([self.group.id])
+        # Two writes between ticks are one change, from the version both last saw
+        self.assertEqual([event for event, _ in self.events(stale)], ['change'])
+        self.assertEqual([event for event, _ in self.events(current)], ['change'])
+
+
+class LivePageTransportTests(TestCase):
+    """
+    Group pages only open an event stream when served over ASGI.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.group = Group.objects.create(name='Flat', created_by=self.user)
+        self.group.members.add(self.user)
+        self.client.force_login(self.user)
+
+    def test_wsgi_page_polls_the_version_instead_of_streaming(self):
+        response = self.client.get(f'/group/{self.group.id}/')
+        self.assertNotContains(response, 'data-events-url')
+        self.assertContains(response, f'data-version-url="/group/{self.group.id}/version/"')
+
+        version = self.client.get(f'/group/{self.group.id}/version/')
+        self.assertEqual(version.json(), {'version': Group.objects.get(pk=self.group.pk).version})
+
+    async def test_asgi_page_streams(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(f'/group/{self.group.id}/')
+        self.assertContains(response, f'data-events-url="/group/{self.group.id}/events/"')
+
+    def test_version_of_someone_elses_group_is_hidden(self):
+        other = Group.objects.create(name='Other', created_by=User.objects.create_user('bob'))
+        self.assertEqual(self.client.get(f'/group/{other.id}/version/').status_code, 404)
+
+
+class TaskQueueTests(TestCase):
+    """
+    Claiming order, retries and recovery of the database task queue.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.group = Group.objects.create(name='Flat', created_by=self.user)
+        self.group.members.add(self.user)
+        tasks.task('fail', max_attempts=3)(self.fail_task)
+        self.addCleanup(tasks.registry.pop, 'fail')
+
+    @staticmethod
+    def fail_task():
+        raise RuntimeError('boom')
+
+    def test_higher_priority_then_oldest_first(self):
+        low = tasks.enqueue('rebuild_ledger', {'group_id': self.group.id})
+        first = tasks.enqueue('export_archive', {'job_id': 1})
+        second = tasks.enqueue('export_archive', {'job_id': 2})
+        high = tasks.enqueue('refresh_statistics', {'group_id': self.group.id})
+        later = tasks.enqueue('refresh_statistics', {'group_id': self.group.id}, priority=50, delay=60)
+
+        claimed = [tasks.claim('w').pk for _ in range(4)]
+        self.assertEqual(claimed, [high.pk, first.pk, second.pk, low.pk])
+        # Not due yet
+        self.assertIsNone(tasks.claim('w'))
+        self.assertEqual(Task.objects.get(pk=later.pk).status, 'pending')
+
+    def test_min_priority(self):
+        tasks.enqueue('rebuild_ledger', {'group_id': self.group.id})
+        self.assertIsNone(tasks.claim('w', min_priority=0))
+        self.assertIsNotNone(tasks.claim('w'))
+
+    def test_task_claimed_by_one_worker_is_not_handed_to_another(self):
+        tasks.enqueue('refresh_statistics', {'group_id': self.group.id})
+        first = tasks.claim('w1')
+        self.assertEqual((first.status, first.attempts, first.locked_by), ('running', 1, 'w1'))
+        self.assertIsNone(tasks.claim('w2'))
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        task = tasks.enqueue('fail')
+        delays = []
+        for attempt in range(1, 4):
+            # Make the retry due now
+            Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+            claimed = tasks.claim('w')
+            self.assertEqual(claimed.attempts, attempt)
+            started = timezone.now()
+            task = tasks.run(claimed)
+            self.assertEqual(task.error, 'RuntimeError: boom')
+            if task.status == 'pending':
+                delays.append(round((task.run_after - started).total_seconds()))
+
+        self.assertEqual(delays, [tasks.RETRY_DELAY, tasks.RETRY_DELAY * 2])
+        self.assertEqual(task.status, 'failed')
+        self.assertIsNotNone(task.finished_at)
+
+    def test_success_stores_result(self):
+        create_expenses([{
+            'group': self.group, 'description': 'Rent', 'amount': '100.00', 'paid_by': self.user,
+            'date': date(2024, 1, 1), 'split_members': [self.user.id],
+        }])
+        tasks.enqueue('refresh_statistics', {'group_id': self.group.id})
+        task = tasks.run(tasks.claim('w'))
+        self.assertEqual(task.status, 'done')
+        self.assertEqual(task.result['total_spent'], 100.0)
+
+    def test_statistics_options(self):
+        create_expenses([{
+            'group': self.group, 'description': f'Rent {month}', 'amount': '100.00', 'paid_by': self.user,
+            'date': date(2024, month, 1), 'split_members': [self.user.id],
+        } for month in (1, 2)])
+        tasks.enqueue('refresh_statistics', {'group_id': self.group.id, 'start': '2024-02-01', 'by_payer': True})
+        task = tasks.run(tasks.claim('w'))
+        self.assertEqual(task.result, calculate_group_statistics(self.group, start_date=date(2024, 2, 1), by_payer=True))
+        self.assertEqual(task.result['total_spent'], 100.0)
+
+    def test_requeue_stale(self):
+        hour_ago = timezone.now() - timedelta(hours=1)
+        orphan = tasks.enqueue('refresh_statistics', {'group_id': self.group.id})
+        exhausted = tasks.enqueue('rebuild_ledger', {'group_id': self.group.id})
+        fresh = tasks.enqueue('export_archive', {'job_id': 1})
+        Task.objects.filter(pk=orphan.pk).update(status='running', attempts=1, started_at=hour_ago)
+        Task.objects.filter(pk=exhausted.pk).update(status='running', attempts=1, started_at=hour_ago)
+        Task.objects.filter(pk=fresh.pk).update(status='running', attempts=1, started_at=timezone.now())
+
+        self.assertEqual(tasks.requeue_stale(), 2)
+        statuses = dict(Task.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            (statuses[orphan.pk], statuses[exhausted.pk], statuses[fresh.pk]),
+            ('pending', 'failed', 'running')
+        )
+
+    def test_unique_enqueue_is_per_user(self):
+        bob = User.objects.create_user('bob')
+        self.group.members.add(bob)
+        alices = tasks.enqueue('refresh_statistics', {'group_id': self.group.id}, user=self.user, unique=True)
+        again = tasks.enqueue('refresh_statistics', {'group_id': self.group.id}, user=self.user, unique=True)
+        self.assertEqual(again.pk, alices.pk)
+
+        self.client.force_login(bob)
+        response = self.client.post(f'/api/groups/{self.group.id}/statistics/')
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['id'], alices.pk)
+        self.assertEqual(self.client.get(f'/api/tasks/{response.json()["id"]}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/tasks/{alices.pk}/').status_code, 404)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'exercises the conditional UPDATE claim used without SKIP LOCKED')
+class ConcurrentTaskClaimTests(TransactionTestCase):
+    """
+    Workers claiming at the same time never get the same task.
+    """
+
+    def test_each_task_claimed_once(self):
+        for _ in range(60):
+            tasks.enqueue('export_archive', {'job_id': 0})
+
+        claimed = []
+        errors = []
+
+        def work(name):
+            try:
+                while True:
+                    try:
+                        task = tasks.claim(name)
+                    except OperationalError:
+                        # The shared-cache in-memory test database reports
+                        # contention at once instead of waiting out a busy timeout
+                        continue
+                    if task is None:
+                        break
+                    claimed.append(task.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, args=(f'w{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), sorted(Task.objects.values_list('pk', flat=True)))
+        self.assertEqual(set(Task.objects.values_list('status', 'attempts')), {('running', 1)})
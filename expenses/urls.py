@@ -2,12 +2,15 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
-    GroupViewSet, ExpenseViewSet, SettlementViewSet, UserViewSet,
+    GroupViewSet, ExpenseViewSet, SettlementViewSet, UserViewSet, ExportJobViewSet, TaskViewSet,
     register_view, login_view, logout_view, dashboard_view,
     create_group_view, group_detail_view, add_expense_view,
     settle_debt_view, delete_expense_view, export_expenses_csv,
-    home_view, profile_view, add_members_view
+    home_view, profile_view, add_members_view, cache_stats_view,
+    import_expenses_view, export_archive_view, download_archive_view, metrics_view,
+    group_version_view
 )
 
 router = DefaultRouter()
@@ -15,6 +18,8 @@ router.register(r'groups', GroupViewSet, basename='group')
 router.register(r'expenses', ExpenseViewSet, basename='expense')
 router.register(r'settlements', SettlementViewSet, basename='settlement')
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'exports', ExportJobViewSet, basename='export')
+router.register(r'tasks', TaskViewSet, basename='task')
 
 urlpatterns = [
     # Web Interface URLs
@@ -29,9 +34,23 @@ urlpatterns = [
     path('group/<int:group_id>/add-expense/', add_expense_view, name='add_expense'),
     path('group/<int:group_id>/settle-debt/', settle_debt_view, name='settle_debt'),
     path('group/<int:group_id>/export/', export_expenses_csv, name='export_expenses'),
+    path('group/<int:group_id>/import/', import_expenses_view, name='import_expenses'),
     path('group/<int:group_id>/add-members/', add_members_view, name='add_members'),
+    path('group/<int:group_id>/events/', async_views.group_events, name='group_events'),
+    path('group/<int:group_id>/version/', group_version_view, name='group_version'),
     path('delete-expense/<int:expense_id>/', delete_expense_view, name='delete_expense'),
+    path('exports/', export_archive_view, name='export_archive'),
+    path('exports/<int:job_id>/download/', download_archive_view, name='download_archive'),
     
     # API URLs
+    path('api/cache-stats/', cache_stats_view, name='cache_stats'),
+    path('metrics', metrics_view, name='metrics'),
+    
+    # Native async reads, for ASGI servers
+    path('api/async/groups/<int:group_id>/balances/', async_views.group_balances, name='async_group_balances'),
+    path('api/async/groups/<int:group_id>/settlements/', async_views.group_settlements, name='async_group_settlements'),
+    path('api/async/groups/<int:group_id>/statistics/', async_views.group_statistics, name='async_group_statistics'),
+    path('api/async/dashboard/', async_views.dashboard, name='async_dashboard'),
+    path('api/async/users/me/summary/', async_views.user_summary, name='async_user_summary'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,12 +1,41 @@
 # expenses/utils.py
 
+import asyncio
 from decimal import Decimal
 from collections import defaultdict
+from .solver import net_positions, solve
+from .money import to_cents, cents_to_float
+from .metrics import timed
 
-def simplify_debts(balances):
+async def alist(queryset):
+    """
+    Evaluate a queryset with the async ORM, e.g. for asyncio.gather.
+    """
+    return [row async for row in queryset]
+
+@timed('simplify_debts')
+def simplify_debts(balances, strategy='auto'):
     """
     Simplify debts to minimize number of transactions.
+    Works in integer cents; small groups are solved exactly, larger ones
+    with a fast heuristic (see expenses.solver for the strategies).
+    """
+    net = net_positions(balances)
+    
+    return [
+        {
+            'from': debtor,
+            'to': creditor,
+            'amount': cents_to_float(cents)
+        }
+        for debtor, creditor, cents in solve(net, strategy=strategy)
+    ]
+
+def greedy_simplify_debts(balances):
+    """
+    Original single-pass greedy simplifier.
     Uses greedy algorithm to match biggest debtor with biggest creditor.
+    Kept as the baseline the solver is benchmarked and tested against.
     """
     # Create net balance for each person
     net_balance = defaultdict(Decimal)
@@ -53,35 +82,198 @@ def simplify_debts(balances):
     
     return simplified
 
-def calculate_group_statistics(group):
+TRANSFER_DTYPE = [('group', 'i8'), ('from', 'i8'), ('to', 'i8'), ('amount', 'i8')]
+
+def simplify_debts_batch(group_ids, user_ids, cents):
     """
-    Calculate statistics for a group.
+    Greedy debt simplification for many groups at once.
+    
+    Takes flat arrays of (group id, user id, cents) balance deltas, where a
+    positive amount means the user is owed money, and returns a structured
+    array of (group, from, to, amount) transfers in cents. Within each group
+    the largest debtor is matched with the largest creditor, exactly like
+    greedy_simplify_debts, but computed for every group in a handful of
+    sort/cumsum passes instead of a Python loop per group.
+    """
+    import numpy as np
+    
+    group_ids = np.asarray(group_ids, dtype=np.int64)
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    cents = np.asarray(cents, dtype=np.int64)
+    if not (len(group_ids) == len(user_ids) == len(cents)):
+        raise ValueError('group_ids, user_ids and cents must have the same length')
+    if len(cents) == 0:
+        return np.zeros(0, dtype=TRANSFER_DTYPE)
+    
+    # Net position per (group, user)
+    order = np.lexsort((user_ids, group_ids))
+    groups, users, amounts = group_ids[order], user_ids[order], cents[order]
+    starts = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | (users[1:] != users[:-1])])
+    groups, users, net = groups[starts], users[starts], np.add.reduceat(amounts, starts)
+    
+    group_starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    unbalanced = np.add.reduceat(net, group_starts) != 0
+    if unbalanced.any():
+        raise ValueError(f'Net positions must sum to zero in group(s) {groups[group_starts][unbalanced][:10].tolist()}')
+    
+    # Biggest debtor / creditor first within each group
+    is_debtor = net < 0
+    is_creditor = net > 0
+    debtor_groups, debtors, debts = groups[is_debtor], users[is_debtor], -net[is_debtor]
+    creditor_groups, creditors, credits = groups[is_creditor], users[is_creditor], net[is_creditor]
+    debt_order = np.lexsort((debtors, -debts, debtor_groups))
+    credit_order = np.lexsort((creditors, -credits, creditor_groups))
+    debtor_groups, debtors, debts = debtor_groups[debt_order], debtors[debt_order], debts[debt_order]
+    creditors, credits = creditors[credit_order], credits[credit_order]
+    
+    # Lay debts and credits out on one running total. Every group balances,
+    # so group boundaries line up on both sides; each interval between
+    # consecutive breakpoints is one transfer between the debtor and creditor
+    # whose ranges cover it, which is exactly what the greedy walk produces.
+    debt_ends = np.cumsum(debts)
+    credit_ends = np.cumsum(credits)
+    breakpoints = np.union1d(debt_ends, credit_ends)
+    amounts = np.diff(np.r_[0, breakpoints])
+    debtor_index = np.searchsorted(debt_ends, breakpoints)
+    creditor_index = np.searchsorted(credit_ends, breakpoints)
+    
+    transfers = np.zeros(len(breakpoints), dtype=TRANSFER_DTYPE)
+    transfers['group'] = debtor_groups[debtor_index]
+    transfers['from'] = debtors[debtor_index]
+    transfers['to'] = creditors[creditor_index]
+    transfers['amount'] = amounts
+    return transfers
+
+def _statistics_queries(group, start_date=None, end_date=None):
+    """
+    The independent reads behind the group statistics: the expenses to total,
+    plus paid per member, unsettled debt per member and payer, and the members.
     """
     from .models import Expense, ExpenseSplit
     from django.db.models import Sum
     
     expenses = Expense.objects.filter(group=group)
+    splits = ExpenseSplit.objects.filter(expense__group=group, is_settled=False)
+    if start_date:
+        expenses = expenses.filter(date__gte=start_date)
+        splits = splits.filter(expense__date__gte=start_date)
+    if end_date:
+        expenses = expenses.filter(date__lte=end_date)
+        splits = splits.filter(expense__date__lte=end_date)
+    
+    # Per person spending, one grouped query each for paid and owed
+    paid_rows = expenses.order_by().values('paid_by').annotate(total=Sum('amount')).values_list('paid_by', 'total')
+    owed_rows = splits.order_by().values(
+        'user', 'expense__paid_by__username'
+    ).annotate(total=Sum('amount_remaining'))
+    members = group.members.values_list('id', 'username')
+    return expenses, paid_rows, owed_rows, members
+
+def _build_statistics(totals, paid_rows, owed_rows, members, by_payer):
+    paid_by_member = dict(paid_rows)
     
-    total_spent = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    # Sum in integer cents so balances come out exact
+    owed_by_member = defaultdict(int)
+    owed_by_payer = defaultdict(dict)
+    for row in owed_rows:
+        cents = to_cents(row['total'])
+        owed_by_member[row['user']] += cents
+        owed_by_payer[row['user']][row['expense__paid_by__username']] = cents_to_float(cents)
     
-    # Per person spending
     member_stats = {}
-    for member in group.members.all():
-        paid = expenses.filter(paid_by=member).aggregate(total=Sum('amount'))['total'] or 0
-        owed = ExpenseSplit.objects.filter(
-            expense__group=group,
-            user=member,
-            is_settled=False
-        ).aggregate(total=Sum('amount_owed'))['total'] or 0
+    for member_id, username in members:
+        paid = to_cents(paid_by_member.get(member_id) or 0)
+        owed = owed_by_member.get(member_id, 0)
         
-        member_stats[member.username] = {
-            'paid': float(paid),
-            'owes': float(owed),
-            'balance': float(paid) - float(owed)
+        member_stats[username] = {
+            'paid': cents_to_float(paid),
+            'owes': cents_to_float(owed),
+            'balance': cents_to_float(paid - owed)
         }
+        if by_payer:
+            member_stats[username]['owes_by_payer'] = {
+                payer: amount
+                for payer, amount in owed_by_payer.get(member_id, {}).items()
+                if payer != username
+            }
     
     return {
-        'total_spent': float(total_spent),
-        'expense_count': expenses.count(),
+        'total_spent': cents_to_float(to_cents(totals['total'] or 0)),
+        'expense_count': totals['count'],
         'member_stats': member_stats
-    }
\ No newline at end of file
+    }
+
+@timed('calculate_group_statistics')
+def calculate_group_statistics(group, start_date=None, end_date=None, by_payer=False):
+    """
+    Calculate statistics for a group.
+    
+    Paid/owed figures for every member come from a fixed number of grouped
+    aggregate queries, so the cost does not grow with the member count.
+    Pass start_date/end_date to only count expenses dated in that range, and
+    by_payer=True to break each member's unsettled debt down by who paid.
+    """
+    from django.db.models import Sum, Count
+    
+    expenses, paid_rows, owed_rows, members = _statistics_queries(group, start_date, end_date)
+    totals = expenses.aggregate(total=Sum('amount'), count=Count('id'))
+    return _build_statistics(totals, paid_rows, owed_rows, members, by_payer)
+
+@timed('calculate_group_statistics')
+async def acalculate_group_statistics(group, start_date=None, end_date=None, by_payer=False):
+    """
+    Async calculate_group_statistics; the four reads are issued together.
+    """
+    from django.db.models import Sum, Count
+    
+    expenses, paid_rows, owed_rows, members = _statistics_queries(group, start_date, end_date)
+    totals, paid_rows, owed_rows, members = await asyncio.gather(
+        expenses.aaggregate(total=Sum('amount'), count=Count('id')),
+        alist(paid_rows), alist(owed_rows), alist(members)
+    )
+    return _build_statistics(totals, paid_rows, owed_rows, members, by_payer)
+
+def dashboard_groups(user):
+    """
+    The user's groups, newest first, annotated for the dashboard cards:
+    member_count, expense_count, last_activity, and net_balance (positive
+    when the user is owed money). Every figure is a correlated subquery on
+    the same SELECT, so the page costs one query however many groups there are.
+    """
+    from .models import Group, Expense, Settlement, PairwiseBalance
+    from django.db.models import (
+        OuterRef, Subquery, Count, Sum, Max, F, Value,
+        IntegerField, DecimalField, DateTimeField
+    )
+    from django.db.models.functions import Coalesce, Greatest
+
+    def per_group(queryset, aggregate, output_field):
+        return Subquery(
+            queryset.filter(group=OuterRef('pk')).order_by().values('group')
+            .annotate(result=aggregate).values('result'),
+            output_field=output_field
+        )
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    zero = Value(0, output_field=money)
+
+    return Group.objects.filter(members=user).annotate(
+        member_count=Coalesce(
+            per_group(Group.members.through.objects.all(), Count('*'), IntegerField()), 0
+        ),
+        expense_count=Coalesce(
+            per_group(Expense.objects.all(), Count('*'), IntegerField()), 0
+        ),
+        last_activity=Greatest(
+            'created_at',
+            Coalesce(per_group(Expense.objects.all(), Max('created_at'), DateTimeField()), 'created_at'),
+            Coalesce(per_group(Settlement.objects.all(), Max('settled_at'), DateTimeField()), 'created_at'),
+        ),
+        owed_to_user=Coalesce(
+            per_group(PairwiseBalance.objects.filter(creditor=user), Sum('amount'), money), zero
+        ),
+        owed_by_user=Coalesce(
+            per_group(PairwiseBalance.objects.filter(debtor=user), Sum('amount'), money), zero
+        ),
+        net_balance=F('owed_to_user') - F('owed_by_user'),
+    ).order_by('-created_at')
@@ -4,25 +4,60 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from datetime import date
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.parsers import MultiPartParser
 from django.contrib.auth.models import User
 from django.db.models import Sum, Q
-from .models import Group, Expense, ExpenseSplit, Settlement
-from .utils import simplify_debts, calculate_group_statistics
+from .models import Group, Expense, ExpenseSplit, Settlement, ExportJob, Task
+from .utils import simplify_debts, calculate_group_statistics, dashboard_groups
+from .ledger import get_group_balances_as_of, reverse_expense, HistoryUnavailable
+from .importers import import_expenses_csv
+from .exporters import iter_expense_csv, iter_gzip
+from .archives import start_export
+from .tasks import enqueue
+from .settlements import allocate_settlement
+from .money import parse_amount
+from .summary import user_summary
+from .live import expense_rows
+from . import metrics
+from .pagination import ExpensePagination, SettlementPagination, UserPagination
+from .filters import filter_expenses, filter_settlements, filter_users
+from .cache import (
+    get_cached_balances, get_cached_simplified_balances,
+    get_cached_statistics, cache_stats
+)
+from django.db import transaction
 from django.http import JsonResponse
 from django.db.models import Sum
 from django.views.decorators.http import require_POST
-import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse, FileResponse, Http404, HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+import hmac
+import os
 from .serializers import (
     GroupSerializer, ExpenseSerializer, 
-    SettlementSerializer, UserSerializer
+    SettlementSerializer, UserSerializer, ExportJobSerializer, TaskSerializer
 )
 
-class GroupViewSet(viewsets.ModelViewSet):
+class EagerLoadingViewSetMixin:
+    """
+    Applies the serializer's declared select/prefetch_related to list and
+    detail reads, so response size never changes the query count.
+    """
+    eager_loading_actions = ('list', 'retrieve')
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.action in self.eager_loading_actions and hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+class GroupViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = [IsAuthenticated]
     
@@ -36,69 +71,235 @@ class GroupViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def balances(self, request, pk=None):
         """
-        Calculate who owes whom in this group
+        Calculate who owes whom in this group.
+        Pass ?as_of=YYYY-MM-DD to get the balances at the end of a past date.
         """
         group = self.get_object()
-        balances = {}
-        
-        # Get all unsettled splits for this group
-        splits = ExpenseSplit.objects.filter(
-            expense__group=group,
-            is_settled=False
-        ).select_related('user', 'expense__paid_by')
-        
-        # Calculate net balance for each user
-        for split in splits:
-            user = split.user.username
-            paid_by = split.expense.paid_by.username
-            
-            if user not in balances:
-                balances[user] = {}
-            
-            if paid_by not in balances[user]:
-                balances[user][paid_by] = 0
-            
-            # This user owes money to paid_by
-            if user != paid_by:
-                balances[user][paid_by] += float(split.amount_owed)
+        
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            try:
+                as_of_date = date.fromisoformat(as_of)
+            except ValueError:
+                return Response({'error': 'as_of must be a date in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                return Response(get_group_balances_as_of(group, as_of_date))
+            except HistoryUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Read the materialized ledger instead of scanning every split
+        balances = get_cached_balances(group)
         
         return Response(balances)
+    
+    @action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request, pk=None):
+        """
+        Import expenses from an uploaded CSV file (form field "file").
+        Bad rows are skipped and reported by line number.
+        """
+        group = self.get_object()
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV file in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = import_expenses_csv(group, upload, request.user)
+        return Response(report, status=status.HTTP_201_CREATED if report['imported'] else status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def statistics(self, request, pk=None):
+        """
+        Spending statistics for this group.
+        Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD date range and ?by_payer=1 breakdown.
+        POST queues the same calculation as a background task and returns it
+        with 202; poll /api/tasks/<id>/ for the result.
+        """
+        group = self.get_object()
+        
+        try:
+            start_date = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else None
+            end_date = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else None
+        except ValueError:
+            return Response({'error': 'start and end must be dates in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        by_payer = request.query_params.get('by_payer') in ('1', 'true', 'True')
+        
+        if request.method == 'POST':
+            args = {'group_id': group.id, 'by_payer': by_payer}
+            if start_date:
+                args['start'] = start_date.isoformat()
+            if end_date:
+                args['end'] = end_date.isoformat()
+            task = enqueue('refresh_statistics', args, user=request.user, unique=True)
+            return Response(TaskSerializer(task).data, status=status.HTTP_202_ACCEPTED)
+        
+        return Response(calculate_group_statistics(group, start_date=start_date, end_date=end_date, by_payer=by_payer))
+    
+    @action(detail=True, methods=['post'], url_path='rebuild-ledger')
+    def rebuild_ledger(self, request, pk=None):
+        """
+        Queue a rebuild of the group's balance ledger from its splits.
+        Only the group's creator can ask for one.
+        """
+        group = self.get_object()
+        if group.created_by_id != request.user.id:
+            return Response({'error': 'Only the group creator can rebuild its ledger'}, status=status.HTTP_403_FORBIDDEN)
+        
+        task = enqueue('rebuild_ledger', {'group_id': group.id}, user=request.user, unique=True)
+        return Response(TaskSerializer(task).data, status=status.HTTP_202_ACCEPTED)
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpensePagination
     
     def get_queryset(self):
         # Only return expenses from groups user is member of
-        return Expense.objects.filter(group__members=self.request.user)
+        queryset = Expense.objects.filter(group__members=self.request.user)
+        if self.action == 'list':
+            queryset = filter_expenses(queryset, self.request.query_params)
+        return queryset
     
     def perform_create(self, serializer):
         serializer.save(paid_by=self.request.user)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many expenses in one atomic batch.
+        Takes a list of expenses and returns one result per item, in order.
+        """
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of expenses'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            results = [
+                {'index': index, 'status': 'invalid', 'errors': errors} if errors
+                else {'index': index, 'status': 'valid'}
+                for index, errors in enumerate(serializer.errors)
+            ]
+            return Response({'created': 0, 'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        
+        expenses = serializer.save(paid_by=request.user)
+        results = [
+            {'index': index, 'status': 'created', 'id': expense.id}
+            for index, expense in enumerate(expenses)
+        ]
+        return Response({'created': len(expenses), 'results': results}, status=status.HTTP_201_CREATED)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            reverse_expense(instance)
+            instance.delete()
 
-class SettlementViewSet(viewsets.ModelViewSet):
+class SettlementViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = SettlementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SettlementPagination
     
     def get_queryset(self):
-        return Settlement.objects.filter(
+        queryset = Settlement.objects.filter(
             Q(paid_by=self.request.user) | Q(paid_to=self.request.user)
         )
+        if self.action == 'list':
+            queryset = filter_settlements(queryset, self.request.query_params)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['allocation'] = self.allocation
+        return response
     
+    @transaction.atomic
     def perform_create(self, serializer):
         settlement = serializer.save(paid_by=self.request.user)
         
-        # Mark relevant splits as settled
-        ExpenseSplit.objects.filter(
-            expense__group=settlement.group,
-            user=settlement.paid_by,
-            expense__paid_by=settlement.paid_to,
-            is_settled=False
-        ).update(is_settled=True)
+        # Pay down the splits owed to paid_to, oldest first
+        self.allocation = allocate_settlement(settlement)
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(EagerLoadingViewSetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserPagination
+    
+    def get_queryset(self):
+        queryset = User.objects.all()
+        if self.action == 'list':
+            queryset = filter_users(queryset, self.request.query_params)
+        return queryset
+    
+    @action(detail=False, methods=['get'], url_path='me/summary')
+    def me_summary(self, request):
+        """
+        The current user's totals across all groups, broken down per group
+        and per person they owe or are owed by.
+        """
+        return Response(user_summary(request.user))
+
+class ExportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Account-wide archive exports: POST to start one, GET to poll its status.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user).order_by('-created_at')
+    
+    def create(self, request, *args, **kwargs):
+        job = start_export(request.user)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done':
+            return Response({'error': f'Export is {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return archive_response(job)
+
+class TaskViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background tasks the current user queued, newest first; filter with ?status=.
+    """
+    serializer_class = TaskSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Task.objects.filter(user=self.request.user).order_by('-created_at')
+        if self.request.query_params.get('status'):
+            queryset = queryset.filter(status=self.request.query_params['status'])
+        return queryset
+
+def archive_response(job):
+    if not os.path.exists(job.file_path):
+        raise Http404('Export file is no longer available')
+    return FileResponse(
+        open(job.file_path, 'rb'),
+        as_attachment=True,
+        filename=f'expense-splitter-export-{job.created_at:%Y%m%d}.zip'
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats_view(request):
+    """
+    Hit/miss counters for the cached balances, settlements and statistics
+    """
+    return Response(cache_stats())
+
+def metrics_view(request):
+    """
+    Metrics from every worker process in the Prometheus text format.
+    Open to scrapers sending the METRICS_TOKEN bearer token and to staff users.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    sent = request.headers.get('Authorization', '')
+    allowed = bool(token) and hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode())
+    if not allowed and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # expenses/views.py - ADD these functions at the bottom
 
@@ -154,10 +355,16 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    groups = Group.objects.filter(members=request.user).order_by('-created_at')
+    # Member/expense counts, last activity and net balance in one query
+    groups = list(dashboard_groups(request.user))
+    for group in groups:
+        group.net_abs = abs(group.net_balance)
+    total_net = sum(group.net_balance for group in groups)
     
     context = {
         'groups': groups,
+        'total_net': total_net,
+        'total_net_abs': abs(total_net),
     }
     return render(request, 'expenses/dashboard.html', context)
 
@@ -211,71 +418,44 @@ def create_group_view(request):
     
     return redirect('dashboard')
 
-@login_required
-def group_detail_view(request, group_id):
-    group = get_object_or_404(Group, id=group_id, members=request.user)
-    expenses = group.expenses.all().order_by('-date')
-    
-    # Calculate balances
-    balances = {}
-    splits = ExpenseSplit.objects.filter(
-        expense__group=group,
-        is_settled=False
-    ).select_related('user', 'expense__paid_by')
-    
-    for split in splits:
-        user = split.user.username
-        paid_by = split.expense.paid_by.username
-        
-        if user not in balances:
-            balances[user] = {}
-        
-        if paid_by not in balances[user]:
-            balances[user][paid_by] = 0
-        
-        if user != paid_by:
-            balances[user][paid_by] += float(split.amount_owed)
-    
-    context = {
-        'group': group,
-        'expenses': expenses,
-        'balances': balances,
-    }
-    return render(request, 'expenses/group_detail.html', context)
+def form_errors(errors, field=None):
+    """
+    Flatten serializer errors into messages for the HTML forms.
+    """
+    if isinstance(errors, dict):
+        for name, nested in errors.items():
+            yield from form_errors(nested, field if isinstance(name, int) or name == 'non_field_errors' else name)
+    elif isinstance(errors, list):
+        for nested in errors:
+            yield from form_errors(nested, field)
+    elif field:
+        yield f"{field.replace('_', ' ').capitalize()}: {errors}"
+    else:
+        yield str(errors)
 
 @login_required
 def add_expense_view(request, group_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
     
     if request.method == 'POST':
-        description = request.POST.get('description')
-        amount = request.POST.get('amount')
-        expense_date = request.POST.get('date')
-        split_member_ids = request.POST.getlist('split_members')
-        
-        if not split_member_ids:
-            messages.error(request, 'Please select at least one member to split with!')
+        # Same field, duplicate and membership checks as the API
+        serializer = ExpenseSerializer(data={
+            'group': group.id,
+            'description': request.POST.get('description', ''),
+            'amount': request.POST.get('amount', ''),
+            'date': request.POST.get('date', ''),
+            'split_members': request.POST.getlist('split_members'),
+        }, context={'request': request})
+        
+        if not serializer.is_valid():
+            for error in form_errors(serializer.errors):
+                messages.error(request, error)
             return redirect('add_expense', group_id=group_id)
         
-        # Create expense
-        expense = Expense.objects.create(
-            group=group,
-            description=description,
-            amount=amount,
-            paid_by=request.user,
-            date=expense_date
-        )
+        # Create expense and its splits
+        expense = serializer.save(paid_by=request.user)
         
-        # Create splits
-        split_amount = float(amount) / len(split_member_ids)
-        for member_id in split_member_ids:
-            ExpenseSplit.objects.create(
-                expense=expense,
-                user_id=member_id,
-                amount_owed=split_amount
-            )
-        
-        messages.success(request, f'Expense "{description}" added successfully!')
+        messages.success(request, f'Expense "{expense.description}" added successfully!')
         return redirect('group_detail', group_id=group_id)
     
     context = {
@@ -292,44 +472,35 @@ def settle_debt_view(request, group_id):
         paid_to_id = request.POST.get('paid_to')
         amount = request.POST.get('amount')
         
-        paid_to = get_object_or_404(User, id=paid_to_id)
-        
-        # Create settlement record
-        settlement = Settlement.objects.create(
-            group=group,
-            paid_by=request.user,
-            paid_to=paid_to,
-            amount=amount
-        )
-        
-        # Mark relevant splits as settled
-        # Find all unsettled splits where current user owes to paid_to
-        splits_to_settle = ExpenseSplit.objects.filter(
-            expense__group=group,
-            user=request.user,
-            expense__paid_by=paid_to,
-            is_settled=False
-        ).order_by('expense__date')
-        
-        remaining_amount = float(amount)
-        
-        for split in splits_to_settle:
-            if remaining_amount <= 0:
-                break
-            
-            split_amount = float(split.amount_owed)
+        paid_to = get_object_or_404(User, id=paid_to_id, expense_groups=group)
+        if paid_to == request.user:
+            messages.error(request, 'You cannot pay yourself!')
+            return redirect('settle_debt', group_id=group_id)
+        
+        try:
+            amount = parse_amount(amount)
+        except ValueError as e:
+            messages.error(request, f'{e}.')
+            return redirect('settle_debt', group_id=group_id)
+        
+        with transaction.atomic():
+            settlement = Settlement.objects.create(
+                group=group,
+                paid_by=request.user,
+                paid_to=paid_to,
+                amount=amount
+            )
             
-            if remaining_amount >= split_amount:
-                # Fully settle this split
-                split.is_settled = True
-                split.save()
-                remaining_amount -= split_amount
-            else:
-                # Partially settle (for future enhancement)
-                # For now, we'll just mark as settled if payment covers it
-                break
+            # Pay down what you owe paid_to, oldest expense first; the last
+            # split may only be partly paid
+            allocation = allocate_settlement(settlement)
         
         messages.success(request, f'Payment of ${amount} to {paid_to.username} recorded successfully!')
+        if allocation['unallocated']:
+            messages.warning(
+                request,
+                f'${allocation["unallocated"]:.2f} was more than you owed {paid_to.username} and was not applied to any expense.'
+            )
         return redirect('group_detail', group_id=group_id)
     
     context = {
@@ -352,7 +523,9 @@ def delete_expense_view(request, expense_id):
         if expense.paid_by != request.user and group.created_by != request.user:
             return JsonResponse({'success': False, 'error': 'Only expense creator or group admin can delete'}, status=403)
         
-        expense.delete()
+        with transaction.atomic():
+            reverse_expense(expense)
+            expense.delete()
         return JsonResponse({'success': True})
     
     except Exception as e:
@@ -361,33 +534,18 @@ def delete_expense_view(request, expense_id):
 @login_required
 def group_detail_view(request, group_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
-    expenses = group.expenses.all().order_by('-date')
-    
-    # Calculate balances
-    balances = {}
-    splits = ExpenseSplit.objects.filter(
-        expense__group=group,
-        is_settled=False
-    ).select_related('user', 'expense__paid_by')
+    # Payer and split count in the list query; the page then follows changes
+    # over /events/ under ASGI, or by polling /version/ under WSGI
+    expenses = expense_rows(group)
     
-    for split in splits:
-        user = split.user.username
-        paid_by = split.expense.paid_by.username
-        
-        if user not in balances:
-            balances[user] = {}
-        
-        if paid_by not in balances[user]:
-            balances[user][paid_by] = 0
-        
-        if user != paid_by:
-            balances[user][paid_by] += float(split.amount_owed)
+    # Calculate balances from the materialized ledger
+    balances = get_cached_balances(group)
     
     # Get simplified balances
-    simplified_balances = simplify_debts(balances)
+    simplified_balances = get_cached_simplified_balances(group)
     
     # Get statistics
-    statistics = calculate_group_statistics(group)
+    statistics = get_cached_statistics(group)
     
     context = {
         'group': group,
@@ -395,32 +553,89 @@ def group_detail_view(request, group_id):
         'balances': balances,
         'simplified_balances': simplified_balances,
         'statistics': statistics,
+        # An open event stream holds a whole WSGI worker, so only ASGI pages stream
+        'live_events': isinstance(request, ASGIRequest),
+        'live_poll_seconds': getattr(settings, 'LIVE_PAGE_POLL_SECONDS', 10),
     }
     return render(request, 'expenses/group_detail.html', context)
 
+@login_required
+def group_version_view(request, group_id):
+    """
+    The group's current version, polled by group pages served over WSGI.
+    """
+    version = Group.objects.filter(id=group_id, members=request.user).values_list('version', flat=True).first()
+    if version is None:
+        raise Http404('Group not found')
+    return JsonResponse({'version': version})
+
 @login_required
 def export_expenses_csv(request, group_id):
+    """
+    Stream a group's expenses as CSV.
+    Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD date range and ?compress=gzip.
+    """
     group = get_object_or_404(Group, id=group_id, members=request.user)
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{group.name}_expenses.csv"'
+    try:
+        start_date = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end_date = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        messages.error(request, 'Export dates must be in YYYY-MM-DD format!')
+        return redirect('group_detail', group_id=group_id)
     
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Description', 'Amount', 'Paid By', 'Split Among'])
+    content = iter_expense_csv(group, start_date, end_date)
+    filename = f'{group.name}_expenses.csv'
     
-    for expense in group.expenses.all().order_by('-date'):
-        split_members = ', '.join([split.user.username for split in expense.splits.all()])
-        writer.writerow([
-            expense.date,
-            expense.description,
-            expense.amount,
-            expense.paid_by.username,
-            split_members
-        ])
+    # Stream the file chunk by chunk instead of building it in memory
+    if request.GET.get('compress') == 'gzip':
+        response = StreamingHttpResponse(iter_gzip(content), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(content, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
 
+@login_required
+def import_expenses_view(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    report = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        
+        if upload is None:
+            messages.error(request, 'Please choose a CSV file to import!')
+            return redirect('import_expenses', group_id=group_id)
+        
+        report = import_expenses_csv(group, upload, request.user)
+        
+        if report['imported']:
+            messages.success(request, f'Imported {report["imported"]} expense(s)!')
+        if report['failed']:
+            messages.warning(request, f'{report["failed"]} row(s) could not be imported. See the details below.')
+        if not report['failed']:
+            return redirect('group_detail', group_id=group_id)
+    
+    context = {
+        'group': group,
+        'report': report,
+    }
+    return render(request, 'expenses/import_expenses.html', context)
+
+@login_required
+@require_POST
+def export_archive_view(request):
+    start_export(request.user)
+    messages.success(request, 'Your export is being prepared. It will appear below when it is ready.')
+    return redirect('profile')
+
+@login_required
+def download_archive_view(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id, user=request.user, status='done')
+    return archive_response(job)
+
 def home_view(request):
     """Landing page view"""
     if request.user.is_authenticated:
@@ -448,17 +663,15 @@ def profile_view(request):
         messages.success(request, 'Profile updated successfully!')
         return redirect('profile')
     
-    # Calculate statistics
-    groups_count = Group.objects.filter(members=request.user).count()
-    expenses_count = Expense.objects.filter(paid_by=request.user).count()
-    total_paid = Expense.objects.filter(paid_by=request.user).aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Same figures as /api/users/me/summary/
+    summary = user_summary(request.user)
     
     context = {
-        'groups_count': groups_count,
-        'expenses_count': expenses_count,
-        'total_paid': total_paid,
+        'summary': summary,
+        'groups_count': summary['groups_count'],
+        'expenses_count': summary['expenses_count'],
+        'total_paid': summary['total_paid'],
+        'export_jobs': ExportJob.objects.filter(user=request.user).order_by('-created_at')[:5],
     }
     return render(request, 'expenses/profile.html', context)
 
@@ -0,0 +1,109 @@
+# expenses/writers.py
+
+from django.db import transaction
+from .models import Group, Expense, ExpenseSplit
+from .ledger import record_expenses, reverse_expense, apply_journal_entries
+from .money import to_cents, from_cents, split_cents
+from . import metrics
+
+# Rows per INSERT statement for expenses and splits
+BATCH_SIZE = 500
+
+
+def create_expenses(items):
+    """
+    Write expenses and their equal splits with batched INSERTs in one transaction.
+    Shares are split in whole cents and always add up to the expense; the
+    leftover cents go to the lowest user ids.
+
+    Each item is a dict with group, description, amount, paid_by, date and
+    split_members (a list of user ids); group and paid_by may be model
+    instances or ids via group_id / paid_by_id. Returns the created
+    expenses in the same order.
+    """
+    if not items:
+        return []
+
+    with transaction.atomic():
+        expenses = Expense.objects.bulk_create([
+            Expense(**{key: value for key, value in item.items() if key != 'split_members'})
+            for item in items
+        ], batch_size=BATCH_SIZE)
+
+        splits = []
+        for expense, item in zip(expenses, items):
+            member_ids = sorted(int(user_id) for user_id in item['split_members'])
+            shares = split_cents(to_cents(expense.amount), len(member_ids))
+            for user_id, share in zip(member_ids, shares):
+                splits.append(ExpenseSplit(
+                    expense=expense,
+                    user_id=user_id,
+                    amount_owed=from_cents(share),
+                    amount_remaining=from_cents(share)
+                ))
+
+        ExpenseSplit.objects.bulk_create(splits, batch_size=BATCH_SIZE)
+
+        record_expenses(expenses, splits)
+
+    metrics.inc('expense_expenses_written_total', len(expenses))
+    metrics.inc('expense_splits_written_total', len(splits))
+    return expenses
+
+
+def update_expense(expense, changes):
+    """
+    Apply an edit to an expense in one transaction. A new amount or
+    split_members rewrites the splits and moves the ledger: what was still
+    unpaid comes off, and each new share goes on less what that member has
+    already paid towards the expense (a member who has paid their new share
+    or more is settled). The group of an expense never changes.
+    """
+    changes = dict(changes)
+    split_members = changes.pop('split_members', None)
+
+    with transaction.atomic():
+        # Group first, in the same order as every other ledger write, then the
+        # expense's splits against settlements allocating to them meanwhile
+        list(Group.objects.select_for_update().filter(pk=expense.group_id).values_list('pk', flat=True))
+        old_splits = list(ExpenseSplit.objects.select_for_update().filter(expense=expense))
+        rewrite = split_members is not None or (
+            'amount' in changes and changes['amount'] != expense.amount
+        )
+        if rewrite:
+            reverse_expense(expense)
+
+        for field, value in changes.items():
+            setattr(expense, field, value)
+        expense.save()
+
+        if not rewrite:
+            # Description or date only; still a new version for the caches
+            apply_journal_entries(expense.group_id, [])
+            return expense
+
+        paid = {split.user_id: split.amount_owed - split.amount_remaining for split in old_splits}
+        if split_members is None:
+            split_members = [split.user_id for split in old_splits]
+        member_ids = sorted(int(user_id) for user_id in split_members)
+
+        splits = []
+        for user_id, share in zip(member_ids, split_cents(to_cents(expense.amount), len(member_ids))):
+            remaining = max(from_cents(share) - paid.get(user_id, 0), 0)
+            splits.append(ExpenseSplit(
+                expense=expense,
+                user_id=user_id,
+                amount_owed=from_cents(share),
+                amount_remaining=remaining,
+                is_settled=not remaining
+            ))
+        ExpenseSplit.objects.filter(expense=expense).delete()
+        ExpenseSplit.objects.bulk_create(splits)
+
+        apply_journal_entries(expense.group_id, [
+            (split.user_id, expense.paid_by_id, split.amount_remaining, 'expense', expense, None)
+            for split in splits if not split.is_settled
+        ])
+
+    metrics.inc('expense_splits_written_total', len(splits))
+    return expense